@@ -0,0 +1,54 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from app.models.batch import BatchRequest, BatchResponse
+from app.services.batch_service import BatchService
+from app.services.embedding_service import EmbeddingService
+from app.core.data_context import DataContext, get_data_context
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(default_response_class=ORJSONResponse)
+batch_service = BatchService()
+embedding_service = EmbeddingService()
+
+@router.post("", response_model=BatchResponse)
+async def run_batch(
+    batch: BatchRequest,
+    background_tasks: BackgroundTasks,
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Run several memory and media operations with one request.
+
+    Results are returned in request order with a status per operation. With
+    ``atomic`` set, writes are applied in one transaction and any failure
+    fails the whole request.
+    """
+    if not batch.operations:
+        return BatchResponse(results=[])
+    if len(batch.operations) > settings.BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {settings.BATCH_MAX_OPERATIONS} operations"
+        )
+
+    try:
+        if batch.atomic:
+            results = await batch_service.run_atomic(batch.operations, ctx)
+        else:
+            results = await batch_service.run(batch.operations, ctx)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    written = [
+        result.body for operation, result in zip(batch.operations, results)
+        if operation.op in ("memory.create", "memory.update") and result.status < 300
+    ]
+    if written:
+        embedding_service.schedule(background_tasks, written, ctx.user_id, ctx.token)
+
+    return BatchResponse(results=results)
@@ -1,43 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Request, Response, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from app.models.interview import (
     InterviewStart, InterviewContinue, InterviewEnd, 
     InterviewSession, MemoryFromInterview
 )
 from app.services.ai_interviewer import AIInterviewerService
-from app.core.auth import get_current_user
+from app.services.transcription import NO_SPEECH_DETECTED, TranscriptionService
+from app.core.auth import authenticate
+from app.core.config import settings
+from app.core.data_context import DataContext, get_data_context
+from app.core.http_cache import (
+    make_etag, collection_version, cache_headers, is_not_modified, not_modified
+)
 from app.services.memory_service import MemoryService
-from app.services.interview_session_service import InterviewSessionService
+from app.services.embedding_service import EmbeddingService
+from app.services.interview_session_service import InterviewSessionService, SessionWriteBehind
 from app.models.memory import MemoryCreate
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Optional
+from jose import jwt, JWTError
+import asyncio
 import logging
+import orjson
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 interviewer_service = AIInterviewerService()
 memory_service = MemoryService()
+embedding_service = EmbeddingService()
 session_service = InterviewSessionService()
+transcription_service = TranscriptionService()
 
 @router.post("/start", response_model=Dict[str, Any])
 async def start_interview(
     interview_start: InterviewStart,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Start a new AI interview session."""
     try:
-        logger.info(f"Starting interview for user {current_user['id']}")
+        logger.info(f"Starting interview for user {ctx.user_id}")
         
         session_data = await interviewer_service.start_interview(
-            user_id=current_user['id'],
+            user_id=ctx.user_id,
             initial_context=interview_start.initial_context
         )
         
         # Store session in database
         session = await session_service.create_session(
             session_data=session_data,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         logger.info(f"Interview session started: {session.session_id}")
@@ -53,7 +66,7 @@ async def start_interview(
 @router.post("/continue", response_model=Dict[str, Any])
 async def continue_interview(
     interview_continue: InterviewContinue,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Continue an active interview session with a user response."""
     try:
@@ -65,8 +78,7 @@ async def continue_interview(
         # Get session from database
         session = await session_service.get_session(
             session_id=session_id,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         if not session:
@@ -87,8 +99,7 @@ async def continue_interview(
         updated_session = await session_service.update_session(
             session_id=session_id,
             session_data=updated_session_data,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         logger.info(f"Interview continued for session {session_id}")
@@ -103,10 +114,231 @@ async def continue_interview(
             detail=f"Failed to continue interview: {str(e)}"
         )
 
+@router.post("/voice-turn")
+async def voice_turn(
+    session_id: str = Form(...),
+    file: UploadFile = File(...),
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Answer the current question with a recording and stream the next one.
+
+    Replaces a call to /api/transcription/transcribe followed by /continue.
+    The session is loaded while the recording is transcribed, and the next
+    question is generated as soon as the transcript is ready. The response
+    is NDJSON: a ``transcript`` event, ``question`` events with the text as
+    it is generated, then ``session`` with the saved session (or ``error``).
+    """
+    logger.info(f"Voice turn for interview session {session_id}")
+
+    transcription = asyncio.create_task(transcription_service.transcribe_audio(file))
+    try:
+        session = await session_service.get_session(session_id=session_id, ctx=ctx)
+    except Exception as e:
+        transcription.cancel()
+        logger.error(f"Error loading interview session: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to continue interview: {str(e)}"
+        )
+    if not session:
+        transcription.cancel()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Interview session not found"
+        )
+
+    transcript = await transcription
+    if transcript is None:
+        raise HTTPException(status_code=500, detail="Failed to transcribe audio")
+    if transcript == NO_SPEECH_DETECTED:
+        raise HTTPException(status_code=422, detail=transcript)
+
+    return StreamingResponse(
+        _voice_turn_events(session.dict(), transcript, ctx.user_id, ctx.token),
+        media_type="application/x-ndjson"
+    )
+
+async def _voice_turn_events(session_data: Dict[str, Any], transcript: str, user_id: str, token: str) -> AsyncIterator[bytes]:
+    def event(payload: Dict[str, Any]) -> bytes:
+        return orjson.dumps(payload) + b"\n"
+
+    yield event({"type": "transcript", "text": transcript})
+
+    # The request's client is closed when the endpoint returns
+    stream_ctx = DataContext(user_id=user_id, token=token)
+    try:
+        conversation = interviewer_service.add_user_response(session_data, transcript)
+        parts = []
+        async for delta in interviewer_service.stream_next_question(conversation):
+            parts.append(delta)
+            yield event({"type": "question", "delta": delta})
+
+        updated_session_data = interviewer_service.add_next_question(
+            session_data, conversation, "".join(parts).strip()
+        )
+        updated_session = await session_service.update_session(
+            session_id=session_data["session_id"],
+            session_data=updated_session_data,
+            ctx=stream_ctx
+        )
+        logger.info(f"Voice turn finished for session {session_data['session_id']}")
+        yield event({"type": "session", "session": updated_session.dict()})
+
+    except Exception as e:
+        # The status line is already sent; report the failure in the stream
+        logger.error(f"Error in voice turn: {str(e)}")
+        detail = e.detail if isinstance(e, HTTPException) else f"Failed to continue interview: {str(e)}"
+        yield event({"type": "error", "detail": detail})
+    finally:
+        stream_ctx.close()
+
+@router.websocket("/ws")
+async def interview_websocket(websocket: WebSocket):
+    """Run an interview over one connection, authenticated once.
+
+    The first message must be ``{"type": "auth", "token": ..., "session_id":
+    ...}`` (optionally ``"audio_format"``, default ``"webm"``); the session is
+    then kept in memory for the connection. A turn is either a
+    ``{"type": "text", "text": ...}`` message or a binary frame with a
+    recording. Each turn is answered with ``transcript`` (recordings only),
+    ``question`` deltas and ``turn_complete``, or with ``error``. Turns are
+    saved in the background, in order. The connection is closed with code
+    4401 when the token expires and 1012 when the server shuts down.
+    """
+    await websocket.accept()
+    try:
+        hello = await asyncio.wait_for(websocket.receive_json(), timeout=settings.INTERVIEW_WS_AUTH_TIMEOUT_SECONDS)
+        if not isinstance(hello, dict) or hello.get("type") != "auth" or not hello.get("token") or not hello.get("session_id"):
+            raise HTTPException(status_code=400, detail="Expected an auth message with token and session_id")
+        current_user = await authenticate(hello["token"])
+    except WebSocketDisconnect:
+        return
+    except asyncio.TimeoutError:
+        await websocket.close(code=4408, reason="Authentication timed out")
+        return
+    except HTTPException as e:
+        await _send_event(websocket, {"type": "error", "detail": e.detail})
+        await websocket.close(code=4401 if e.status_code == 401 else 4400)
+        return
+    except (ValueError, KeyError):
+        # Invalid JSON, or a binary frame
+        await websocket.close(code=4400, reason="Expected a JSON auth message")
+        return
+
+    ctx = DataContext(user_id=current_user["id"], token=current_user["token"])
+    expires_at = _token_expiry(current_user["token"])
+    session_id = hello["session_id"]
+    audio_format = hello.get("audio_format") or "webm"
+    writer: Optional[SessionWriteBehind] = None
+    try:
+        session = await session_service.get_session(session_id=session_id, ctx=ctx)
+        if not session:
+            await _send_event(websocket, {"type": "error", "detail": "Interview session not found"})
+            await websocket.close(code=4404)
+            return
+
+        logger.info(f"Interview WebSocket opened for session {session_id}")
+        session_data = session.dict()
+        writer = SessionWriteBehind(session_service, session_id, ctx)
+        await _send_event(websocket, {"type": "ready", "session": session_data})
+
+        while True:
+            # On shutdown uvicorn closes the socket (1012), which ends up here
+            # as a disconnect; the finally block flushes the session
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if expires_at is not None and time.time() >= expires_at:
+                await _send_event(websocket, {"type": "error", "detail": "Token has expired"})
+                await websocket.close(code=4401)
+                return
+
+            if message.get("bytes") is not None:
+                user_response = await _transcribe_turn(websocket, message["bytes"], audio_format)
+            else:
+                user_response = _text_turn(message.get("text"))
+                if user_response is None:
+                    await _send_event(websocket, {"type": "error", "detail": "Expected a text message or a recording"})
+            if user_response is None:
+                continue
+
+            session_data = await _live_turn(websocket, session_data, user_response, writer)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in interview WebSocket: {str(e)}", exc_info=True)
+        await websocket.close(code=1011)
+    finally:
+        if writer is not None:
+            await writer.flush()
+        ctx.close()
+        logger.info(f"Interview WebSocket closed for session {session_id}")
+
+async def _send_event(websocket: WebSocket, payload: Dict[str, Any]):
+    await websocket.send_text(orjson.dumps(payload).decode())
+
+def _token_expiry(token: str) -> Optional[float]:
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return None
+    return float(exp) if exp else None
+
+def _text_turn(text: Optional[str]) -> Optional[str]:
+    try:
+        message = orjson.loads(text or "")
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(message, dict) or message.get("type") != "text":
+        return None
+    return (message.get("text") or "").strip() or None
+
+async def _transcribe_turn(websocket: WebSocket, audio: bytes, audio_format: str) -> Optional[str]:
+    if len(audio) > settings.INTERVIEW_WS_MAX_AUDIO_BYTES:
+        await _send_event(websocket, {"type": "error", "detail": "Recording is too large"})
+        return None
+    transcript = await transcription_service.transcribe_bytes(audio, f"turn.{audio_format}")
+    if transcript is None:
+        await _send_event(websocket, {"type": "error", "detail": "Failed to transcribe audio"})
+        return None
+    if transcript == NO_SPEECH_DETECTED:
+        await _send_event(websocket, {"type": "error", "detail": transcript})
+        return None
+    await _send_event(websocket, {"type": "transcript", "text": transcript})
+    return transcript
+
+async def _live_turn(websocket: WebSocket, session_data: Dict[str, Any], user_response: str, writer: SessionWriteBehind) -> Dict[str, Any]:
+    """Stream the next question and return the new session state.
+
+    A failed turn leaves the state unchanged, so the user can answer again.
+    """
+    # Work on a copy of the conversation until the turn has succeeded
+    conversation = interviewer_service.add_user_response(
+        {"conversation": list(session_data.get("conversation") or [])}, user_response
+    )
+    parts = []
+    try:
+        async for delta in interviewer_service.stream_next_question(conversation):
+            parts.append(delta)
+            await _send_event(websocket, {"type": "question", "delta": delta})
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        logger.error(f"Error in interview WebSocket turn: {str(e)}")
+        detail = e.detail if isinstance(e, HTTPException) else f"Failed to continue interview: {str(e)}"
+        await _send_event(websocket, {"type": "error", "detail": detail})
+        return session_data
+
+    session_data = interviewer_service.add_next_question(session_data, conversation, "".join(parts).strip())
+    writer.save(session_data)
+    await _send_event(websocket, {"type": "turn_complete", "current_question": session_data["current_question"]})
+    return session_data
+
 @router.post("/end", response_model=Dict[str, Any])
 async def end_interview(
     interview_end: InterviewEnd,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """End an interview session and generate a summary."""
     try:
@@ -117,8 +349,7 @@ async def end_interview(
         # Get session from database
         session = await session_service.get_session(
             session_id=session_id,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         if not session:
@@ -130,19 +361,24 @@ async def end_interview(
         # Convert session to dict for AI service
         session_data = session.dict()
         
-        # End interview and generate summary
-        final_session_data = await interviewer_service.end_interview(session_data)
+        # End interview and generate summary (and the title, in the same call)
+        final_session_data = await interviewer_service.end_interview(
+            session_data,
+            suggest_title=interview_end.suggest_title
+        )
         
         # Update session in database
         final_session = await session_service.update_session(
             session_id=session_id,
             session_data=final_session_data,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         logger.info(f"Interview ended for session {session_id}")
-        return final_session.dict()
+        result = final_session.dict()
+        if final_session_data.get("suggested_title"):
+            result["suggested_title"] = final_session_data["suggested_title"]
+        return result
         
     except HTTPException:
         raise
@@ -156,7 +392,8 @@ async def end_interview(
 @router.post("/create-memory", response_model=Dict[str, Any])
 async def create_memory_from_interview(
     memory_data: MemoryFromInterview,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Create a memory from an interview session."""
     try:
@@ -167,8 +404,7 @@ async def create_memory_from_interview(
         # Get session from database
         session = await session_service.get_session(
             session_id=session_id,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         if not session:
@@ -215,18 +451,18 @@ async def create_memory_from_interview(
         
         memory = await memory_service.create_memory(
             memory=memory_create,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         # Mark session as completed
         await session_service.update_session(
             session_id=session_id,
             session_data={'status': 'completed'},
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
+        embedding_service.schedule(background_tasks, [memory], ctx.user_id, ctx.token)
+        
         logger.info(f"Memory created from interview session {session_id}")
         return {
             "memory": memory,
@@ -245,15 +481,25 @@ async def create_memory_from_interview(
 
 @router.get("/sessions", response_model=List[Dict[str, Any]])
 async def get_user_sessions(
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Get all active interview sessions for the current user."""
     try:
         sessions = await session_service.get_user_sessions(
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
+        # last_updated is maintained by a trigger, so it versions each session.
+        # No Last-Modified: a deleted session does not advance the newest
+        # last_updated, but it changes the count in the ETag
+        count, last_modified, max_id = collection_version(sessions, 'last_updated')
+        etag = make_etag("sessions", ctx.user_id, count, last_modified, max_id)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        response.headers.update(cache_headers(etag))
+        
         return [session.dict() for session in sessions]
         
     except Exception as e:
@@ -266,14 +512,13 @@ async def get_user_sessions(
 @router.get("/suggest-title/{session_id}")
 async def suggest_memory_title(
     session_id: str,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Get a suggested title for a memory based on the interview conversation."""
     try:
         session = await session_service.get_session(
             session_id=session_id,
-            user_id=current_user['id'],
-            token=current_user['token']
+            ctx=ctx
         )
         
         if not session:
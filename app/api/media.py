@@ -1,19 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File, status, Form
 from app.models.memory import MediaAttachmentCreate
 from app.services.media_service import MediaService
-from app.core.auth import get_current_user
+from app.core.data_context import DataContext, get_data_context
+from app.core.config import settings
+from app.core.http_cache import make_etag, cache_headers, is_not_modified, not_modified, parse_range
+from app.core.media_cache import iter_file
+from app.core.upstream import supabase_upstream
 import logging
-from app.supabase.client import get_authenticated_client
 import uuid
 import os
-from fastapi.responses import FileResponse
+import mimetypes
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 import tempfile
 from pydantic import BaseModel
 from typing import Optional
-from app.models.media import MediaCreate, Media
+from app.models.media import MediaCreate, Media, MediaUploadRequest, MediaUploadTicket, MediaUploadComplete
 
 logger = logging.getLogger(__name__)
-router = APIRouter(tags=["media"])
+router = APIRouter(tags=["media"], default_response_class=ORJSONResponse)
 media_service = MediaService()
 
 class MediaUpdate(BaseModel):
@@ -22,19 +26,23 @@ class MediaUpdate(BaseModel):
 @router.get("/story/{story_id}")
 async def get_story_media(
     story_id: int,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     try:
         logger.info(f"Fetching media for story {story_id}")
         
-        # Get authenticated Supabase client
-        supabase = get_authenticated_client(current_user["token"])
+        # Use the request's authenticated Supabase client
+        supabase = ctx.client
         
         # Query the media_attachments table for this story
-        response = supabase.table("media_attachments") \
-            .select("*") \
-            .eq("story_id", story_id) \
-            .execute()
+        response = await supabase_upstream.call(
+            supabase.table("media_attachments")
+                .select("*")
+                .eq("story_id", story_id)
+                .execute,
+            idempotent=True,
+            hedge=True
+        )
             
         logger.info(f"Story media response: {response.data}")
         return response.data
@@ -49,7 +57,7 @@ async def upload_media(
     memory_id: int = Form(...),
     media_type: str = Form(...),
     label: str = Form(None),
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Upload a media file for a memory."""
     try:
@@ -58,75 +66,148 @@ async def upload_media(
             media_type=media_type,
             label=label,
             file_path="",  # Will be set by the service
-            user_id=current_user["id"]
+            user_id=ctx.user_id
         )
         
         return await media_service.upload_media(
             file=file,
             media_data=media_data,
-            user_id=current_user["id"],
-            token=current_user["token"]
+            ctx=ctx
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in upload_media: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/upload-url", response_model=MediaUploadTicket)
+async def create_upload_url(
+    upload: MediaUploadRequest,
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Get a signed URL to upload a media file directly to storage.
+
+    The client PUTs the file to ``signed_url`` and then calls
+    ``/upload-complete`` with the returned ``file_path``.
+    """
+    try:
+        return await media_service.create_upload_url(
+            upload=upload,
+            ctx=ctx
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in create_upload_url: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/upload-complete")
+async def complete_upload(
+    upload: MediaUploadComplete,
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Register a media file uploaded directly to storage."""
+    try:
+        return await media_service.complete_upload(
+            upload=upload,
+            ctx=ctx
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in complete_upload: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/{media_id}")
 async def delete_media(
     media_id: int,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
+    """Delete a media file and its record."""
     try:
-        logger.info(f"Deleting media {media_id}")
-        
-        # Get authenticated Supabase client
-        supabase = get_authenticated_client(current_user["token"])
-        
-        # Get media record first to get the file path
-        response = supabase.table("media_attachments") \
-            .select("*") \
-            .eq("id", media_id) \
-            .single() \
-            .execute()
-            
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Media not found"
-            )
-            
-        media = response.data
-        
-        # Delete from storage
-        bucket = "media"
-        file_path = media["file_path"]
-        supabase.storage.from_(bucket).remove([file_path])
-        
-        # Delete from database
-        response = supabase.table("media_attachments") \
-            .delete() \
-            .eq("id", media_id) \
-            .execute()
-            
-        logger.info(f"Media deletion response: {response.data}")
-        return response.data[0] if response.data else None
+        return await media_service.delete_media(
+            media_id=media_id,
+            ctx=ctx
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting media: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{media_id}/content")
+async def get_media_content(
+    media_id: int,
+    request: Request,
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Stream a media file through the API, with Range support.
+
+    For clients that cannot reach storage directly. Objects are served from
+    a local disk cache; disabled unless MEDIA_PROXY_ENABLED is set.
+    """
+    if not settings.MEDIA_PROXY_ENABLED:
+        raise HTTPException(status_code=404, detail="Media proxy is disabled")
+
+    media = await media_service.get_media_content(
+        media_id=media_id,
+        ctx=ctx
+    )
+
+    # Stored objects never change in place, so the path identifies the bytes
+    etag = make_etag("media", media["file_path"])
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    file, size = await media_service.open_media_content(media, ctx)
+
+    headers = {**cache_headers(etag), "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        # The client's partial copy is stale, send the whole file
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        await file.aclose()
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    content_type = mimetypes.guess_type(media["file_path"])[0] or "application/octet-stream"
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        status_code = 206
+    else:
+        start, end = 0, size - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        iter_file(file, start, end),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers
+    )
+
 @router.get("/{media_id}/url")
 async def get_media_url(
     media_id: int,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Get a signed URL for a media file."""
     try:
         return await media_service.get_media_url(
             media_id=media_id,
-            user_id=current_user["id"],
-            token=current_user["token"]
+            ctx=ctx
         )
         
     except Exception as e:
@@ -137,17 +218,18 @@ async def get_media_url(
 async def update_media_label(
     media_id: int,
     label: str,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Update the label of a media file."""
     try:
         return await media_service.update_media_label(
             media_id=media_id,
             label=label,
-            user_id=current_user["id"],
-            token=current_user["token"]
+            ctx=ctx
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in update_media_label: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
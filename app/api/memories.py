@@ -1,37 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from app.models.memory import MemoryCreate, MemoryUpdate, Memory
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
+from app.models.memory import MemoryCreate, MemoryUpdate, Memory, MemoryDetail, MemoryImportResult, MemorySearchResult
 from app.services.memory_service import MemoryService
+from app.services.memory_import_service import MemoryImportService
+from app.services.memory_export_service import MemoryExportService
+from app.services.memory_search_service import MemorySearchService
+from app.services.embedding_service import EmbeddingService
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from app.core.auth import get_current_user
+from app.core.data_context import DataContext, get_data_context
+from app.core.upstream import supabase_upstream
+from app.core.http_cache import (
+    make_etag, parse_timestamp, collection_version, cache_headers,
+    is_not_modified, not_modified
+)
 from typing import List, Dict, Any, Optional
 import logging
-from app.supabase.client import get_authenticated_client
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 memory_service = MemoryService()
+memory_import_service = MemoryImportService()
+memory_export_service = MemoryExportService()
+memory_search_service = MemorySearchService()
+embedding_service = EmbeddingService()
 
-@router.get("/search")
+@router.get("/search", response_model=List[Memory])
 async def search_memories(
     query: Optional[str] = Query(None, description="Search query for memory title and content"),
     start_date: Optional[str] = Query(None, description="Start date for filtering (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date for filtering (YYYY-MM-DD)"),
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Search memories by text and date range."""
     try:
         logger.info(f"Search parameters - query: {query}, start_date: {start_date}, end_date: {end_date}")
         
-        # Get authenticated Supabase client
-        supabase = get_authenticated_client(current_user["token"])
-        
         # Get all memories for the user
-        response = supabase.rpc(
-            'get_memories_for_user',
-            {'user_id': current_user["id"]}
-        ).execute()
-        
-        memories = response.data
+        memories = await memory_service.get_memory_rows(ctx)
         
         # Filter by search query if provided
         if query:
@@ -51,6 +57,8 @@ async def search_memories(
         logger.info(f"Found {len(memories)} matching memories")
         return memories
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching memories: {str(e)}", exc_info=True)
         logger.error(f"Error type: {type(e)}")
@@ -60,41 +68,138 @@ async def search_memories(
             detail=f"Error searching memories: {str(e)}"
         )
 
+@router.get("/search/hybrid", response_model=List[MemorySearchResult])
+async def hybrid_search_memories(
+    query: str = Query(..., min_length=1, description="What to look for, in natural language"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results"),
+    start_date: Optional[str] = Query(None, description="Start date for filtering (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date for filtering (YYYY-MM-DD)"),
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Search memories by meaning and keywords.
+
+    Vector similarity and full-text rank are fused with reciprocal rank
+    fusion, so a result can match either by wording or by meaning.
+    """
+    return await memory_search_service.hybrid_search(
+        query,
+        ctx,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date
+    )
+
+@router.get("/export")
+async def export_memories(
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$", description="Export format: ndjson or zip"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream every memory (and, for zip, every media file) of the current user."""
+    logger.info(f"Exporting memories for user {current_user['id']} as {format}")
+
+    if format == "zip":
+        return StreamingResponse(
+            memory_export_service.export_zip(current_user["id"], current_user["token"]),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="memories-export.zip"'}
+        )
+
+    return StreamingResponse(
+        memory_export_service.export_ndjson(current_user["id"], current_user["token"]),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="memories-export.ndjson"'}
+    )
+
+@router.post("/import", response_model=MemoryImportResult)
+async def import_memories(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Bulk import memories from an NDJSON request body (one memory per line)."""
+    try:
+        result = await memory_import_service.import_ndjson(request.stream(), ctx)
+        embedding_service.schedule_by_id(background_tasks, result.memory_ids, ctx.user_id, ctx.token)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing memories: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing memories: {str(e)}"
+        )
+
+@router.post("/import/archive", response_model=MemoryImportResult)
+async def import_memories_archive(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Bulk import memories and their media from a ZIP archive."""
+    try:
+        result = await memory_import_service.import_archive(file.file, ctx)
+        embedding_service.schedule_by_id(background_tasks, result.memory_ids, ctx.user_id, ctx.token)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing memory archive: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing memories: {str(e)}"
+        )
+
 @router.get("/", response_model=List[Memory])
 async def get_memories(
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    ctx: DataContext = Depends(get_data_context)
 ):
     try:
         logger.info("="*50)
         logger.info("GET /memories/ endpoint called")
-        logger.info(f"Current user: {current_user}")
-        logger.info(f"User ID: {current_user.get('id')}")
-        logger.info(f"Token: {current_user.get('token')[:20]}...")
+        logger.info(f"User ID: {ctx.user_id}")
         
-        # Get authenticated Supabase client
-        supabase = get_authenticated_client(current_user["token"])
-        logger.info("Created authenticated Supabase client")
+        # Use the request's authenticated Supabase client
+        supabase = ctx.client
+        
+        # Revalidation: answer from the version summary without reading the rows.
+        # The list has no Last-Modified: deleting a memory does not advance
+        # MAX(updated_at), so If-Modified-Since could not detect it; the
+        # ETag (count, newest change, highest id) does.
+        if "if-none-match" in request.headers:
+            version = (await supabase_upstream.call(
+                supabase.rpc('get_memories_version_for_user', {}).execute,
+                idempotent=True,
+                hedge=True
+            )).data[0]
+            count = version['memory_count']
+            last_modified = parse_timestamp(version['last_updated'])
+            max_id = version['max_id']
+            etag = make_etag("memories", ctx.user_id, count, last_modified, max_id)
+            if is_not_modified(request, etag):
+                logger.info("Memories unchanged, returning 304")
+                return not_modified(etag)
         
         # Query memories using RPC
         logger.info("-"*50)
         logger.info("Querying memories...")
         
-        response = supabase.rpc(
-            'get_memories_for_user',
-            {'user_id': current_user["id"]}
-        ).execute()
+        # Parallel requests (list and timeline) share one query
+        rows = await memory_service.get_memory_rows(ctx)
             
-        logger.info(f"Raw Supabase response: {response}")
-        logger.info(f"Number of memories found: {len(response.data)}")
+        logger.info(f"Number of memories found: {len(rows)}")
         
         # Convert to Memory objects
         logger.info("-"*50)
         logger.info("Converting memories to objects...")
         memories = []
-        for memory_data in response.data:
+        for memory_data in rows:
             try:
-                # Use created_at as updated_at since we don't have an updated_at column
-                memory_data['updated_at'] = memory_data.get('created_at')
+                # Rows created before updated_at existed fall back to created_at
+                if not memory_data.get('updated_at'):
+                    memory_data['updated_at'] = memory_data.get('created_at')
                 memory = Memory(**memory_data)
                 memories.append(memory)
                 logger.info(f"Successfully converted memory {memory.id}")
@@ -102,10 +207,16 @@ async def get_memories(
                 logger.error(f"Error converting memory data: {str(e)}", exc_info=True)
                 logger.error(f"Memory data: {memory_data}")
         
+        count, last_modified, max_id = collection_version(rows, 'updated_at')
+        etag = make_etag("memories", ctx.user_id, count, last_modified, max_id)
+        response.headers.update(cache_headers(etag))
+        
         logger.info(f"Returning {len(memories)} memories")
         logger.info("="*50)
         return memories
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_memories endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
@@ -113,68 +224,112 @@ async def get_memories(
 @router.get("/{memory_id}", response_model=Memory)
 async def get_memory(
     memory_id: int,
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    ctx: DataContext = Depends(get_data_context)
 ):
     try:
-        return await memory_service.get_memory(memory_id, current_user["id"], current_user["token"])
+        memory = await memory_service.get_memory(memory_id, ctx)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Validators come from the row version, so a 304 skips serialization
+    etag = make_etag("memory", memory.id, memory.updated_at.isoformat())
+    if is_not_modified(request, etag, memory.updated_at):
+        return not_modified(etag, memory.updated_at)
+    response.headers.update(cache_headers(etag, memory.updated_at))
+    return memory
+
+@router.get("/{memory_id}/detail", response_model=MemoryDetail)
+async def get_memory_detail(
+    memory_id: int,
+    ctx: DataContext = Depends(get_data_context)
+):
+    """Get a memory with its media attachments and signed URLs in one call."""
+    try:
+        return await memory_service.get_memory_detail(memory_id, ctx)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/", response_model=Memory)
 async def create_memory(
     memory: MemoryCreate,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    ctx: DataContext = Depends(get_data_context)
 ):
     try:
-        return await memory_service.create_memory(memory, current_user["id"], current_user["token"])
+        created = await memory_service.create_memory(memory, ctx)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    embedding_service.schedule(background_tasks, [created], ctx.user_id, ctx.token)
+    return created
+
 @router.put("/{memory_id}", response_model=Memory)
 async def update_memory(
     memory_id: int,
     memory: MemoryCreate,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    ctx: DataContext = Depends(get_data_context)
 ):
     try:
-        return await memory_service.update_memory(memory_id, memory, current_user["id"], current_user["token"])
+        updated = await memory_service.update_memory(memory_id, memory, ctx)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    embedding_service.schedule(background_tasks, [updated], ctx.user_id, ctx.token)
+    return updated
+
 @router.delete("/{memory_id}")
 async def delete_memory(
     memory_id: int,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     try:
-        return await memory_service.delete_memory(memory_id, current_user["id"], current_user["token"])
+        return await memory_service.delete_memory(memory_id, ctx)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{memory_id}/media")
 async def get_memory_media(
     memory_id: int,
-    current_user: dict = Depends(get_current_user)
+    ctx: DataContext = Depends(get_data_context)
 ):
     """Get media for a specific memory."""
     try:
         logger.info(f"Fetching media for memory {memory_id}")
         
-        # Get authenticated Supabase client
-        supabase = get_authenticated_client(current_user["token"])
+        # Use the request's authenticated Supabase client
+        supabase = ctx.client
         
         # Query media using RPC
-        response = supabase.rpc(
-            'get_memory_media_for_user',
-            {
-                'memory_id': memory_id,
-                'user_id': current_user["id"]
-            }
-        ).execute()
+        response = await supabase_upstream.call(
+            supabase.rpc(
+                'get_memory_media_for_user',
+                {
+                    'memory_id': memory_id,
+                    'user_id': ctx.user_id
+                }
+            ).execute,
+            idempotent=True,
+            hedge=True
+        )
             
         logger.info(f"Media response data: {response.data}")
         return response.data
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_memory_media: {str(e)}", exc_info=True)
         raise HTTPException(
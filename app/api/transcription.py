@@ -19,6 +19,8 @@ async def transcribe_audio(
         if result is None:
             raise HTTPException(status_code=500, detail="Failed to transcribe audio")
         return {"text": result}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error transcribing audio: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
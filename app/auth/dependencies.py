@@ -1,29 +1,47 @@
 from fastapi import Request, HTTPException
 import logging
-from app.supabase.client import supabase
+from app.supabase.client import get_anon_client
+from app.core.config import settings
+from app.core.auth_cache import auth_cache
+from app.core.upstream import supabase_upstream
 
 logger = logging.getLogger(__name__)
 
-def verify_token(request: Request):
+async def verify_token(request: Request):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid auth token")
 
     token = auth_header.split(" ")[1]
 
+    if settings.AUTH_CACHE_ENABLED:
+        principal = await auth_cache.get_or_validate(token, _get_user)
+    else:
+        principal = await _get_user(token)
+
+    # Return the user data
+    return {
+        "sub": principal["id"],
+        "email": principal["email"],
+        "role": principal["role"]
+    }
+
+async def _get_user(token: str):
     try:
         # Use Supabase client to verify the token
-        user = supabase.auth.get_user(token)
+        user = await supabase_upstream.call(get_anon_client().auth.get_user, token, idempotent=True)
         
         # Log the user info for debugging
         logger.info(f"Verified user: {user}")
         
-        # Return the user data
         return {
-            "sub": user.user.id,
+            "id": user.user.id,
             "email": user.user.email,
             "role": user.user.role
         }
+    except HTTPException:
+        # Busy or unavailable upstream, not a verification failure
+        raise
     except Exception as e:
         logger.error(f"Token verification failed: {str(e)}")
         raise HTTPException(status_code=401, detail="Token verification failed")
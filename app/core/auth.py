@@ -1,7 +1,9 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.supabase.client import get_authenticated_client
+from app.supabase.client import get_anon_client
 from app.core.config import settings
+from app.core.upstream import supabase_upstream
+from app.core.auth_cache import auth_cache
 from jose import jwt, JWTError
 from typing import Optional, Dict, Any
 import logging
@@ -14,18 +16,37 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     """
     Validate the JWT token and return the user information.
     """
+    return await authenticate(credentials.credentials)
+
+async def authenticate(token: str) -> Dict[str, Any]:
+    """
+    Validate a bearer token (through the auth cache) and return the user information.
+    """
+    if settings.AUTH_CACHE_ENABLED:
+        principal = await auth_cache.get_or_validate(token, validate_token)
+    else:
+        principal = await validate_token(token)
+    return {
+        "id": principal["id"],
+        "email": principal["email"],
+        "token": token
+    }
+
+async def validate_token(token: str) -> Dict[str, Any]:
+    """
+    Check the token with Supabase and return the principal it belongs to.
+    """
     try:
         logger.info("Auth middleware: Starting token validation")
-        logger.info(f"Auth middleware: Token (first 20 chars): {credentials.credentials[:20]}...")
-        
-        token = credentials.credentials
-        supabase = get_authenticated_client(token)
-        logger.info("Auth middleware: Created authenticated client")
+        logger.info(f"Auth middleware: Token (first 20 chars): {token[:20]}...")
         
-        # Verify the token with Supabase
+        # Verify the token with Supabase through the shared anon client
         try:
-            user = supabase.auth.get_user(token)
+            user = await supabase_upstream.call(get_anon_client().auth.get_user, token, idempotent=True, hedge=True)
             logger.info(f"Auth middleware: User verification successful: {user}")
+        except HTTPException:
+            # Busy or unavailable upstream, not an authentication failure
+            raise
         except Exception as e:
             logger.error(f"Auth middleware: Error verifying user: {str(e)}", exc_info=True)
             raise HTTPException(
@@ -43,13 +64,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             )
         
         logger.info(f"Auth middleware: Token validated for user_id: {user.user.id}")
-        # Return a dictionary with user data and token
+        # Return a dictionary with user data; the token is added by the caller
+        # so it is not kept in the auth cache
         return {
             "id": user.user.id,
             "email": user.user.email,
-            "token": token
+            "role": user.user.role
         }
         
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         logger.error("Auth middleware: Token has expired")
         raise HTTPException(
@@ -0,0 +1,101 @@
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.singleflight import SingleFlight
+from collections import OrderedDict
+from jose import jwt, JWTError
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+lookups_total = registry.counter("auth_cache_lookups_total", "Auth cache lookups by outcome.", ("outcome",))
+
+class AuthCache:
+    """Bounded LRU cache of validated principals, keyed by a hash of the token.
+
+    Entries live for ``ttl`` seconds but never past the token's ``exp``
+    claim. Tokens the upstream rejected (401) are remembered for
+    ``negative_ttl`` seconds so a client retrying with a bad token does not
+    hit GoTrue each time. Concurrent misses for the same token share one
+    upstream check. Upstream failures (5xx) are never cached.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (expires at, principal or rejection)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._flights = SingleFlight()
+
+    def _key(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _token_ttl(self, token: str) -> float:
+        # Only called for tokens the upstream accepted, so the claims are trusted
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            return self.ttl
+        if exp is None:
+            return self.ttl
+        return min(self.ttl, float(exp) - time.time())
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_validate(self, token: str, validate: Callable[[str], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return the cached principal for ``token`` or validate it with ``validate``."""
+        key = self._key(token)
+        cached = self._lookup(key)
+        if isinstance(cached, HTTPException):
+            lookups_total.inc(outcome="negative_hit")
+            raise HTTPException(status_code=cached.status_code, detail=cached.detail, headers=cached.headers)
+        if cached is not None:
+            lookups_total.inc(outcome="hit")
+            return dict(cached)
+
+        lookups_total.inc(outcome="miss")
+
+        async def check() -> Dict[str, Any]:
+            try:
+                principal = await validate(token)
+            except HTTPException as e:
+                if e.status_code == 401:
+                    self._store(key, e, self.negative_ttl)
+                raise
+            self._store(key, dict(principal), self._token_ttl(token))
+            return principal
+
+        return dict(await self._flights.do(key, check))
+
+    def invalidate(self, token: str):
+        self._entries.pop(self._key(token), None)
+
+    def clear(self):
+        self._entries.clear()
+
+auth_cache = AuthCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    negative_ttl=settings.AUTH_CACHE_NEGATIVE_TTL_SECONDS,
+)
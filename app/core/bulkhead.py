@@ -0,0 +1,76 @@
+from fastapi import HTTPException
+from app.core.config import settings
+from typing import Any, Callable, TypeVar
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class BulkheadFull(HTTPException):
+    """Raised when an upstream has no capacity left; served as 503 with Retry-After."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is busy, please retry",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+class Bulkhead:
+    """Caps in-flight calls to one upstream within this worker process.
+
+    Callers wait at most ``max_wait`` seconds for a slot and at most
+    ``max_queue`` callers wait at once; anything beyond that is rejected
+    with ``BulkheadFull`` instead of queueing up latency.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self.max_concurrent - self._semaphore._value
+
+    async def acquire(self):
+        """Take a slot, waiting or rejecting as configured; pair with ``release``."""
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue:
+                logger.warning(f"Bulkhead {self.name} rejected a call: {self._waiting} already waiting")
+                raise BulkheadFull(self.name, self.max_wait)
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                logger.warning(f"Bulkhead {self.name} rejected a call after waiting {self.max_wait}s")
+                raise BulkheadFull(self.name, self.max_wait)
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+    def release(self):
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking upstream call in a worker thread, inside the bulkhead."""
+        async with self:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+openai_bulkhead = Bulkhead("OpenAI", settings.OPENAI_MAX_CONCURRENCY, settings.BULKHEAD_MAX_QUEUE, settings.BULKHEAD_MAX_WAIT_SECONDS)
+supabase_bulkhead = Bulkhead("Database", settings.SUPABASE_MAX_CONCURRENCY, settings.BULKHEAD_MAX_QUEUE, settings.BULKHEAD_MAX_WAIT_SECONDS)
+storage_bulkhead = Bulkhead("Storage", settings.STORAGE_MAX_CONCURRENCY, settings.BULKHEAD_MAX_QUEUE, settings.BULKHEAD_MAX_WAIT_SECONDS)
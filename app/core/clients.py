@@ -0,0 +1,35 @@
+from app.core.config import settings
+from typing import TYPE_CHECKING, Optional
+import threading
+
+if TYPE_CHECKING:
+    import openai
+
+# The OpenAI SDK is imported on first use: importing it is the largest part of
+# importing the app. One client is shared so its connection pool is reused.
+_openai_client: Optional["openai.OpenAI"] = None
+_lock = threading.Lock()
+
+def get_openai_client() -> "openai.OpenAI":
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                import openai
+
+                # Retries and timeouts are handled by openai_upstream
+                _openai_client = openai.OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                    max_retries=0
+                )
+    return _openai_client
+
+def close_openai_client():
+    """Close the shared client's connection pool, if the client was created."""
+    global _openai_client
+    with _lock:
+        client, _openai_client = _openai_client, None
+    if client is not None:
+        client.close()
@@ -1,9 +1,8 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import json
-import logging
-
-logger = logging.getLogger(__name__)
+import os
+import tempfile
 
 class Settings(BaseSettings):
     # API settings
@@ -16,17 +15,141 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000",  # Frontend development server (alternative)
     ]
     
+    # Response compression settings
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Bytes; smaller bodies are sent as is
+    GZIP_COMPRESSION_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4  # Used when the optional brotli package is installed
+    
     # Supabase settings
     SUPABASE_URL: str
     SUPABASE_KEY: str  # Anon key
     SUPABASE_SERVICE_KEY: str | None = None  # Service role key (optional)
     SUPABASE_JWT_SECRET: str
     
+    # Auth cache settings (validated tokens, keyed by a SHA-256 of the token)
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Capped at the token's exp; bounds how long a revoked token is accepted
+    AUTH_CACHE_NEGATIVE_TTL_SECONDS: int = 10  # How long rejected tokens are remembered
+    
     # OpenAI settings
     OPENAI_API_KEY: str
     
+    # Model routing settings (chat model per interviewer task, see app/core/model_router.py)
+    MODEL_TIERS: Dict[str, str] = {"fast": "gpt-4o-mini", "large": "gpt-4"}
+    MODEL_ROUTES: Dict[str, List[str]] = {  # Tiers tried in order; later ones are fallbacks
+        "follow_up": ["fast", "large"],
+        "summary": ["large", "fast"],
+        "title": ["fast", "large"],
+        "memory_draft": ["large", "fast"],  # Summary and title in one call
+    }
+    MODEL_LATENCY_SLOS: Dict[str, float] = {"follow_up": 4.0, "summary": 20.0, "title": 3.0, "memory_draft": 20.0}  # Seconds before falling back
+    MODEL_COST_SLOS: Dict[str, float] = {"follow_up": 0.002, "summary": 0.05, "title": 0.001, "memory_draft": 0.05}  # USD per call
+    MODEL_PRICES: Dict[str, List[float]] = {  # USD per million input and output tokens
+        "gpt-4o-mini": [0.15, 0.60],
+        "gpt-4": [30.0, 60.0],
+    }
+    
     # Storage settings
     MEDIA_BUCKET: str = "media"
+    SIGNED_URL_EXPIRES_IN: int = 3600  # Seconds a signed media URL stays valid
+    MAX_MEDIA_UPLOAD_BYTES: int = 50 * 1024 * 1024  # Largest direct-to-storage upload accepted
+    
+    # Media proxy settings (GET /api/media/{id}/content)
+    MEDIA_PROXY_ENABLED: bool = False
+    MEDIA_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "media-cache")
+    MEDIA_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # Disk cache size before LRU eviction
+    MEDIA_STREAM_CHUNK_SIZE: int = 64 * 1024
+    
+    # Bulk import settings
+    IMPORT_BATCH_SIZE: int = 500  # Memories inserted per RPC call
+    IMPORT_MEDIA_CONCURRENCY: int = 4  # Parallel media uploads per batch
+    
+    # Batch endpoint settings
+    BATCH_MAX_OPERATIONS: int = 50  # Operations accepted per POST /api/batch
+    
+    # Storage reaper settings (background deletion of media files)
+    STORAGE_REAPER_BATCH_SIZE: int = 100  # Paths removed per storage call
+    STORAGE_REAPER_INTERVAL_SECONDS: int = 30
+    STORAGE_REAPER_MAX_ATTEMPTS: int = 8
+    STORAGE_RECONCILE_INTERVAL_SECONDS: int = 86400
+    STORAGE_RECONCILE_GRACE_SECONDS: int = 3600  # Unreferenced objects younger than this are kept
+    
+    # Export settings
+    EXPORT_PAGE_SIZE: int = 200  # Rows fetched per keyset page
+    EXPORT_MEDIA_CONCURRENCY: int = 4  # Media downloads in flight per export
+    
+    # Rate limiting settings (token buckets per user)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_DEFAULT: str = "300/minute"  # Across all routes
+    RATE_LIMIT_ROUTES: Dict[str, str] = {
+        "POST /api/interview/continue": "20/minute",
+        "POST /api/interview/voice-turn": "20/minute",
+        "POST /api/interview/end": "10/minute",
+        "GET /api/interview/suggest-title/*": "10/minute",
+        "POST /api/transcription/transcribe": "20/minute",
+    }
+    RATE_LIMIT_REDIS_URL: str | None = None  # Share buckets across workers
+    
+    # Idempotency settings (Idempotency-Key on expensive POSTs, see app/core/idempotency.py)
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_ROUTES: List[str] = [
+        "POST /api/interview/continue",
+        "POST /api/interview/end",
+        "POST /api/transcription/transcribe",
+        "POST /api/media/upload",
+    ]
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0  # How long a completed response is replayed
+    IDEMPOTENCY_LOCK_SECONDS: float = 120.0  # Longest a first request that never finishes blocks its key
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # How long a duplicate waits for the first request before 409
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 1024 * 1024  # Larger responses are not recorded
+    IDEMPOTENCY_REDIS_URL: str | None = None  # Share records across workers
+    
+    # Upstream bulkheads (max in-flight calls per worker process)
+    OPENAI_MAX_CONCURRENCY: int = 8
+    SUPABASE_MAX_CONCURRENCY: int = 16
+    STORAGE_MAX_CONCURRENCY: int = 8
+    BULKHEAD_MAX_QUEUE: int = 32  # Callers allowed to wait for a slot
+    BULKHEAD_MAX_WAIT_SECONDS: float = 2.0
+    
+    # Upstream resilience settings (timeouts, hedging, circuit breakers)
+    REQUEST_TIMEOUT_SECONDS: float = 60.0  # Deadline for the upstream calls of one request
+    OPENAI_TIMEOUT_SECONDS: float = 30.0
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+    STORAGE_TIMEOUT_SECONDS: float = 60.0
+    SUPABASE_HEDGE_DELAY_SECONDS: float | None = 0.5  # Send a second read after this long; None disables
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive transient failures that open a circuit
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0
+    
+    # Semantic search settings
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_BATCH_SIZE: int = 100  # Texts per embeddings API call
+    VECTOR_INDEX: str = "pgvector"  # "pgvector", or "local" for an in-process index (tests, development)
+    SEARCH_RRF_K: int = 60  # Reciprocal rank fusion constant
+    
+    # Change feed worker settings (keeps embeddings and other derived indexes fresh)
+    EMBED_ON_WRITE: bool = False  # Embed in the API process instead (needed for VECTOR_INDEX=local)
+    CHANGE_FEED_BATCH_SIZE: int = 200  # Changes read per checkpoint
+    CHANGE_FEED_INTERVAL_SECONDS: int = 5
+    CHANGE_FEED_PRUNE_INTERVAL_SECONDS: int = 3600
+    BACKFILL_PARTITIONS: int = 4  # Backfill partitions processed in parallel
+    
+    # Startup settings (lifespan warm-up of SDK clients, DNS and connections)
+    STARTUP_WARMUP_ENABLED: bool = True
+    STARTUP_WARMUP_TIMEOUT_SECONDS: float = 5.0  # Per warm-up step
+
+    # Interview WebSocket settings (/api/interview/ws)
+    INTERVIEW_WS_AUTH_TIMEOUT_SECONDS: float = 10.0  # For the first (auth) message
+    INTERVIEW_WS_MAX_AUDIO_BYTES: int = 25 * 1024 * 1024  # Whisper's upload limit
+    
+    # Shutdown settings (SIGTERM drains in-flight work before closing pools)
+    SHUTDOWN_REQUEST_SECONDS: float = 15.0  # uvicorn's timeout_graceful_shutdown: in-flight requests get this long
+    SHUTDOWN_DRAIN_SECONDS: float = 10.0  # Then background jobs and workers get this long
+    SHUTDOWN_FLUSH_SECONDS: float = 5.0  # Per flush and close step
+    BACKGROUND_WORKERS: List[str] = []  # Workers run inside the API process: "storage_reaper", "change_feed"
+    
+    # Metrics settings
+    METRICS_ENABLED: bool = True  # Serve Prometheus metrics at /metrics
     
     class Config:
         env_file = ".env"
@@ -43,9 +166,6 @@ class Settings(BaseSettings):
                 # If not valid JSON, try to parse as comma-separated string
                 self.CORS_ORIGINS = [origin.strip() for origin in kwargs["CORS_ORIGINS"].split(",")]
 
+# Built at import: routers, middleware and the upstream wrappers read it
+# while the app is assembled, so it cannot wait for first use
 settings = Settings()
-
-# Log configuration on startup
-logger.info("Loading configuration...")
-logger.info(f"Supabase URL: {settings.SUPABASE_URL}")
-logger.info(f"Supabase Key: {settings.SUPABASE_KEY[:10]}...")
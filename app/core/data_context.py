@@ -0,0 +1,43 @@
+from fastapi import Depends
+from app.core.auth import get_current_user
+from app.supabase.client import close_client, create_user_client
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+class DataContext:
+    """Database access for one request, as the authenticated user.
+
+    The Supabase client is created on first use and shared by every service
+    the request calls, so a request builds one client and never re-checks
+    its already validated token.
+    """
+
+    def __init__(self, user_id: str, token: str, client: Optional["Client"] = None):
+        self.user_id = user_id
+        self.token = token
+        self._client = client
+
+    @property
+    def client(self) -> "Client":
+        if self._client is None:
+            self._client = create_user_client(self.token)
+        return self._client
+
+    def close(self):
+        """Close the connection pools of the client, if one was created."""
+        if self._client is not None:
+            close_client(self._client)
+
+async def get_data_context(current_user: Dict[str, Any] = Depends(get_current_user)) -> AsyncIterator[DataContext]:
+    """FastAPI dependency; resolved once per request and shared by all its dependants.
+
+    The client is closed when the endpoint returns, so streamed responses
+    and background tasks must not use it.
+    """
+    ctx = DataContext(user_id=current_user["id"], token=current_user["token"])
+    try:
+        yield ctx
+    finally:
+        ctx.close()
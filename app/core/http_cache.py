@@ -0,0 +1,103 @@
+from fastapi import Request, Response
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple, Union
+import hashlib
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the values that identify a representation version."""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def parse_timestamp(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """Parse a database timestamp (ISO string or datetime) into an aware datetime."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def collection_version(rows, timestamp_field: str):
+    """Return (count, newest timestamp, highest id) for a list of rows or models.
+
+    This is the same summary the ``get_*_version_for_user`` RPCs compute in
+    the database, so ETags built from either source match. The timestamp
+    only goes into the ETag: a delete does not advance it, so it must not
+    be sent as a collection's Last-Modified.
+    """
+    count = 0
+    last_modified = None
+    max_id = None
+    for row in rows:
+        values = row if isinstance(row, dict) else row.__dict__
+        count += 1
+        timestamp = parse_timestamp(values.get(timestamp_field))
+        if timestamp and (last_modified is None or timestamp > last_modified):
+            last_modified = timestamp
+        if max_id is None or values["id"] > max_id:
+            max_id = values["id"]
+    return count, last_modified, max_id
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Validator headers for a response; clients must revalidate before reuse."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since as described in RFC 7232."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; it uses weak comparison
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, last_modified))
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` Range header into an inclusive (start, end).
+
+    Returns None when the whole representation should be sent (no header,
+    other units or multiple ranges) and raises ValueError when the range
+    cannot be satisfied.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise ValueError("Unsatisfiable range")
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError("Unsatisfiable range")
+    if start < 0 or start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
@@ -0,0 +1,324 @@
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import registry
+from app.core.rate_limit import token_subject
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import logging
+import orjson
+import time
+import uuid
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional, the in-memory store needs nothing
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+requests_total = registry.counter("idempotent_requests_total", "Requests with an Idempotency-Key, by outcome.", ("route", "outcome"))
+
+MAX_KEY_LENGTH = 255
+
+class MemoryIdempotencyStore:
+    """Idempotency records held in process memory (one worker process)."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._records: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    async def begin(self, key: str, record: Dict[str, Any], ttl: float) -> Optional[Dict[str, Any]]:
+        """Store ``record`` unless ``key`` has one; returns the existing record, else None."""
+        existing = self._get(key)
+        if existing is not None:
+            return existing
+        if len(self._records) >= self.max_keys:
+            self._prune()
+        self._records[key] = (time.monotonic() + ttl, record)
+        return None
+
+    async def complete(self, key: str, token: str, record: Dict[str, Any], ttl: float):
+        """Replace the in-progress record ``token`` created with the result."""
+        current = self._get(key)
+        if current is None or current.get("token") == token:
+            self._records[key] = (time.monotonic() + ttl, record)
+        self._notify(key)
+
+    async def release(self, key: str, token: str):
+        """Drop the in-progress record ``token`` created, so the request can be retried."""
+        current = self._get(key)
+        if current is not None and current.get("token") == token:
+            del self._records[key]
+        self._notify(key)
+
+    async def wait(self, key: str, timeout: float):
+        """Return when ``key``'s record may have changed, or after ``timeout``."""
+        event = self._changed.setdefault(key, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def close(self):
+        self._records.clear()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._records[key]
+            return None
+        return entry[1]
+
+    def _notify(self, key: str):
+        event = self._changed.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._records.items() if expires <= now]:
+            del self._records[key]
+
+class RedisIdempotencyStore:
+    """Idempotency records shared by all workers through Redis (or a compatible server)."""
+
+    # Replace (or with no record, delete) the record if it is still the given token's
+    SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and cjson.decode(current)['token'] ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+end
+return 1
+"""
+
+    def __init__(self, url: str, prefix: str = "idempotency:", poll_interval: float = 0.1):
+        if redis is None:
+            raise RuntimeError("The redis package is required for IDEMPOTENCY_REDIS_URL")
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def begin(self, key: str, record: Dict[str, Any], ttl: float) -> Optional[Dict[str, Any]]:
+        while True:
+            if await self._client.set(self.prefix + key, orjson.dumps(record), px=int(ttl * 1000), nx=True):
+                return None
+            existing = await self._client.get(self.prefix + key)
+            # Expired between the two calls: try again
+            if existing is not None:
+                return orjson.loads(existing)
+
+    async def complete(self, key: str, token: str, record: Dict[str, Any], ttl: float):
+        await self._script(keys=[self.prefix + key], args=[token, orjson.dumps(record), int(ttl * 1000)])
+
+    async def release(self, key: str, token: str):
+        await self._script(keys=[self.prefix + key], args=[token, "", 0])
+
+    async def wait(self, key: str, timeout: float):
+        # Other workers' results are not announced; poll
+        await asyncio.sleep(min(timeout, self.poll_interval))
+
+    async def close(self):
+        await self._client.aclose()
+
+class IdempotencyMiddleware:
+    """Run a request carrying an ``Idempotency-Key`` once, replaying its response to retries.
+
+    Applies to the ``"METHOD /path"`` routes in ``routes``. The first request
+    with a key records that it is in progress (for up to ``lock_ttl``);
+    duplicates arriving meanwhile wait for it, for up to ``wait_timeout``,
+    and get 409 with ``Retry-After`` if it is still running. A successful
+    (2xx) response of up to ``max_response_bytes`` is kept for ``ttl`` and
+    replayed with ``Idempotent-Replayed: true``; anything else is dropped so
+    a retry runs the request again. Keys are scoped to the caller and the
+    route, and reusing one with a different request body gets 422.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store,
+        routes: Iterable[str],
+        ttl: float,
+        lock_ttl: float,
+        wait_timeout: float,
+        max_response_bytes: int,
+        jwt_secret: Optional[str] = None
+    ):
+        self.app = app
+        self.store = store
+        self.routes = set(routes)
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.max_response_bytes = max_response_bytes
+        self.jwt_secret = jwt_secret
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = f"{scope['method']} {scope['path'].rstrip('/') or '/'}"
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get("idempotency-key")
+        if route not in self.routes or idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        caller = self._caller(scope, headers)
+        if caller is None:
+            # Unauthenticated; the route rejects it anyway
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._reject(scope, receive, send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        body, receive = await self._read_body(headers, receive)
+        fingerprint = self._fingerprint(scope, headers, body)
+        key = f"{caller}:{route}:{idempotency_key}"
+        token = uuid.uuid4().hex
+        pending = {"state": "in_progress", "token": token, "fingerprint": fingerprint}
+
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                existing = await self.store.begin(key, pending, self.lock_ttl)
+            except Exception as e:
+                # Fail open: an unavailable store must not take the API down
+                logger.error(f"Idempotency store error: {str(e)}")
+                await self.app(scope, receive, send)
+                return
+            if existing is None:
+                break
+            if existing["fingerprint"] != fingerprint:
+                requests_total.inc(route=route, outcome="mismatch")
+                await self._reject(scope, receive, send, 422, "Idempotency-Key was already used for a different request")
+                return
+            if existing["state"] == "completed":
+                requests_total.inc(route=route, outcome="replayed")
+                await self._replay(existing, send)
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                requests_total.inc(route=route, outcome="conflict")
+                await self._reject(scope, receive, send, 409, "A request with this Idempotency-Key is still in progress", {"Retry-After": "1"})
+                return
+            await self.store.wait(key, remaining)
+
+        requests_total.inc(route=route, outcome="executed")
+        await self._execute(key, token, fingerprint, scope, receive, send)
+
+    async def _execute(self, key: str, token: str, fingerprint: str, scope: Scope, receive: Receive, send: Send):
+        status = None
+        response_headers: List[List[str]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        async def capture(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.extend([name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", []))
+            elif message["type"] == "http.response.body" and size <= self.max_response_bytes:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                chunks.append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            await self._release(key, token)
+            raise
+
+        if status is None or not 200 <= status < 300 or size > self.max_response_bytes:
+            await self._release(key, token)
+            return
+        record = {
+            "state": "completed",
+            "token": token,
+            "fingerprint": fingerprint,
+            "status": status,
+            "headers": response_headers,
+            "body": base64.b64encode(b"".join(chunks)).decode(),
+        }
+        try:
+            await self.store.complete(key, token, record, self.ttl)
+        except Exception as e:
+            logger.error(f"Idempotency store error, response not recorded: {str(e)}")
+
+    async def _release(self, key: str, token: str):
+        try:
+            await self.store.release(key, token)
+        except Exception as e:
+            logger.error(f"Idempotency store error, key stays locked until it expires: {str(e)}")
+
+    def _caller(self, scope: Scope, headers: Headers) -> Optional[str]:
+        subject = token_subject(scope, self.jwt_secret)
+        if subject:
+            return f"user:{subject}"
+        authorization = headers.get("authorization")
+        if authorization:
+            return f"token:{hashlib.sha256(authorization.encode()).hexdigest()}"
+        return None
+
+    async def _read_body(self, headers: Headers, receive: Receive) -> Tuple[Optional[bytes], Receive]:
+        # Multipart bodies (uploads) are not read: clients pick a new boundary
+        # on each retry, so their bytes cannot identify the request anyway
+        if headers.get("content-type", "").startswith("multipart/"):
+            return None, receive
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    def _fingerprint(self, scope: Scope, headers: Headers, body: Optional[bytes]) -> str:
+        digest = hashlib.sha256(f"{scope['method']} {scope['path']}?{scope.get('query_string', b'').decode('latin-1')}".encode())
+        if body is None:
+            digest.update(f"\x00{headers.get('content-type', '').partition(';')[0]}".encode())
+        else:
+            digest.update(b"\x00" + body)
+        return digest.hexdigest()
+
+    async def _replay(self, record: Dict[str, Any], send: Send):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
+        response = ORJSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+        await response(scope, receive, send)
+
+def create_store(redis_url: Optional[str] = None):
+    if redis_url:
+        return RedisIdempotencyStore(redis_url)
+    return MemoryIdempotencyStore()
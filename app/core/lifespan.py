@@ -0,0 +1,95 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.core.clients import close_openai_client, get_openai_client
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.resources import resources
+from app.supabase.client import close_anon_client, get_anon_client
+from typing import List
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+warmup_seconds = registry.gauge("startup_warmup_seconds", "Time spent warming up at startup, by step.", ("step",))
+
+def _create_clients():
+    # Importing the SDKs happens here, off the event loop
+    get_openai_client()
+    get_anon_client()
+
+def _upstream_hosts() -> List[str]:
+    hosts = [get_openai_client().base_url.host, urlsplit(settings.SUPABASE_URL).hostname]
+    return [host for host in dict.fromkeys(hosts) if host]
+
+async def _resolve(host: str):
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+    except OSError as e:
+        logger.warning(f"Could not resolve {host} at startup: {str(e)}")
+
+async def _resolve_hosts():
+    await asyncio.gather(*(_resolve(host) for host in _upstream_hosts()))
+
+def _connect_openai():
+    # Any request opens a keep-alive connection in the shared client's pool;
+    # listing models is cheap and needs no input
+    get_openai_client().with_options(timeout=settings.STARTUP_WARMUP_TIMEOUT_SECONDS).models.list()
+
+async def _timed(step: str, awaitable):
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(awaitable, timeout=settings.STARTUP_WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Startup warm-up step {step} failed: {str(e) or type(e).__name__}")
+    finally:
+        warmup_seconds.set(time.monotonic() - started, step=step)
+
+async def warm_up():
+    """Do the work the first requests would otherwise pay for.
+
+    Imports the OpenAI and Supabase SDKs and creates the shared clients,
+    resolves the upstream hosts so the resolver cache is warm, and opens a
+    connection in the OpenAI client's pool. Every step is bounded by
+    ``STARTUP_WARMUP_TIMEOUT_SECONDS`` and a failed step only logs: the
+    clients are still created on first use.
+    """
+    started = time.monotonic()
+    await _timed("clients", asyncio.to_thread(_create_clients))
+    await _timed("dns", _resolve_hosts())
+    await _timed("connections", asyncio.to_thread(_connect_openai))
+    logger.info(f"Startup warm-up finished in {time.monotonic() - started:.2f}s")
+
+def _start_workers():
+    # Imported here so the API does not load worker code it does not run
+    for name in settings.BACKGROUND_WORKERS:
+        if name == "storage_reaper":
+            from app.workers.storage_reaper import StorageReaper
+            resources.start_worker(name, StorageReaper().run)
+        elif name == "change_feed":
+            from app.workers.change_feed import ChangeFeedWorker
+            resources.start_worker(name, ChangeFeedWorker().run)
+        else:
+            logger.error(f"Unknown background worker {name}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up on startup; on shutdown drain work and release resources.
+
+    The server has already drained requests when this shuts down. The
+    shared clients are closed last, after jobs and workers that may still
+    use them have finished (see ``Resources.shutdown``).
+    """
+    resources.on_close("OpenAI client", close_openai_client)
+    resources.on_close("Supabase client", close_anon_client)
+    if settings.STARTUP_WARMUP_ENABLED:
+        await warm_up()
+    _start_workers()
+    try:
+        yield
+    finally:
+        await resources.shutdown(settings.SHUTDOWN_DRAIN_SECONDS, settings.SHUTDOWN_FLUSH_SECONDS)
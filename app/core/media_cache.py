@@ -0,0 +1,158 @@
+from app.core.config import settings
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import anyio
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class MediaCache:
+    """LRU cache of storage objects on local disk, capped at ``max_bytes``.
+
+    Objects are written to a temporary file while they stream in and are
+    renamed into place once complete, so readers never see partial files.
+    Evicted files are unlinked; readers that already opened them keep
+    reading from their file handle.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        # Per-key fill locks and how many callers are using each; a lock is
+        # dropped only when none are, so every caller for a key shares it
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._loaded = False
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        # Files left by a previous process; unfinished downloads are removed
+        os.makedirs(self.directory, exist_ok=True)
+        existing = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            existing.append((stat.st_atime, entry.name, stat.st_size))
+        return existing
+
+    async def _load(self):
+        existing = await asyncio.to_thread(self._scan)
+        if self._loaded:
+            # Another caller loaded the cache while this one was scanning
+            return
+        # Oldest access first
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._size += size
+        self._loaded = True
+        await self._evict()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _remove(self, paths: List[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def _evict(self):
+        # Bookkeeping first, so no other caller can pick an evicted entry
+        # while its file is being removed
+        evicted = []
+        while self._size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            evicted.append(self._path(name))
+            logger.info(f"Evicted {name} ({size} bytes) from media cache")
+        if evicted:
+            await asyncio.to_thread(self._remove, evicted)
+
+    async def open(self, key: str, fetch: Callable[[], AsyncIterator[bytes]]) -> Tuple[anyio.AsyncFile, int]:
+        """Open the cached object for ``key``, fetching it on a miss.
+
+        ``fetch`` returns an async iterator of the object's bytes. Concurrent
+        misses for the same key share one fetch. Returns the open file and
+        its size; the caller closes the file.
+        """
+        if not self._loaded:
+            await self._load()
+
+        name = hashlib.sha256(key.encode()).hexdigest()
+        while True:
+            if name not in self._entries:
+                await self._fill_once(name, fetch)
+            else:
+                logger.info(f"Media cache hit for {key}")
+
+            # Open before evicting so an oversized object can still be served
+            self._entries.move_to_end(name)
+            size = self._entries[name]
+            try:
+                file = await anyio.open_file(self._path(name), "rb")
+                break
+            except FileNotFoundError:
+                # Evicted (or removed from disk) while it was being opened
+                if self._entries.get(name) == size:
+                    del self._entries[name]
+                    self._size -= size
+
+        await self._evict()
+        return file, size
+
+    async def _fill_once(self, name: str, fetch: Callable[[], AsyncIterator[bytes]]):
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        self._lock_users[name] = self._lock_users.get(name, 0) + 1
+        try:
+            async with lock:
+                if name not in self._entries:
+                    await self._fill(name, fetch)
+        finally:
+            self._lock_users[name] -= 1
+            if not self._lock_users[name]:
+                del self._lock_users[name]
+                del self._locks[name]
+
+    async def _fill(self, name: str, fetch: Callable[[], AsyncIterator[bytes]]):
+        path = self._path(name)
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        size = 0
+        try:
+            async with await anyio.open_file(partial, "wb") as out:
+                async for chunk in fetch():
+                    await out.write(chunk)
+                    size += len(chunk)
+            await asyncio.to_thread(os.replace, partial, path)
+        except BaseException:
+            await asyncio.to_thread(self._remove, [partial])
+            raise
+        self._entries[name] = size
+        self._size += size
+        logger.info(f"Cached {name} ({size} bytes), media cache holds {self._size} bytes")
+
+async def iter_file(file: anyio.AsyncFile, start: int, end: int, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Stream the inclusive byte range [start, end] of an open file, then close it."""
+    chunk_size = chunk_size or settings.MEDIA_STREAM_CHUNK_SIZE
+    try:
+        await file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await file.aclose()
+
+media_cache = MediaCache(settings.MEDIA_CACHE_DIR, settings.MEDIA_CACHE_MAX_BYTES)
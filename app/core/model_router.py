@@ -0,0 +1,110 @@
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.upstream import UpstreamTimeout, UpstreamUnavailable, openai_upstream
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+calls_total = registry.counter("model_route_calls_total", "Chat model calls by task, model and outcome.", ("task", "model", "outcome"))
+latency_seconds = registry.counter("model_route_latency_seconds_total", "Time spent in successful chat model calls.", ("task", "model"))
+tokens_total = registry.counter("model_route_tokens_total", "Tokens used by chat model calls.", ("task", "model", "kind"))
+cost_total = registry.counter("model_route_cost_usd_total", "Estimated cost of chat model calls in USD.", ("task", "model"))
+slo_breaches_total = registry.counter("model_route_slo_breaches_total", "Calls that missed their task's latency or cost SLO.", ("task", "slo"))
+
+class ModelRouter:
+    """Picks the chat model for each task and falls back when it is too slow.
+
+    ``routes`` maps a task to model tiers tried in order, ``tiers`` maps a
+    tier to a model. A tier that has a fallback gets the task's latency SLO
+    as its deadline; when it misses it, or its upstream is unavailable, the
+    next tier is tried. The last tier runs with the upstream's own timeout.
+    Each call's latency and estimated cost (from token usage and ``prices``)
+    is recorded per task and model and checked against the task's SLOs.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, str],
+        routes: Dict[str, List[str]],
+        latency_slos: Dict[str, float],
+        cost_slos: Dict[str, float],
+        prices: Dict[str, List[float]]
+    ):
+        self.tiers = tiers
+        self.routes = routes
+        self.latency_slos = latency_slos
+        self.cost_slos = cost_slos
+        self.prices = prices
+
+    def models(self, task: str) -> List[str]:
+        if task not in self.routes:
+            raise ValueError(f"No model route for task {task}")
+        return [self.tiers.get(tier, tier) for tier in self.routes[task]]
+
+    async def complete(self, task: str, create: Callable[..., Any], **kwargs: Any) -> Any:
+        """Call ``create`` (chat.completions.create) with the task's model, falling back as needed."""
+        models = self.models(task)
+        latency_slo = self.latency_slos.get(task)
+        for index, model in enumerate(models):
+            fallback = models[index + 1] if index + 1 < len(models) else None
+            started = time.monotonic()
+            try:
+                call = openai_upstream.call(create, idempotent=True, model=model, **kwargs)
+                if fallback and latency_slo:
+                    response = await asyncio.wait_for(call, timeout=latency_slo)
+                else:
+                    response = await call
+            except (asyncio.TimeoutError, UpstreamTimeout, UpstreamUnavailable) as e:
+                if not fallback:
+                    calls_total.inc(task=task, model=model, outcome="error")
+                    raise
+                calls_total.inc(task=task, model=model, outcome="fallback")
+                logger.warning(f"{model} did not answer {task} in time ({type(e).__name__}), falling back to {fallback}")
+                continue
+            except Exception:
+                calls_total.inc(task=task, model=model, outcome="error")
+                raise
+
+            self._record(task, model, time.monotonic() - started, response)
+            return response
+
+    def _record(self, task: str, model: str, elapsed: float, response: Any):
+        calls_total.inc(task=task, model=model, outcome="success")
+        latency_seconds.inc(elapsed, task=task, model=model)
+        latency_slo = self.latency_slos.get(task)
+        if latency_slo and elapsed > latency_slo:
+            slo_breaches_total.inc(task=task, slo="latency")
+
+        # Streamed responses carry no usage
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        tokens_total.inc(usage.prompt_tokens, task=task, model=model, kind="prompt")
+        tokens_total.inc(usage.completion_tokens, task=task, model=model, kind="completion")
+
+        cost = self.cost(model, usage.prompt_tokens, usage.completion_tokens)
+        if cost is None:
+            return
+        cost_total.inc(cost, task=task, model=model)
+        cost_slo = self.cost_slos.get(task)
+        if cost_slo and cost > cost_slo:
+            slo_breaches_total.inc(task=task, slo="cost")
+            logger.warning(f"{task} on {model} cost ${cost:.4f}, over its ${cost_slo:.4f} SLO")
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        """Estimated USD cost of a call, or None without a price for the model."""
+        price = self.prices.get(model)
+        if not price:
+            return None
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+model_router = ModelRouter(
+    tiers=settings.MODEL_TIERS,
+    routes=settings.MODEL_ROUTES,
+    latency_slos=settings.MODEL_LATENCY_SLOS,
+    cost_slos=settings.MODEL_COST_SLOS,
+    prices=settings.MODEL_PRICES,
+)
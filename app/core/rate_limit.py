@@ -0,0 +1,179 @@
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from jose import jwt, JWTError
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import time
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional, the in-memory backend needs nothing
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+def parse_limit(limit: str) -> Tuple[float, int]:
+    """Parse ``"20/minute"`` into (tokens per second, bucket capacity)."""
+    count, _, unit = limit.partition("/")
+    count = int(count)
+    period = UNITS[unit.strip().rstrip("s")]
+    return count / period, count
+
+def token_subject(scope: Scope, jwt_secret: Optional[str]) -> Optional[str]:
+    """The ``sub`` of the request's bearer token, if it is validly signed."""
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token and jwt_secret:
+        try:
+            claims = jwt.decode(token, jwt_secret, algorithms=["HS256"], options={"verify_aud": False})
+            return claims.get("sub") or None
+        except JWTError:
+            pass
+    return None
+
+class MemoryRateLimitBackend:
+    """Token buckets held in process memory (one worker process)."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def close(self):
+        self._buckets.clear()
+
+    async def acquire(self, key: str, rate: float, capacity: int, cost: int = 1) -> float:
+        """Take ``cost`` tokens; returns 0 when allowed, else seconds until they are available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now, rate, capacity)
+            bucket = self._buckets[key] = [float(capacity), now]
+
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return 0.0
+        bucket[0] = tokens
+        return (cost - tokens) / rate
+
+    def _prune(self, now: float, rate: float, capacity: int):
+        # Buckets that have refilled completely carry no state worth keeping
+        idle = capacity / rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= idle]:
+            del self._buckets[key]
+
+class RedisRateLimitBackend:
+    """Token buckets shared by all workers through Redis (or a compatible server)."""
+
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if redis is None:
+            raise RuntimeError("The redis package is required for RATE_LIMIT_REDIS_URL")
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def acquire(self, key: str, rate: float, capacity: int, cost: int = 1) -> float:
+        try:
+            wait = await self._script(keys=[self.prefix + key], args=[capacity, rate, cost])
+            return float(wait)
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down
+            logger.error(f"Rate limit backend error: {str(e)}")
+            return 0.0
+
+    async def close(self):
+        await self._client.aclose()
+
+class RateLimitMiddleware:
+    """Per-user token-bucket rate limiting with optional per-route limits.
+
+    Every request takes a token from the caller's default bucket, and
+    requests matching ``route_limits`` (keyed ``"METHOD /path"``, where a
+    trailing ``*`` matches any suffix) also take one from that route's
+    bucket. Callers are identified by the ``sub`` of a validly signed bearer
+    token, falling back to the client address. Rejected requests get 429
+    with ``Retry-After``.
+    """
+
+    def __init__(self, app: ASGIApp, backend, default_limit: str, route_limits: Optional[Dict[str, str]] = None, jwt_secret: Optional[str] = None):
+        self.app = app
+        self.backend = backend
+        self.default_limit = parse_limit(default_limit)
+        self.route_limits = {}
+        self.prefix_limits = []
+        for route, limit in (route_limits or {}).items():
+            if route.endswith("*"):
+                self.prefix_limits.append((route[:-1], route, parse_limit(limit)))
+            else:
+                self.route_limits[route] = parse_limit(limit)
+        self.jwt_secret = jwt_secret
+
+    def _identity(self, scope: Scope) -> str:
+        subject = token_subject(scope, self.jwt_secret)
+        if subject:
+            return f"user:{subject}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        identity = self._identity(scope)
+        route = f"{scope['method']} {scope['path'].rstrip('/') or '/'}"
+        checks = []
+        if route in self.route_limits:
+            checks.append((f"{identity}:{route}", self.route_limits[route]))
+        else:
+            for prefix, pattern, limit in self.prefix_limits:
+                if route.startswith(prefix):
+                    checks.append((f"{identity}:{pattern}", limit))
+                    break
+        checks.append((identity, self.default_limit))
+
+        for key, (rate, capacity) in checks:
+            wait = await self.backend.acquire(key, rate, capacity)
+            if wait > 0:
+                logger.info(f"Rate limit exceeded for {key}, retry in {wait:.1f}s")
+                response = ORJSONResponse(
+                    {"detail": "Rate limit exceeded"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+def create_backend(redis_url: Optional[str] = None):
+    if redis_url:
+        return RedisRateLimitBackend(redis_url)
+    return MemoryRateLimitBackend()
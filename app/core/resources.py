@@ -0,0 +1,134 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.metrics import registry
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Set, Tuple
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+shutdown_seconds = registry.gauge("shutdown_seconds", "Time spent in the last shutdown, by phase.", ("phase",))
+requests_in_flight = registry.gauge("http_requests_in_flight", "Requests (and WebSockets) being served.")
+
+class Resources:
+    """Everything the app owns for its lifetime, released in order on shutdown.
+
+    Requests are drained by the server before the lifespan shuts down: on
+    SIGTERM uvicorn stops accepting connections, closes WebSockets (1012)
+    and waits up to its ``timeout_graceful_shutdown``
+    (``SHUTDOWN_REQUEST_SECONDS``) for in-flight requests. Shutdown then
+    waits for background jobs and stops the workers, within one drain
+    deadline (``SHUTDOWN_DRAIN_SECONDS``). It runs the flush hooks
+    (write-behind buffers), which get their own timeout even when draining
+    ran out of time, and finally closes pools and clients in reverse order
+    of registration.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._jobs: Set[asyncio.Task] = set()
+        self._workers: Dict[str, Tuple[asyncio.Task, asyncio.Event]] = {}
+        self._flushers: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Callable[[], Any]] = {}
+
+    def on_flush(self, name: str, flush: Callable[[], Any]):
+        """Run ``flush`` (sync or async) once requests and jobs have drained."""
+        self._flushers[name] = flush
+
+    def on_close(self, name: str, close: Callable[[], Any]):
+        """Run ``close`` (sync or async) last; closers run in reverse order."""
+        self._closers.pop(name, None)
+        self._closers[name] = close
+
+    def spawn(self, coro: Coroutine[Any, Any, Any], name: Optional[str] = None) -> asyncio.Task:
+        """Run a background job that shutdown waits for."""
+        task = asyncio.create_task(coro, name=name)
+        self._jobs.add(task)
+        task.add_done_callback(self._job_done)
+        return task
+
+    def _job_done(self, task: asyncio.Task):
+        self._jobs.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background job {task.get_name()} failed: {str(task.exception())}", exc_info=task.exception())
+
+    def start_worker(self, name: str, run: Callable[[asyncio.Event], Awaitable[Any]]):
+        """Run a long-lived worker; ``run(stop)`` must return soon after ``stop`` is set."""
+        stop = asyncio.Event()
+        self._workers[name] = (asyncio.create_task(run(stop), name=name), stop)
+        logger.info(f"Started background worker {name}")
+
+    def request_started(self):
+        self.in_flight += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    async def shutdown(self, drain_timeout: float, flush_timeout: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        if self.in_flight:
+            # The server gave up on them; their jobs and clients go away below
+            logger.warning(f"Shutting down with {self.in_flight} requests still running")
+        logger.info(f"Shutting down: draining {len(self._jobs)} jobs and {len(self._workers)} workers")
+
+        started = time.monotonic()
+        for _, stop in self._workers.values():
+            stop.set()
+        pending = list(self._jobs) + [task for task, _ in self._workers.values()]
+        if pending:
+            await self._wait("jobs and workers", asyncio.wait(pending), deadline)
+            for task in pending:
+                if not task.done():
+                    logger.warning(f"Cancelling {task.get_name()}, still running at the drain deadline")
+                    task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._workers.clear()
+        shutdown_seconds.set(time.monotonic() - started, phase="drain")
+
+        started = time.monotonic()
+        for name, flush in self._flushers.items():
+            await self._run(name, flush, flush_timeout)
+        shutdown_seconds.set(time.monotonic() - started, phase="flush")
+
+        started = time.monotonic()
+        for name, close in reversed(list(self._closers.items())):
+            await self._run(name, close, flush_timeout)
+        shutdown_seconds.set(time.monotonic() - started, phase="close")
+        logger.info("Shutdown complete")
+
+    async def _wait(self, what: str, awaitable: Awaitable[Any], deadline: float):
+        try:
+            await asyncio.wait_for(awaitable, timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain deadline reached while waiting for {what}")
+
+    async def _run(self, name: str, func: Callable[[], Any], timeout: float):
+        try:
+            result = func()
+            if inspect.isawaitable(result):
+                await asyncio.wait_for(result, timeout=timeout)
+        except Exception as e:
+            logger.error(f"Shutdown step {name} failed: {str(e) or type(e).__name__}", exc_info=True)
+
+class InFlightMiddleware:
+    """Count the requests and WebSockets being served (``http_requests_in_flight``)."""
+
+    def __init__(self, app: ASGIApp, resources: "Resources"):
+        self.app = app
+        self.resources = resources
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        self.resources.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.resources.request_finished()
+
+resources = Resources()
+requests_in_flight.set_function(lambda: resources.in_flight)
@@ -0,0 +1,58 @@
+from app.core.metrics import registry
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+import asyncio
+import copy
+
+T = TypeVar("T")
+
+reads_total = registry.counter("coalesced_reads_total", "Service reads by operation, and whether they ran or joined an identical one.", ("operation", "outcome"))
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller starts the call; callers arriving while it is in flight
+    await the same result (or exception). The call runs in its own task, so
+    a caller that is cancelled does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable):
+        """Make later callers start a new call; callers already waiting still share the current one."""
+        self._calls.pop(key, None)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+_reads = SingleFlight()
+
+async def coalesce_read(operation: str, user_id: str, params: Tuple[Hashable, ...], func: Callable[[], Awaitable[T]]) -> T:
+    """Run a read once for all identical concurrent callers.
+
+    Calls are identical when they have the same operation, user and
+    parameters. Each caller gets its own deep copy of the result, so one
+    mutating it cannot affect the others. Writes must call ``forget_read``
+    so reads issued after them do not join a read that started before.
+    """
+    key = (operation, user_id, params)
+    reads_total.inc(operation=operation, outcome="joined" if _reads.in_flight(key) else "ran")
+    return copy.deepcopy(await _reads.do(key, func))
+
+def forget_read(operation: str, user_id: str, params: Tuple[Hashable, ...] = ()):
+    _reads.forget((operation, user_id, params))
@@ -0,0 +1,327 @@
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.bulkhead import Bulkhead, openai_bulkhead, supabase_bulkhead, storage_bulkhead
+from app.core.config import settings
+from app.core.metrics import registry
+from contextvars import ContextVar
+from typing import Any, Callable, Optional, TypeVar
+import asyncio
+import functools
+import logging
+import math
+import random
+import sys
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+calls_total = registry.counter("upstream_calls_total", "Upstream calls by outcome.", ("upstream", "outcome"))
+retries_total = registry.counter("upstream_retries_total", "Upstream call attempts that were retried.", ("upstream",))
+hedges_total = registry.counter("upstream_hedges_total", "Hedged upstream requests sent.", ("upstream",))
+circuit_state = registry.gauge("upstream_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open).", ("upstream",))
+in_flight = registry.gauge("upstream_in_flight", "Upstream calls currently in flight.", ("upstream",))
+
+# Deadline (time.monotonic) of the request being served
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def lift_deadline():
+    """Drop the request deadline for the rest of the current task.
+
+    For streamed responses that may outlive it (exports); each upstream
+    call is still bounded by its per-attempt timeout.
+    """
+    _deadline.set(None)
+
+class UpstreamTimeout(HTTPException):
+    def __init__(self, name: str):
+        super().__init__(status_code=504, detail=f"{name} did not respond in time")
+
+class UpstreamUnavailable(HTTPException):
+    def __init__(self, name: str, retry_after: Optional[float] = None):
+        headers = {"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after else None
+        super().__init__(status_code=503, detail=f"{name} is unavailable, please retry", headers=headers)
+
+class DeadlineMiddleware:
+    """Give every request a deadline that upstream calls made for it respect.
+
+    Clients may ask for a shorter budget with ``X-Request-Timeout`` (seconds);
+    it is capped at ``REQUEST_TIMEOUT_SECONDS``.
+    """
+
+    def __init__(self, app: ASGIApp, timeout: float):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self.timeout
+        requested = Headers(scope=scope).get("x-request-timeout")
+        if requested:
+            try:
+                timeout = min(timeout, max(0.0, float(requested)))
+            except ValueError:
+                pass
+
+        token = _deadline.set(time.monotonic() + timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+class CircuitBreaker:
+    """Fails fast once an upstream keeps failing, probing again after a cool-down."""
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        circuit_state.set_function(lambda: self.state, upstream=name)
+
+    @property
+    def state(self) -> int:
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self):
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self.probing):
+            retry_after = self.recovery_timeout - (time.monotonic() - self.opened_at)
+            raise UpstreamUnavailable(self.name, retry_after)
+        if state == self.HALF_OPEN:
+            # Let a single probe through
+            self.probing = True
+
+    def record_success(self):
+        if self.failures >= self.failure_threshold:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.failure_threshold:
+            if self.failures == self.failure_threshold:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+class Upstream:
+    """Shared wrapper for calls to one upstream service.
+
+    Calls go through the upstream's bulkhead and circuit breaker, are
+    bounded by the per-attempt timeout and the request deadline, and
+    idempotent calls are retried with full-jitter exponential backoff.
+    Reads may be hedged: a second attempt starts if the first is slow and
+    the first result wins. Only transient failures (``retryable``) count
+    against the breaker; other errors are raised unchanged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bulkhead: Bulkhead,
+        retryable: Callable[[BaseException], bool],
+        timeout: float,
+        max_retries: int = 2,
+        base_delay: float = 0.1,
+        max_delay: float = 2.0,
+        hedge_delay: Optional[float] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.bulkhead = bulkhead
+        self.retryable = retryable
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_delay = hedge_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_timeout)
+        in_flight.set_function(lambda: bulkhead.in_flight, upstream=name)
+
+    def _attempt_timeout(self) -> float:
+        remaining = remaining_time()
+        if remaining is None:
+            return self.timeout
+        if remaining <= 0:
+            raise UpstreamTimeout(self.name)
+        return min(self.timeout, remaining)
+
+    async def _attempt(self, func: Callable[..., T], timeout: float) -> T:
+        await self.bulkhead.acquire()
+        # A timed out (or losing hedged) attempt only stops waiting: its
+        # thread runs on until the blocking call returns, and keeps holding
+        # its bulkhead slot until then so abandoned calls still count
+        # against the upstream's concurrency
+        thread = asyncio.ensure_future(asyncio.to_thread(func))
+        thread.add_done_callback(self._finished)
+        return await asyncio.wait_for(asyncio.shield(thread), timeout=timeout)
+
+    def _finished(self, thread: "asyncio.Future[Any]"):
+        self.bulkhead.release()
+        # Nobody awaits an abandoned attempt; consume its error so asyncio
+        # does not report it as never retrieved
+        if not thread.cancelled():
+            thread.exception()
+
+    async def _hedged(self, func: Callable[..., T], timeout: float) -> T:
+        first = asyncio.create_task(self._attempt(func, timeout))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done:
+            return first.result()
+
+        hedges_total.inc(upstream=self.name)
+        second = asyncio.create_task(self._attempt(func, max(0.0, timeout - self.hedge_delay)))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, func: Callable[..., T], *args: Any, idempotent: bool = False, hedge: bool = False, **kwargs: Any) -> T:
+        """Run a blocking upstream call in a worker thread with the upstream's policies."""
+        bound = functools.partial(func, *args, **kwargs)
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        hedge = hedge and idempotent and self.hedge_delay is not None
+
+        for attempt in range(attempts):
+            try:
+                self.breaker.before_call()
+                timeout = self._attempt_timeout()
+            except HTTPException:
+                calls_total.inc(upstream=self.name, outcome="short_circuited")
+                raise
+            try:
+                if hedge:
+                    result = await self._hedged(bound, timeout)
+                else:
+                    result = await self._attempt(bound, timeout)
+            except HTTPException:
+                # Bulkhead rejections are not upstream failures
+                self.breaker.probing = False
+                calls_total.inc(upstream=self.name, outcome="rejected")
+                raise
+            except Exception as e:
+                transient = isinstance(e, asyncio.TimeoutError) or self.retryable(e)
+                if not transient:
+                    # The upstream answered, so it is healthy even if the call failed
+                    self.breaker.record_success()
+                    calls_total.inc(upstream=self.name, outcome="error")
+                    raise
+                self.breaker.record_failure()
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                remaining = remaining_time()
+                last_attempt = attempt == attempts - 1 or (remaining is not None and remaining <= delay)
+                if last_attempt:
+                    calls_total.inc(upstream=self.name, outcome="failure")
+                    logger.error(f"{self.name} call failed after {attempt + 1} attempts: {str(e)}")
+                    if _is_timeout(e):
+                        raise UpstreamTimeout(self.name) from e
+                    raise UpstreamUnavailable(self.name) from e
+                retries_total.inc(upstream=self.name)
+                logger.warning(f"{self.name} call failed ({str(e) or type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            calls_total.inc(upstream=self.name, outcome="success")
+            return result
+
+# The SDKs are imported lazily (see app.core.clients); an SDK that is not
+# imported yet cannot have raised, so its error types are looked up in
+# sys.modules instead of being imported here
+
+def _is_timeout(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return True
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APITimeoutError)
+
+def _openai_retryable(error: BaseException) -> bool:
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return False
+    return isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+# PostgREST errors meaning the database is unreachable or overloaded (it
+# answers them with 503/504): connection exceptions, insufficient resources,
+# shutdowns and PostgREST's own connection and pool errors
+_POSTGREST_TRANSIENT = ("08", "53", "57P", "PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+def _postgrest_retryable(error: BaseException) -> bool:
+    exceptions = sys.modules.get("postgrest.exceptions")
+    if exceptions is None or not isinstance(error, exceptions.APIError):
+        return False
+    # Responses that are not PostgREST JSON (a gateway's 502/503/504) carry
+    # their HTTP status as the code
+    if isinstance(error.code, int):
+        return error.code >= 500
+    return str(error.code or "").startswith(_POSTGREST_TRANSIENT)
+
+def _supabase_retryable(error: BaseException) -> bool:
+    if isinstance(error, httpx.TransportError) or _postgrest_retryable(error):
+        return True
+    errors = sys.modules.get("gotrue.errors")
+    if errors is None:
+        return False
+    if isinstance(error, errors.AuthRetryableError):
+        return True
+    return isinstance(error, errors.AuthApiError) and error.status >= 500
+
+openai_upstream = Upstream(
+    "OpenAI",
+    openai_bulkhead,
+    _openai_retryable,
+    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=settings.CIRCUIT_RECOVERY_SECONDS,
+)
+supabase_upstream = Upstream(
+    "Database",
+    supabase_bulkhead,
+    _supabase_retryable,
+    timeout=settings.SUPABASE_TIMEOUT_SECONDS,
+    hedge_delay=settings.SUPABASE_HEDGE_DELAY_SECONDS,
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=settings.CIRCUIT_RECOVERY_SECONDS,
+)
+storage_upstream = Upstream(
+    "Storage",
+    storage_bulkhead,
+    _supabase_retryable,
+    timeout=settings.STORAGE_TIMEOUT_SECONDS,
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=settings.CIRCUIT_RECOVERY_SECONDS,
+)
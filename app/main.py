@@ -1,7 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import memories, media, transcription, interview
+from app.api import memories, media, transcription, interview, batch
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.idempotency import IdempotencyMiddleware, create_store
+from app.core.lifespan import lifespan
+from app.core.rate_limit import RateLimitMiddleware, create_backend
+from app.core.resources import InFlightMiddleware, resources
+from app.core.upstream import DeadlineMiddleware
+from app.core import metrics
 import logging
 
 # Configure logging
@@ -10,7 +17,43 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-app = FastAPI(title="Storee API")
+# SDK clients are created lazily; the lifespan warms them up at startup
+app = FastAPI(title="Storee API", lifespan=lifespan)
+
+# Track in-flight requests so shutdown can drain them; refuses new ones
+# with 503 once it has begun
+app.add_middleware(InFlightMiddleware, resources=resources)
+
+# Run retried POSTs carrying an Idempotency-Key once; added before rate
+# limiting so replays still count against the caller's limits
+if settings.IDEMPOTENCY_ENABLED:
+    idempotency_store = create_store(settings.IDEMPOTENCY_REDIS_URL)
+    resources.on_close("idempotency store", idempotency_store.close)
+    app.add_middleware(
+        IdempotencyMiddleware,
+        store=idempotency_store,
+        routes=settings.IDEMPOTENCY_ROUTES,
+        ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+        lock_ttl=settings.IDEMPOTENCY_LOCK_SECONDS,
+        wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+        max_response_bytes=settings.IDEMPOTENCY_MAX_RESPONSE_BYTES,
+        jwt_secret=settings.SUPABASE_JWT_SECRET,
+    )
+
+# Per-user rate limits; added before CORS so CORS headers wrap 429 responses
+if settings.RATE_LIMIT_ENABLED:
+    rate_limit_backend = create_backend(settings.RATE_LIMIT_REDIS_URL)
+    resources.on_close("rate limit backend", rate_limit_backend.close)
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=rate_limit_backend,
+        default_limit=settings.RATE_LIMIT_DEFAULT,
+        route_limits=settings.RATE_LIMIT_ROUTES,
+        jwt_secret=settings.SUPABASE_JWT_SECRET,
+    )
+
+# Deadline for the upstream calls made while serving a request
+app.add_middleware(DeadlineMiddleware, timeout=settings.REQUEST_TIMEOUT_SECONDS)
 
 # Configure CORS
 app.add_middleware(
@@ -21,12 +64,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (brotli when available, otherwise gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESSION_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
 # Include routers
 app.include_router(memories.router, prefix="/api/memories", tags=["memories"])
 app.include_router(media.router, prefix="/api/media", tags=["media"])
 app.include_router(transcription.router, prefix="/api/transcription", tags=["transcription"])
 app.include_router(interview.router, prefix="/api/interview", tags=["interview"])
+app.include_router(batch.router, prefix="/api/batch", tags=["batch"])
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Storee API"}
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
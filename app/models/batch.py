@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+
+# Operations accepted by POST /api/batch
+BatchOperationType = Literal[
+    "memory.get",
+    "memory.create",
+    "memory.update",
+    "memory.delete",
+    "memory.media",
+    "media.get",
+    "media.update_label",
+    "media.delete",
+]
+
+class BatchOperation(BaseModel):
+    """A single sub-operation of a batch request."""
+    op: BatchOperationType
+    id: Optional[int] = None
+    data: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    """Ordered list of operations; atomic batches run in one transaction."""
+    operations: List[BatchOperation]
+    atomic: bool = False
+
+class BatchResult(BaseModel):
+    """Outcome of one operation, in the position it was requested."""
+    index: int
+    status: int
+    body: Optional[Any] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
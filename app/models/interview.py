@@ -35,6 +35,7 @@ class InterviewContinue(BaseModel):
 
 class InterviewEnd(BaseModel):
     session_id: str
+    suggest_title: bool = True  # Draft the memory title along with the summary
 
 class MemoryFromInterview(BaseModel):
     session_id: str
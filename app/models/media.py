@@ -22,4 +22,24 @@ class Media(MediaBase):
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class MediaUploadRequest(BaseModel):
+    """Model for requesting a direct-to-storage upload URL."""
+    memory_id: int
+    media_type: str
+    filename: str
+    label: Optional[str] = None
+
+class MediaUploadTicket(BaseModel):
+    """Signed upload URL the client PUTs the file to."""
+    file_path: str
+    signed_url: str
+    token: str
+
+class MediaUploadComplete(BaseModel):
+    """Model for registering a file uploaded directly to storage."""
+    memory_id: int
+    media_type: str
+    file_path: str
+    label: Optional[str] = None
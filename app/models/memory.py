@@ -44,8 +44,49 @@ class Memory(MemoryBase):
     class Config:
         from_attributes = True
 
+# Media attachment returned with a pre-signed download URL
+class MediaAttachmentWithUrl(MediaAttachment):
+    signed_url: Optional[str] = None
+
+# Used when reading a memory together with its media in one response
+class MemoryDetail(Memory):
+    media_attachments: List[MediaAttachmentWithUrl] = []
+
+# Memory returned by hybrid search, with its ranking signals
+class MemorySearchResult(MemoryBase):
+    id: int
+    user_id: str
+    created_at: datetime
+    updated_at: datetime
+    text_rank: Optional[float] = None
+    similarity: Optional[float] = None
+    score: float
+
 # Used when updating a memory
 class MemoryUpdate(MemoryBase):
     title: Optional[str] = None
     content: Optional[str] = None
     date: Optional[str] = None
+
+# Media file referenced by an imported memory (path inside the import archive)
+class MemoryImportMedia(BaseModel):
+    path: str
+    media_type: str
+    label: Optional[str] = None
+
+# Used for each record of a bulk import
+class MemoryImportRecord(MemoryCreate):
+    media: List[MemoryImportMedia] = []
+
+# Error reported for a single line of a bulk import
+class MemoryImportError(BaseModel):
+    line: int
+    error: str
+
+# Returned when a bulk import completes
+class MemoryImportResult(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    media_uploaded: int = 0
+    memory_ids: List[int] = []
+    errors: List[MemoryImportError] = []
@@ -1,38 +1,41 @@
 import os
-import openai
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.core.config import settings
+from app.core.clients import get_openai_client
+from app.core.model_router import model_router
+from app.services.interview_prompts import (
+    INTERVIEWER_PROMPT,
+    MEMORY_DRAFT_INSTRUCTIONS,
+    MEMORY_DRAFT_TOOL,
+    MEMORY_DRAFT_TOOL_CHOICE,
+    SUMMARY_INSTRUCTIONS,
+    TITLE_INSTRUCTIONS,
+    conversation_fingerprint,
+    conversation_messages,
+    task_messages,
+)
+from collections import OrderedDict
+import asyncio
 import logging
+import orjson
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Drafted titles kept for suggest-title
+DRAFTED_TITLES_MAX = 1024
+
 class AIInterviewerService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.system_prompt = """You are an empathetic and skilled interviewer helping someone capture their life memories. Your role is to:
-
-1. Ask thoughtful, open-ended questions that encourage detailed responses
-2. Show genuine interest in their experiences and emotions
-3. Remember details from previous parts of the conversation
-4. Ask follow-up questions based on what they've shared
-5. Help them explore deeper aspects of their memories
-6. Be conversational and warm, not clinical or robotic
-7. Focus on one memory or topic at a time to avoid overwhelming them
-8. Capture factual details and specific information
-
-Guidelines:
-- Ask one question at a time
-- Reference previous details they've shared to show you're listening
-- If they mention people, places, or events, ask for more specific details about those
-- Help them explore the factual aspects of their memories (who, what, when, where, why, how)
-- If they seem to be done with a topic, suggest moving to a related memory or ask about a different time period
-- Keep questions natural and conversational
-- Avoid yes/no questions - prefer "how", "what", "when", "where", "why" questions
-- Focus on getting concrete details and specific information
-- Encourage them to share specific facts, dates, names, and descriptions
-
-Your goal is to help them create detailed, factual memories that capture the specific details of what happened. The final summary will be based only on what they actually shared, so focus on getting concrete information rather than emotional interpretations."""
+        self.system_prompt = INTERVIEWER_PROMPT
+        # Titles drafted together with a summary, by conversation fingerprint,
+        # so a suggest-title right after ending the interview costs no call
+        self._drafted_titles: "OrderedDict[str, str]" = OrderedDict()
+
+    @property
+    def client(self):
+        # Shared OpenAI client, created (and the SDK imported) on first use
+        return get_openai_client()
 
     async def start_interview(self, user_id: str, initial_context: Optional[str] = None) -> Dict[str, Any]:
         """Start a new interview session."""
@@ -69,52 +72,87 @@ Your goal is to help them create detailed, factual memories that capture the spe
             logger.error(f"Error starting interview: {str(e)}")
             raise
 
+    def add_user_response(self, session_data: Dict[str, Any], user_response: str) -> List[Dict[str, str]]:
+        """Append the user's response to the session's conversation and return it."""
+        conversation = session_data.get("conversation", [])
+        conversation.append({
+            "role": "user",
+            "content": user_response,
+            "timestamp": datetime.now().isoformat()
+        })
+        return conversation
+
+    def add_next_question(self, session_data: Dict[str, Any], conversation: List[Dict[str, str]], next_question: str) -> Dict[str, Any]:
+        """Append the generated question and return the updated session data."""
+        conversation.append({
+            "role": "assistant",
+            "content": next_question,
+            "timestamp": datetime.now().isoformat()
+        })
+        return {
+            **session_data,
+            "conversation": conversation,
+            "current_question": next_question,
+            "last_updated": datetime.now().isoformat()
+        }
+
     async def continue_interview(self, session_data: Dict[str, Any], user_response: str) -> Dict[str, Any]:
         """Continue the interview with a user response and generate the next question."""
         try:
-            # Add user response to conversation
-            conversation = session_data.get("conversation", [])
-            conversation.append({
-                "role": "user",
-                "content": user_response,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Build messages for OpenAI
-            messages = [{"role": "system", "content": self.system_prompt}]
-            messages.extend(conversation)
+            conversation = self.add_user_response(session_data, user_response)
             
             # Generate next question
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
+            response = await model_router.complete(
+                "follow_up",
+                self.client.chat.completions.create,
+                messages=conversation_messages(conversation),
                 max_tokens=200,
                 temperature=0.7,
                 stop=None
             )
             
             next_question = response.choices[0].message.content.strip()
-            
-            # Add AI response to conversation
-            conversation.append({
-                "role": "assistant",
-                "content": next_question,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            return {
-                **session_data,
-                "conversation": conversation,
-                "current_question": next_question,
-                "last_updated": datetime.now().isoformat()
-            }
+            return self.add_next_question(session_data, conversation, next_question)
             
         except Exception as e:
             logger.error(f"Error continuing interview: {str(e)}")
             raise
 
-    async def end_interview(self, session_data: Dict[str, Any]) -> Dict[str, Any]:
-        """End the interview and generate a summary."""
+    async def stream_next_question(self, conversation: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Generate the next question for a conversation, yielding it as it is generated.
+
+        Only opening the stream goes through the model router (fallbacks,
+        retries, circuit breaker); once tokens arrive, a failure ends the
+        iteration with an error.
+        """
+        stream = await model_router.complete(
+            "follow_up",
+            self.client.chat.completions.create,
+            messages=conversation_messages(conversation),
+            max_tokens=200,
+            temperature=0.7,
+            stream=True
+        )
+        chunks = iter(stream)
+        try:
+            while True:
+                # The SDK's stream is blocking; read each chunk in a worker thread
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    return
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            stream.close()
+
+    async def end_interview(self, session_data: Dict[str, Any], suggest_title: bool = False) -> Dict[str, Any]:
+        """End the interview and generate a summary.
+
+        With ``suggest_title`` the title is drafted in the same completion
+        and returned as ``suggested_title``; suggest_memory_title then
+        returns it for this conversation without another call.
+        """
         try:
             conversation = session_data.get("conversation", [])
             
@@ -125,29 +163,19 @@ Your goal is to help them create detailed, factual memories that capture the spe
                     "ended_at": datetime.now().isoformat()
                 }
             
-            # Create summary prompt for factual, direct memory
-            summary_prompt = f"""Based on this conversation, create a factual memory summary using ONLY the details and information the user actually shared. Do not add any embellishments, assumptions, or creative details. Focus on:
-
-1. The specific memories and experiences they mentioned
-2. The exact details, people, places, and dates they provided
-3. Their actual words and descriptions
-4. The facts they shared about what happened
-
-IMPORTANT: 
-- Use only information the user explicitly stated
-- Do not make up or infer any details
-- Do not add dramatic language or creative flourishes
-- Keep it factual and direct
-- Write in first person using their actual words when possible
-
-Conversation:
-{chr(10).join([f"{msg['role']}: {msg['content']}" for msg in conversation])}
-
-Factual memory summary:"""
+            draft = await self.draft_memory(conversation) if suggest_title else None
+            if draft:
+                return {
+                    **session_data,
+                    "summary": draft["summary"],
+                    "suggested_title": draft["title"],
+                    "ended_at": datetime.now().isoformat()
+                }
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": summary_prompt}],
+            response = await model_router.complete(
+                "summary",
+                self.client.chat.completions.create,
+                messages=task_messages(conversation, SUMMARY_INSTRUCTIONS),
                 max_tokens=300,
                 temperature=0.2  # Lower temperature for more factual, less creative responses
             )
@@ -164,35 +192,68 @@ Factual memory summary:"""
             logger.error(f"Error ending interview: {str(e)}")
             raise
 
+    async def draft_memory(self, conversation: List[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """Generate the summary and title of a conversation in one completion.
+
+        Returns None when the model's answer cannot be parsed, for the
+        caller to fall back to separate calls.
+        """
+        response = await model_router.complete(
+            "memory_draft",
+            self.client.chat.completions.create,
+            messages=task_messages(conversation, MEMORY_DRAFT_INSTRUCTIONS),
+            tools=[MEMORY_DRAFT_TOOL],
+            tool_choice=MEMORY_DRAFT_TOOL_CHOICE,
+            max_tokens=350,
+            temperature=0.2
+        )
+        
+        try:
+            arguments = orjson.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            summary = arguments["summary"].strip()
+            title = self._clean_title(arguments["title"])
+        except (orjson.JSONDecodeError, AttributeError, IndexError, KeyError, TypeError) as e:
+            logger.warning(f"Could not parse memory draft, generating summary alone: {type(e).__name__}")
+            return None
+        if not summary:
+            return None
+        
+        title = title or "New Memory"
+        self._remember_title(conversation, title)
+        return {"summary": summary, "title": title}
+
     async def suggest_memory_title(self, conversation: List[Dict[str, str]]) -> str:
         """Generate a suggested title for the memory based on the conversation."""
         try:
             if not conversation:
                 return "New Memory"
             
-            # Extract user responses
-            user_responses = [msg["content"] for msg in conversation if msg["role"] == "user"]
-            combined_content = " ".join(user_responses)
+            drafted = self._drafted_titles.get(conversation_fingerprint(conversation))
+            if drafted:
+                return drafted
             
-            title_prompt = f"""Based on this conversation content, generate a short, factual title (max 60 characters) for this memory. The title should reflect the specific memory or experience the user described, using only the details they actually mentioned:
-
-{combined_content}
-
-Factual title:"""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": title_prompt}],
+            response = await model_router.complete(
+                "title",
+                self.client.chat.completions.create,
+                messages=task_messages(conversation, TITLE_INSTRUCTIONS),
                 max_tokens=50,
                 temperature=0.7
             )
             
-            title = response.choices[0].message.content.strip()
-            # Clean up the title
-            title = title.replace('"', '').replace("'", "").strip()
+            title = self._clean_title(response.choices[0].message.content)
             
             return title if title else "New Memory"
             
         except Exception as e:
             logger.error(f"Error suggesting memory title: {str(e)}")
-            return "New Memory" 
\ No newline at end of file
+            return "New Memory"
+
+    def _clean_title(self, title: str) -> str:
+        return title.strip().replace('"', '').replace("'", "").strip()
+
+    def _remember_title(self, conversation: List[Dict[str, str]], title: str):
+        key = conversation_fingerprint(conversation)
+        self._drafted_titles[key] = title
+        self._drafted_titles.move_to_end(key)
+        while len(self._drafted_titles) > DRAFTED_TITLES_MAX:
+            self._drafted_titles.popitem(last=False)
@@ -0,0 +1,213 @@
+from app.core.data_context import DataContext
+from app.models.batch import BatchOperation, BatchResult
+from app.models.memory import MemoryCreate
+from app.core.singleflight import forget_read
+from app.core.upstream import supabase_upstream
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import asyncio
+import logging
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Reads can be retried and hedged; writes run exactly once
+READ_OPERATIONS = {"memory.get", "memory.media", "media.get"}
+
+# Operations apply_batch_for_user can run inside one transaction
+ATOMIC_OPERATIONS = {"memory.create", "memory.update", "memory.delete", "media.update_label", "media.delete"}
+
+class BatchService:
+    """Runs the operations of a batch request with the request's client.
+
+    Operations on the same memory or media run in request order; all other
+    operations run concurrently. Each operation gets its own result, so one
+    failure does not affect the rest unless the batch is atomic.
+    """
+
+    def __init__(self):
+        self.media_table = "media_attachments"
+        self.handlers: Dict[str, Callable[..., Any]] = {
+            "memory.get": self._get_memory,
+            "memory.create": self._create_memory,
+            "memory.update": self._update_memory,
+            "memory.delete": self._delete_memory,
+            "memory.media": self._get_memory_media,
+            "media.get": self._get_media,
+            "media.update_label": self._update_media_label,
+            "media.delete": self._delete_media,
+        }
+
+    async def run(self, operations: List[BatchOperation], ctx: DataContext) -> List[BatchResult]:
+        logger.info(f"Running batch of {len(operations)} operations for user {ctx.user_id}")
+
+        # Use the request's authenticated Supabase client for the whole batch
+        supabase = ctx.client
+
+        tasks = []
+        last_for_target: Dict[Tuple[str, int], asyncio.Task] = {}
+        for index, operation in enumerate(operations):
+            target = self._target(operation)
+            previous = last_for_target.get(target) if target else None
+            task = asyncio.create_task(self._run_operation(supabase, index, operation, ctx.user_id, previous))
+            if target:
+                last_for_target[target] = task
+            tasks.append(task)
+
+        results = list(await asyncio.gather(*tasks))
+        forget_read('get_memories_for_user', ctx.user_id)
+        return results
+
+    async def run_atomic(self, operations: List[BatchOperation], ctx: DataContext) -> List[BatchResult]:
+        """Run write operations in a single transaction: all succeed or none are applied."""
+        payload = []
+        for index, operation in enumerate(operations):
+            if operation.op not in ATOMIC_OPERATIONS:
+                raise HTTPException(status_code=400, detail=f"Operation {index}: {operation.op} is not supported in atomic batches")
+            try:
+                payload.append(self._operation_payload(operation))
+            except HTTPException as e:
+                raise HTTPException(status_code=e.status_code, detail=f"Operation {index}: {e.detail}")
+
+        logger.info(f"Running atomic batch of {len(operations)} operations for user {ctx.user_id}")
+
+        try:
+            response = await supabase_upstream.call(
+                ctx.client.rpc('apply_batch_for_user', {
+                    'p_operations': payload
+                }).execute
+            )
+        except APIError as e:
+            # The transaction was rolled back, nothing was applied
+            logger.info(f"Atomic batch rolled back: {e.message}")
+            status_code = 404 if e.code == 'P0002' else 400
+            raise HTTPException(status_code=status_code, detail=e.message)
+        forget_read('get_memories_for_user', ctx.user_id)
+
+        return [
+            BatchResult(index=index, status=self._success_status(operation), body=body)
+            for index, (operation, body) in enumerate(zip(operations, response.data or []))
+        ]
+
+    def _target(self, operation: BatchOperation) -> Optional[Tuple[str, int]]:
+        if operation.id is None or operation.op == "memory.create":
+            return None
+        return operation.op.split(".")[0], operation.id
+
+    def _success_status(self, operation: BatchOperation) -> int:
+        return 201 if operation.op == "memory.create" else 200
+
+    async def _run_operation(self, supabase, index: int, operation: BatchOperation, user_id: str, previous: Optional[asyncio.Task]) -> BatchResult:
+        if previous is not None:
+            # Results never raise, so a failed predecessor does not stop this one
+            await previous
+
+        try:
+            payload = self._operation_payload(operation)
+            body = await supabase_upstream.call(
+                self.handlers[operation.op],
+                supabase,
+                payload,
+                user_id,
+                idempotent=operation.op in READ_OPERATIONS,
+                hedge=operation.op in READ_OPERATIONS
+            )
+            if body is None:
+                raise HTTPException(status_code=404, detail="Not found or access denied")
+            return BatchResult(index=index, status=self._success_status(operation), body=body)
+
+        except HTTPException as e:
+            return BatchResult(index=index, status=e.status_code, error=str(e.detail))
+        except Exception as e:
+            logger.error(f"Error in batch operation {index} ({operation.op}): {str(e)}", exc_info=True)
+            return BatchResult(index=index, status=500, error=str(e))
+
+    def _memory_fields(self, operation: BatchOperation) -> Dict[str, Any]:
+        try:
+            memory = MemoryCreate(**operation.data)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return {
+            'title': memory.title,
+            'content': memory.content,
+            'date': (memory.date or datetime.now(timezone.utc)).isoformat()
+        }
+
+    def _operation_payload(self, operation: BatchOperation) -> Dict[str, Any]:
+        if operation.id is None and operation.op != "memory.create":
+            raise HTTPException(status_code=400, detail=f"{operation.op} requires an id")
+        data: Dict[str, Any] = {}
+        if operation.op in ("memory.create", "memory.update"):
+            data = self._memory_fields(operation)
+        elif operation.op == "media.update_label":
+            data = {'label': operation.data.get("label")}
+        return {'op': operation.op, 'id': operation.id, 'data': data}
+
+    # Handlers run in worker threads on validated payloads and return None
+    # when nothing matched
+
+    def _get_memory(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.rpc('get_memory_for_user', {
+            'memory_id': payload['id'],
+            'user_id': user_id
+        }).execute()
+        return response.data[0] if response.data else None
+
+    def _create_memory(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.rpc('create_memory_for_user', {
+            **payload['data'],
+            'user_id': user_id
+        }).execute()
+        return response.data or None
+
+    def _update_memory(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.rpc('update_memory_for_user', {
+            **payload['data'],
+            'memory_id': payload['id'],
+            'user_id': user_id
+        }).execute()
+        return response.data or None
+
+    def _delete_memory(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.rpc('delete_memory_for_user', {
+            'memory_id': payload['id'],
+            'user_id': user_id
+        }).execute()
+        return response.data or None
+
+    def _get_memory_media(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.table(self.media_table) \
+            .select("*") \
+            .eq("memory_id", payload['id']) \
+            .eq("user_id", user_id) \
+            .execute()
+        return response.data or []
+
+    def _get_media(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.table(self.media_table) \
+            .select("*") \
+            .eq("id", payload['id']) \
+            .eq("user_id", user_id) \
+            .limit(1) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def _update_media_label(self, supabase, payload: Dict[str, Any], user_id: str):
+        response = supabase.table(self.media_table) \
+            .update(payload['data'], returning=ReturnMethod.representation) \
+            .eq("id", payload['id']) \
+            .eq("user_id", user_id) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def _delete_media(self, supabase, payload: Dict[str, Any], user_id: str):
+        # The stored file is queued for removal by a database trigger
+        response = supabase.table(self.media_table) \
+            .delete(returning=ReturnMethod.representation) \
+            .eq("id", payload['id']) \
+            .eq("user_id", user_id) \
+            .execute()
+        return response.data[0] if response.data else None
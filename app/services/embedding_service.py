@@ -0,0 +1,126 @@
+from app.core.config import settings
+from app.core.clients import get_openai_client
+from app.core.data_context import DataContext
+from app.core.upstream import openai_upstream, supabase_upstream
+from app.services.vector_index import local_index
+from typing import Any, Dict, List, Optional
+import hashlib
+import logging
+from fastapi import BackgroundTasks
+
+logger = logging.getLogger(__name__)
+
+# Keeps inputs well under the embedding model's 8191 token limit
+MAX_EMBEDDING_CHARS = 24000
+
+def memory_text(title: Optional[str], content: Optional[str]) -> str:
+    """Text a memory's embedding is computed from."""
+    return f"{title or ''}\n\n{content or ''}".strip()[:MAX_EMBEDDING_CHARS]
+
+def content_hash(title: Optional[str], content: Optional[str]) -> str:
+    """Same value as md5(title || ' ' || content) in the database."""
+    return hashlib.md5(f"{title or ''} {content or ''}".encode()).hexdigest()
+
+class EmbeddingService:
+    def __init__(self):
+        self.model = settings.EMBEDDING_MODEL
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self.table = "memories"
+
+    @property
+    def client(self):
+        # Shared OpenAI client, created (and the SDK imported) on first use
+        return get_openai_client()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts with one API call, keeping their order."""
+        response = await openai_upstream.call(
+            self.client.embeddings.create,
+            model=self.model,
+            input=texts,
+            idempotent=True
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def schedule(self, background_tasks: BackgroundTasks, memories: List[Any], user_id: str, token: str):
+        """Embed written memories after the response when EMBED_ON_WRITE is set.
+
+        Otherwise the change feed worker picks them up from the outbox.
+        """
+        if settings.EMBED_ON_WRITE:
+            background_tasks.add_task(self.embed_memories, memories, user_id, token)
+
+    def schedule_by_id(self, background_tasks: BackgroundTasks, memory_ids: List[int], user_id: str, token: str):
+        if settings.EMBED_ON_WRITE:
+            background_tasks.add_task(self.embed_memories_by_id, memory_ids, user_id, token)
+
+    async def embed_memories(self, memories: List[Any], user_id: str, token: str) -> int:
+        """Compute and store embeddings for memories (dicts or models).
+
+        Meant to run in the background after a write, so failures are
+        logged rather than raised. Returns how many vectors were stored.
+        """
+        rows = [memory if isinstance(memory, dict) else memory.__dict__ for memory in memories]
+        # The request's client is closed by now; use (and close) one of our own
+        ctx = DataContext(user_id, token)
+        try:
+            return await self._embed(rows, ctx)
+        finally:
+            ctx.close()
+
+    async def embed_memories_by_id(self, memory_ids: List[int], user_id: str, token: str) -> int:
+        """Embed memories by id, e.g. after a bulk import."""
+        if not memory_ids:
+            return 0
+        ctx = DataContext(user_id, token)
+        try:
+            try:
+                response = await supabase_upstream.call(
+                    ctx.client.table(self.table)
+                        .select("id, title, content")
+                        .in_("id", memory_ids)
+                        .eq("user_id", user_id)
+                        .execute,
+                    idempotent=True
+                )
+            except Exception as e:
+                logger.error(f"Error loading memories to embed: {str(e)}", exc_info=True)
+                return 0
+            return await self._embed(response.data or [], ctx)
+        finally:
+            ctx.close()
+
+    async def _embed(self, rows: List[Dict[str, Any]], ctx: DataContext) -> int:
+        stored = 0
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                vectors = await self.embed([memory_text(row["title"], row["content"]) for row in batch])
+                stored += await self._store(batch, vectors, ctx)
+            except Exception as e:
+                logger.error(f"Error embedding {len(batch)} memories: {str(e)}", exc_info=True)
+
+        logger.info(f"Stored {stored} memory embeddings for user {ctx.user_id}")
+        return stored
+
+    async def _store(self, rows: List[Dict[str, Any]], vectors: List[List[float]], ctx: DataContext) -> int:
+        if settings.VECTOR_INDEX == "local":
+            for row, vector in zip(rows, vectors):
+                local_index.upsert(ctx.user_id, row["id"], vector)
+            return len(rows)
+
+        # Safe to retry: a vector is only written over the text it was computed from
+        response = await supabase_upstream.call(
+            ctx.client.rpc('set_memory_embeddings_for_user', {
+                'p_embeddings': [
+                    {
+                        "id": row["id"],
+                        "embedding": vector,
+                        "content_hash": content_hash(row["title"], row["content"])
+                    }
+                    for row, vector in zip(rows, vectors)
+                ]
+            }).execute,
+            idempotent=True
+        )
+        return response.data or 0
@@ -0,0 +1,91 @@
+from typing import Any, Dict, List
+import hashlib
+
+# Every interviewer prompt is assembled as [system prompt, conversation...,
+# task instructions]. The system prompt never changes and the conversation
+# only grows, so consecutive calls on a session (follow-up questions, then
+# the summary and title) share their longest possible prefix and the
+# provider's prompt cache can serve it; only the trailing instructions and
+# the newest turns are new. Keep anything that varies out of the prefix.
+
+INTERVIEWER_PROMPT = """You are an empathetic and skilled interviewer helping someone capture their life memories. Your role is to:
+
+1. Ask thoughtful, open-ended questions that encourage detailed responses
+2. Show genuine interest in their experiences and emotions
+3. Remember details from previous parts of the conversation
+4. Ask follow-up questions based on what they've shared
+5. Help them explore deeper aspects of their memories
+6. Be conversational and warm, not clinical or robotic
+7. Focus on one memory or topic at a time to avoid overwhelming them
+8. Capture factual details and specific information
+
+Guidelines:
+- Ask one question at a time
+- Reference previous details they've shared to show you're listening
+- If they mention people, places, or events, ask for more specific details about those
+- Help them explore the factual aspects of their memories (who, what, when, where, why, how)
+- If they seem to be done with a topic, suggest moving to a related memory or ask about a different time period
+- Keep questions natural and conversational
+- Avoid yes/no questions - prefer "how", "what", "when", "where", "why" questions
+- Focus on getting concrete details and specific information
+- Encourage them to share specific facts, dates, names, and descriptions
+
+Your goal is to help them create detailed, factual memories that capture the specific details of what happened. The final summary will be based only on what they actually shared, so focus on getting concrete information rather than emotional interpretations."""
+
+SUMMARY_INSTRUCTIONS = """The interview is over; do not ask another question. Based on the conversation above, create a factual memory summary using ONLY the details and information the user actually shared. Do not add any embellishments, assumptions, or creative details. Focus on:
+
+1. The specific memories and experiences they mentioned
+2. The exact details, people, places, and dates they provided
+3. Their actual words and descriptions
+4. The facts they shared about what happened
+
+IMPORTANT:
+- Use only information the user explicitly stated
+- Do not make up or infer any details
+- Do not add dramatic language or creative flourishes
+- Keep it factual and direct
+- Write in first person using their actual words when possible"""
+
+TITLE_INSTRUCTIONS = """Do not ask another question. Based on what the user shared in the conversation above, generate a short, factual title (max 60 characters) for this memory. The title should reflect the specific memory or experience the user described, using only the details they actually mentioned. Reply with the title only."""
+
+MEMORY_DRAFT_INSTRUCTIONS = f"""{SUMMARY_INSTRUCTIONS}
+
+Also generate a short, factual title (max 60 characters) for this memory, reflecting the specific memory or experience the user described and using only the details they actually mentioned.
+
+Return both by calling save_memory_draft."""
+
+# Forced tool call for the summary and title in one completion; unlike JSON
+# mode it is supported by every model in MODEL_TIERS
+MEMORY_DRAFT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "save_memory_draft",
+        "description": "Save the summary and title of the memory the user shared.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "summary": {"type": "string", "description": "Factual memory summary"},
+                "title": {"type": "string", "description": "Short, factual title (max 60 characters)"},
+            },
+            "required": ["summary", "title"],
+        },
+    },
+}
+MEMORY_DRAFT_TOOL_CHOICE = {"type": "function", "function": {"name": "save_memory_draft"}}
+
+def conversation_messages(conversation: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """The shared prefix: the system prompt, then the conversation (role and content only)."""
+    messages = [{"role": "system", "content": INTERVIEWER_PROMPT}]
+    messages.extend({"role": message["role"], "content": message["content"]} for message in conversation)
+    return messages
+
+def task_messages(conversation: List[Dict[str, Any]], instructions: str) -> List[Dict[str, str]]:
+    """The shared prefix followed by a one-off task's instructions."""
+    return conversation_messages(conversation) + [{"role": "user", "content": instructions}]
+
+def conversation_fingerprint(conversation: List[Dict[str, Any]]) -> str:
+    """Identify a conversation by its turns, ignoring timestamps."""
+    digest = hashlib.sha256()
+    for message in conversation:
+        digest.update(f"{message['role']}\x00{message['content']}\x00".encode())
+    return digest.hexdigest()
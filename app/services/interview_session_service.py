@@ -1,6 +1,10 @@
-from app.supabase.client import get_authenticated_client
+from app.core.data_context import DataContext
+from app.core.resources import resources
+from app.core.singleflight import coalesce_read, forget_read
+from app.core.upstream import supabase_upstream
 from app.models.interview import InterviewSession, InterviewSessionCreate
 from typing import Dict, Any, Optional, List
+import asyncio
 import logging
 from datetime import datetime
 from fastapi import HTTPException
@@ -11,25 +15,27 @@ class InterviewSessionService:
     def __init__(self):
         self.table = "interview_sessions"
 
-    async def create_session(self, session_data: Dict[str, Any], user_id: str, token: str) -> InterviewSession:
+    async def create_session(self, session_data: Dict[str, Any], ctx: DataContext) -> InterviewSession:
         """Create a new interview session in the database."""
         try:
-            logger.info(f"Creating interview session for user {user_id}")
+            logger.info(f"Creating interview session for user {ctx.user_id}")
             
-            supabase = get_authenticated_client(token)
+            supabase = ctx.client
             
             # Create session using RPC function (bypasses RLS)
-            response = supabase.rpc(
-                'create_interview_session_for_user',
-                {
-                    'p_session_id': session_data['session_id'],
-                    'p_user_id': user_id,
-                    'p_initial_context': session_data.get('initial_context'),
-                    'p_conversation': session_data.get('conversation', []),
-                    'p_current_question': session_data.get('current_question'),
-                    'p_status': session_data.get('status', 'active')
-                }
-            ).execute()
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'create_interview_session_for_user',
+                    {
+                        'p_session_id': session_data['session_id'],
+                        'p_user_id': ctx.user_id,
+                        'p_initial_context': session_data.get('initial_context'),
+                        'p_conversation': session_data.get('conversation', []),
+                        'p_current_question': session_data.get('current_question'),
+                        'p_status': session_data.get('status', 'active')
+                    }
+                ).execute
+            )
             
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create interview session")
@@ -41,47 +47,60 @@ class InterviewSessionService:
             logger.error(f"Error creating interview session: {str(e)}")
             raise
 
-    async def get_session(self, session_id: str, user_id: str, token: str) -> Optional[InterviewSession]:
+    async def get_session(self, session_id: str, ctx: DataContext) -> Optional[InterviewSession]:
         """Get an interview session by session_id."""
         try:
-            supabase = get_authenticated_client(token)
-            
-            response = supabase.rpc(
-                'get_interview_session_for_user',
-                {
-                    'p_session_id': session_id,
-                    'p_user_id': user_id
-                }
-            ).execute()
-            
-            if not response.data:
+            async def fetch():
+                supabase = ctx.client
+                # Runs in a worker thread so the voice turn can transcribe meanwhile
+                response = await supabase_upstream.call(
+                    supabase.rpc(
+                        'get_interview_session_for_user',
+                        {
+                            'p_session_id': session_id,
+                            'p_user_id': ctx.user_id
+                        }
+                    ).execute,
+                    idempotent=True
+                )
+                return response.data
+            
+            # Concurrent requests for the same session share one query
+            session_record = await coalesce_read('get_session', ctx.user_id, (session_id,), fetch)
+            
+            if not session_record:
                 return None
             
-            session_record = response.data
             return InterviewSession(**session_record)
             
         except Exception as e:
             logger.error(f"Error getting interview session: {str(e)}")
             raise
 
-    async def update_session(self, session_id: str, session_data: Dict[str, Any], user_id: str, token: str) -> InterviewSession:
+    async def update_session(self, session_id: str, session_data: Dict[str, Any], ctx: DataContext) -> InterviewSession:
         """Update an interview session."""
         try:
-            supabase = get_authenticated_client(token)
-            
-            # Update session using RPC function (bypasses RLS)
-            response = supabase.rpc(
-                'update_interview_session_for_user',
-                {
-                    'p_session_id': session_id,
-                    'p_user_id': user_id,
-                    'p_conversation': session_data.get('conversation'),
-                    'p_current_question': session_data.get('current_question'),
-                    'p_summary': session_data.get('summary'),
-                    'p_status': session_data.get('status'),
-                    'p_ended_at': session_data.get('ended_at')
-                }
-            ).execute()
+            supabase = ctx.client
+            
+            # Update session using RPC function (bypasses RLS); it sets the
+            # whole state, so repeating it is safe
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'update_interview_session_for_user',
+                    {
+                        'p_session_id': session_id,
+                        'p_user_id': ctx.user_id,
+                        'p_conversation': session_data.get('conversation'),
+                        'p_current_question': session_data.get('current_question'),
+                        'p_summary': session_data.get('summary'),
+                        'p_status': session_data.get('status'),
+                        'p_ended_at': session_data.get('ended_at')
+                    }
+                ).execute,
+                idempotent=True
+            )
+            
+            forget_read('get_session', ctx.user_id, (session_id,))
             
             if not response.data:
                 raise HTTPException(status_code=404, detail="Interview session not found")
@@ -93,15 +112,19 @@ class InterviewSessionService:
             logger.error(f"Error updating interview session: {str(e)}")
             raise
 
-    async def get_user_sessions(self, user_id: str, token: str) -> List[InterviewSession]:
+    async def get_user_sessions(self, ctx: DataContext) -> List[InterviewSession]:
         """Get all interview sessions for a user."""
         try:
-            supabase = get_authenticated_client(token)
+            supabase = ctx.client
             
-            response = supabase.rpc(
-                'get_interview_sessions_for_user',
-                {'user_uuid': user_id}
-            ).execute()
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'get_interview_sessions_for_user',
+                    {'user_uuid': ctx.user_id}
+                ).execute,
+                idempotent=True,
+                hedge=True
+            )
             
             sessions = []
             for session_record in response.data:
@@ -113,15 +136,56 @@ class InterviewSessionService:
             logger.error(f"Error getting user sessions: {str(e)}")
             raise
 
-    async def delete_session(self, session_id: str, user_id: str, token: str) -> bool:
+    async def delete_session(self, session_id: str, ctx: DataContext) -> bool:
         """Delete an interview session."""
         try:
-            supabase = get_authenticated_client(token)
+            supabase = ctx.client
             
-            response = supabase.table(self.table).delete().eq('session_id', session_id).eq('user_id', user_id).execute()
+            response = await supabase_upstream.call(
+                supabase.table(self.table).delete().eq('session_id', session_id).eq('user_id', ctx.user_id).execute
+            )
+            forget_read('get_session', ctx.user_id, (session_id,))
             
             return len(response.data) > 0
             
         except Exception as e:
             logger.error(f"Error deleting interview session: {str(e)}")
-            raise 
\ No newline at end of file
+            raise 
+class SessionWriteBehind:
+    """Saves the latest state of one session in the background.
+
+    ``save`` returns immediately. One writer task at a time writes the most
+    recent state, so states saved while a write is in flight are coalesced
+    and turns are never written out of order. Every write carries the whole
+    state, so a failed write is repaired by the next one; ``flush`` waits
+    for the writer, and the writer is a tracked job that shutdown drains.
+    """
+
+    def __init__(self, service: InterviewSessionService, session_id: str, ctx: DataContext):
+        self.service = service
+        self.session_id = session_id
+        self.ctx = ctx
+        self.failed = False
+        self._pending: Optional[Dict[str, Any]] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def save(self, session_data: Dict[str, Any]):
+        self._pending = session_data
+        if self._writer is None or self._writer.done():
+            self._writer = resources.spawn(self._write(), name=f"save interview session {self.session_id}")
+
+    async def _write(self):
+        while self._pending is not None:
+            session_data, self._pending = self._pending, None
+            try:
+                await self.service.update_session(self.session_id, session_data, self.ctx)
+                self.failed = False
+            except Exception as e:
+                logger.error(f"Error saving interview session {self.session_id} in the background: {str(e)}")
+                self.failed = True
+
+    async def flush(self) -> bool:
+        """Wait until the last saved state is written; returns False if that write failed."""
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+        return not self.failed
@@ -1,34 +1,49 @@
-from app.supabase.client import get_authenticated_client
-from app.models.media import MediaCreate, Media
-from typing import List, Optional
+from app.core.data_context import DataContext
+from app.models.media import MediaCreate, Media, MediaUploadRequest, MediaUploadTicket, MediaUploadComplete
+from app.core.config import settings
+from app.core.media_cache import media_cache
+from app.core.bulkhead import storage_bulkhead
+from app.core.upstream import storage_upstream, supabase_upstream
+from typing import List, Optional, Dict, Any
+import asyncio
+import hashlib
+import httpx
 import logging
+import mimetypes
 import os
 import uuid
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from storage3.utils import StorageException
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 class MediaService:
     def __init__(self):
         self.table = "media_attachments"
         self.bucket = "media"
 
-    async def create_media(self, media: MediaCreate, memory_id: int, user_id: str, token: str) -> Media:
+    async def create_media(self, media: MediaCreate, memory_id: int, ctx: DataContext) -> Media:
         try:
             logger.info(f"Creating media for memory {memory_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
             # Create media record
             media_data = media.dict()
             media_data["memory_id"] = memory_id
-            media_data["user_id"] = user_id
+            media_data["user_id"] = ctx.user_id
             
-            response = supabase.table(self.table) \
-                .insert(media_data) \
-                .execute()
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .insert(media_data)
+                    .execute
+            )
                 
             logger.info(f"Media creation response: {response.data}")
             
@@ -37,23 +52,29 @@ class MediaService:
                 
             return response.data[0]
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error creating media: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_media(self, media_id: int, user_id: str, token: str) -> Media:
+    async def get_media(self, media_id: int, ctx: DataContext) -> Media:
         try:
             logger.info(f"Fetching media {media_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
-            
-            response = supabase.table(self.table) \
-                .select("*") \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .single() \
-                .execute()
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .select("*")
+                    .eq("id", media_id)
+                    .eq("user_id", ctx.user_id)
+                    .single()
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
                 
             logger.info(f"Media fetch response: {response.data}")
             
@@ -62,22 +83,28 @@ class MediaService:
                 
             return response.data
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching media: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_memory_media(self, memory_id: int, user_id: str, token: str) -> List[Media]:
+    async def get_memory_media(self, memory_id: int, ctx: DataContext) -> List[Media]:
         try:
             logger.info(f"Fetching media for memory {memory_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
-            
-            response = supabase.table(self.table) \
-                .select("*") \
-                .eq("memory_id", memory_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .select("*")
+                    .eq("memory_id", memory_id)
+                    .eq("user_id", ctx.user_id)
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
                 
             logger.info(f"Memory media fetch response: {response.data}")
             
@@ -86,83 +113,101 @@ class MediaService:
                 
             return response.data
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching memory media: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def update_media(self, media_id: int, media: MediaCreate, user_id: str, token: str) -> Media:
+    async def update_media(self, media_id: int, media: MediaCreate, ctx: DataContext) -> Media:
         try:
             logger.info(f"Updating media {media_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
-            
-            # First check if the media exists and belongs to the user
-            check_response = supabase.table(self.table) \
-                .select("id") \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .single() \
-                .execute()
-                
-            if not check_response.data:
-                raise HTTPException(status_code=404, detail="Media not found or access denied")
-            
-            # Update the media
-            response = supabase.table(self.table) \
-                .update(media.dict()) \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            
+            # Update only if the media belongs to the user; the updated row is
+            # returned, so an empty result means not found or not owned
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .update(media.dict(), returning=ReturnMethod.representation)
+                    .eq("id", media_id)
+                    .eq("user_id", ctx.user_id)
+                    .execute
+            )
                 
             logger.info(f"Media update response: {response.data}")
             
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update media")
+                raise HTTPException(status_code=404, detail="Media not found or access denied")
                 
             return response.data[0]
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error updating media: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def delete_media(self, media_id: int, user_id: str, token: str):
+    async def delete_media(self, media_id: int, ctx: DataContext):
         try:
             logger.info(f"Deleting media {media_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
-            
-            # First check if the media exists and belongs to the user
-            check_response = supabase.table(self.table) \
-                .select("id") \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .single() \
-                .execute()
-                
-            if not check_response.data:
-                raise HTTPException(status_code=404, detail="Media not found or access denied")
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
-            # Delete the media
-            response = supabase.table(self.table) \
-                .delete() \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            # Delete only if the media belongs to the user, returning the row
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .delete(returning=ReturnMethod.representation)
+                    .eq("id", media_id)
+                    .eq("user_id", ctx.user_id)
+                    .execute
+            )
                 
             logger.info(f"Media deletion response: {response.data}")
             
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to delete media")
-                
+                raise HTTPException(status_code=404, detail="Media not found or access denied")
+            
+            # The stored file is queued for removal by a database trigger and
+            # deleted in the background by the storage reaper
             return response.data[0]
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error deleting media: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def upload_media(self, file, media_data: MediaCreate, user_id: str, token: str):
+    def _blob_path(self, user_id: str, sha256: str, filename: str) -> str:
+        # Content-addressed: identical files of a user share one object
+        file_extension = os.path.splitext(filename)[1].lower()
+        return f"{user_id}/{sha256}{file_extension}"
+
+    def _store_blob(self, bucket, file_path: str, content: bytes, filename: str):
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        try:
+            bucket.upload(file_path, content, {"content-type": content_type})
+        except StorageException as e:
+            # A concurrent upload already stored the same content under this path
+            if "Duplicate" not in str(e):
+                raise
+            logger.info(f"Blob {file_path} already stored")
+
+    async def _find_blobs(self, supabase, sha256s: List[str]) -> Dict[str, str]:
+        """Map the content hashes the user already has stored to their paths."""
+        response = await supabase_upstream.call(
+            supabase.rpc(
+                'find_media_blobs_for_user',
+                {'p_sha256': sha256s}
+            ).execute,
+            idempotent=True,
+            hedge=True
+        )
+        return {blob["sha256"]: blob["file_path"] for blob in response.data or []}
+
+    async def upload_media(self, file, media_data: MediaCreate, ctx: DataContext):
         try:
             logger.info(f"Uploading media for memory {media_data.memory_id} with type {media_data.media_type}")
             
@@ -170,59 +215,318 @@ class MediaService:
             if media_data.media_type not in ["image", "audio"]:
                 raise HTTPException(status_code=400, detail="Invalid media type")
                 
-            # Generate unique filename
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
+            # Hash the file while streaming it from the spooled upload
+            digest = hashlib.sha256()
+            size = 0
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+            sha256 = digest.hexdigest()
+            
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            
+            # Only upload content the user has not stored before
+            file_path = (await self._find_blobs(supabase, [sha256])).get(sha256)
+            if file_path:
+                logger.info(f"Reusing stored blob {file_path}")
+            else:
+                file_path = self._blob_path(ctx.user_id, sha256, file.filename)
+                await file.seek(0)
+                content = await file.read()
+                # Retrying is safe: the path is derived from the content
+                await storage_upstream.call(
+                    self._store_blob, supabase.storage.from_(self.bucket), file_path, content, file.filename,
+                    idempotent=True
+                )
+                
+            # Create media attachment record referencing the shared blob
+            try:
+                response = await supabase_upstream.call(
+                    supabase.rpc('attach_media_blobs_for_user', {
+                        'p_attachments': [{
+                            "memory_id": media_data.memory_id,
+                            "sha256": sha256,
+                            "file_path": file_path,
+                            "size_bytes": size,
+                            "media_type": media_data.media_type,
+                            "label": media_data.label
+                        }]
+                    }).execute
+                )
+            except APIError as e:
+                # The storage reaper is removing (or just removed) the stored
+                # object; once it is done a retry uploads the content again
+                if e.code != '55006':
+                    raise
+                raise HTTPException(
+                    status_code=503,
+                    detail="Stored media is being removed, please retry",
+                    headers={"Retry-After": "1"}
+                )
+                
+            logger.info(f"Media upload response: {response.data}")
+            return response.data[0] if response.data else None
             
-            # Upload to Supabase Storage
-            file_path = f"{user_id}/{unique_filename}"
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error uploading media: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def upload_media_batch(self, uploads: List[Dict[str, Any]], ctx: DataContext, concurrency: int = 4) -> List[Dict[str, Any]]:
+        """Upload several media files in parallel and attach them in one call.
+
+        Each upload is a dict with ``memory_id``, ``filename``, ``media_type``,
+        ``label`` and a ``read`` callable returning the file content. Content
+        the user already stored (or that repeats within the batch) is uploaded
+        once. Returns one result per upload, in order, holding either
+        ``media`` or ``error``.
+        """
+        logger.info(f"Uploading batch of {len(uploads)} media files for user {ctx.user_id}")
+
+        # Use the request's authenticated Supabase client once for the whole batch
+        supabase = ctx.client
+        bucket = supabase.storage.from_(self.bucket)
+        semaphore = asyncio.Semaphore(concurrency)
+        results: List[Dict[str, Any]] = [{} for _ in uploads]
+
+        def digest(upload: Dict[str, Any]):
+            content = upload["read"]()
+            return hashlib.sha256(content).hexdigest(), len(content)
+
+        async def hash_one(index: int, upload: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    # Storage client and archive reads are synchronous, keep them off the event loop
+                    results[index]["sha256"], results[index]["size"] = await asyncio.to_thread(digest, upload)
+                except Exception as e:
+                    logger.error(f"Error reading {upload['filename']}: {str(e)}")
+                    results[index]["error"] = str(e)
+
+        await asyncio.gather(*(hash_one(index, upload) for index, upload in enumerate(uploads)))
+
+        hashed = [index for index, result in enumerate(results) if "sha256" in result]
+        if not hashed:
+            return results
+
+        try:
+            stored = await self._find_blobs(supabase, sorted({results[index]["sha256"] for index in hashed}))
+        except Exception as e:
+            logger.error(f"Error looking up media blobs: {str(e)}", exc_info=True)
+            for index in hashed:
+                results[index] = {"error": str(e)}
+            return results
+
+        # Upload each new content once, however many uploads share it
+        pending: Dict[str, int] = {}
+        for index in hashed:
+            sha256 = results[index]["sha256"]
+            if sha256 not in stored and sha256 not in pending:
+                pending[sha256] = index
+
+        uploaded: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+
+        async def store_one(sha256: str, index: int):
+            upload = uploads[index]
+            file_path = self._blob_path(ctx.user_id, sha256, upload["filename"])
+            async with semaphore:
+                try:
+                    # Retrying is safe: the path is derived from the content
+                    await storage_upstream.call(
+                        lambda: self._store_blob(bucket, file_path, upload["read"](), upload["filename"]),
+                        idempotent=True
+                    )
+                    uploaded[sha256] = file_path
+                except Exception as e:
+                    logger.error(f"Error uploading {upload['filename']}: {str(e)}")
+                    failed[sha256] = str(e)
+
+        await asyncio.gather(*(store_one(sha256, index) for sha256, index in pending.items()))
+        stored.update(uploaded)
+
+        attach = []
+        for index in hashed:
+            sha256 = results[index].pop("sha256")
+            size = results[index].pop("size")
+            if sha256 in failed:
+                results[index]["error"] = failed[sha256]
+                continue
+            attach.append(index)
+            results[index]["attachment"] = {
+                "memory_id": uploads[index]["memory_id"],
+                "sha256": sha256,
+                "file_path": stored[sha256],
+                "size_bytes": size,
+                "media_type": uploads[index]["media_type"],
+                "label": uploads[index].get("label")
+            }
+
+        # Attach all media records, taking blob references, in one call
+        if attach:
+            try:
+                response = await supabase_upstream.call(
+                    supabase.rpc('attach_media_blobs_for_user', {
+                        'p_attachments': [results[index]["attachment"] for index in attach]
+                    }).execute
+                )
+                for index, record in zip(attach, response.data):
+                    results[index] = {"media": record}
+            except Exception as e:
+                logger.error(f"Error attaching media batch: {str(e)}", exc_info=True)
+                # Objects nothing references yet are left for the storage reconciliation
+                for index in attach:
+                    results[index] = {"error": str(e)}
+
+        return results
+
+    async def _ensure_memory_owned(self, supabase, memory_id: int, user_id: str):
+        response = await supabase_upstream.call(
+            supabase.table("memories")
+                .select("id")
+                .eq("id", memory_id)
+                .eq("user_id", user_id)
+                .limit(1)
+                .execute,
+            idempotent=True,
+            hedge=True
+        )
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Memory not found or access denied")
+
+    async def create_upload_url(self, upload: MediaUploadRequest, ctx: DataContext) -> MediaUploadTicket:
+        """Issue a signed URL the client uploads the file to directly."""
+        try:
+            logger.info(f"Creating upload URL for memory {upload.memory_id} with type {upload.media_type}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Validate media type
+            if upload.media_type not in ["image", "audio"]:
+                raise HTTPException(status_code=400, detail="Invalid media type")
+                
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            await self._ensure_memory_owned(supabase, upload.memory_id, ctx.user_id)
             
-            # Read file content
-            content = await file.read()
+            # Direct uploads get a random name in the user's folder
+            file_extension = os.path.splitext(upload.filename)[1].lower()
+            file_path = f"{ctx.user_id}/{uuid.uuid4()}{file_extension}"
             
-            # Upload to storage
-            result = supabase.storage.from_(self.bucket).upload(file_path, content)
+            signed = await storage_upstream.call(
+                supabase.storage.from_(self.bucket).create_signed_upload_url,
+                file_path,
+                idempotent=True
+            )
+            logger.info(f"Created upload URL for {file_path}")
             
-            if not result:
-                raise HTTPException(status_code=500, detail="Failed to upload file")
+            return MediaUploadTicket(
+                file_path=file_path,
+                signed_url=signed["signed_url"],
+                token=signed["token"]
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error creating upload URL: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def _discard_upload(self, bucket, file_path: str):
+        try:
+            await storage_upstream.call(bucket.remove, [file_path], idempotent=True)
+        except Exception as e:
+            # The storage reconciliation queues it once the grace period is over
+            logger.warning(f"Could not remove rejected upload {file_path}: {str(e)}")
+
+    async def complete_upload(self, upload: MediaUploadComplete, ctx: DataContext) -> Media:
+        """Verify a directly uploaded object and create its media record."""
+        try:
+            logger.info(f"Completing upload of {upload.file_path} for memory {upload.memory_id}")
+            
+            # Validate media type
+            if upload.media_type not in ["image", "audio"]:
+                raise HTTPException(status_code=400, detail="Invalid media type")
+                
+            # Only paths issued by create_upload_url can be completed; this
+            # also keeps shared content-addressed blobs out of reach
+            folder, _, name = upload.file_path.partition("/")
+            stem = os.path.splitext(name)[0]
+            try:
+                issued = folder == ctx.user_id and str(uuid.UUID(stem)) == stem
+            except ValueError:
+                issued = False
+            if not issued:
+                raise HTTPException(status_code=400, detail="Invalid upload path")
+                
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            await self._ensure_memory_owned(supabase, upload.memory_id, ctx.user_id)
+            
+            # Verify the object landed in storage
+            bucket = supabase.storage.from_(self.bucket)
+            objects = await storage_upstream.call(bucket.list, folder, {"limit": 1, "search": name}, idempotent=True)
+            stored = next((item for item in objects if item.get("name") == name), None)
+            if not stored:
+                raise HTTPException(status_code=400, detail="Uploaded file not found")
+                
+            # Rejected objects are removed right away, nothing will reference them
+            metadata = stored.get("metadata") or {}
+            if metadata.get("size", 0) > settings.MAX_MEDIA_UPLOAD_BYTES:
+                await self._discard_upload(bucket, upload.file_path)
+                raise HTTPException(status_code=413, detail="Uploaded file is too large")
+            mimetype = metadata.get("mimetype")
+            if mimetype and not mimetype.startswith(f"{upload.media_type}/"):
+                await self._discard_upload(bucket, upload.file_path)
+                raise HTTPException(status_code=400, detail=f"Uploaded file is not {upload.media_type}")
                 
             # Create media attachment record
             media = MediaCreate(
-                memory_id=media_data.memory_id,
-                file_path=file_path,
-                media_type=media_data.media_type,
-                user_id=user_id,
-                label=media_data.label
+                memory_id=upload.memory_id,
+                file_path=upload.file_path,
+                media_type=upload.media_type,
+                user_id=ctx.user_id,
+                label=upload.label
             )
             
-            # Insert into media_attachments table
-            response = supabase.table("media_attachments") \
-                .insert(media.dict()) \
-                .execute()
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .insert(media.dict())
+                    .execute
+            )
                 
-            logger.info(f"Media upload response: {response.data}")
-            return response.data[0] if response.data else None
+            logger.info(f"Media upload completion response: {response.data}")
             
+            if not response.data:
+                raise HTTPException(status_code=500, detail="Failed to create media")
+                
+            return response.data[0]
+            
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error uploading media: {str(e)}", exc_info=True)
+            logger.error(f"Error completing upload: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_media_url(self, media_id: int, user_id: str, token: str):
+    async def get_media_url(self, media_id: int, ctx: DataContext):
         try:
-            logger.info(f"Fetching media {media_id} for user {user_id}")
+            logger.info(f"Fetching media {media_id} for user {ctx.user_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
             # Get media record
-            response = supabase.table("media_attachments") \
-                .select("*") \
-                .eq("id", media_id) \
-                .single() \
-                .execute()
+            response = await supabase_upstream.call(
+                supabase.table("media_attachments")
+                    .select("*")
+                    .eq("id", media_id)
+                    .single()
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
                 
             logger.info(f"Media record response: {response.data}")
             
@@ -234,10 +538,12 @@ class MediaService:
             # Get the file from Supabase Storage
             file_path = media["file_path"]
             
-            # Create a signed URL that expires in 1 hour
-            signed_url_response = supabase.storage.from_(self.bucket).create_signed_url(
+            # Create a signed URL (expiry is configurable, 1 hour by default)
+            signed_url_response = await storage_upstream.call(
+                supabase.storage.from_(self.bucket).create_signed_url,
                 file_path,
-                expires_in=3600  # 1 hour in seconds
+                expires_in=settings.SIGNED_URL_EXPIRES_IN,
+                idempotent=True
             )
             
             logger.info(f"Generated signed URL response: {signed_url_response}")
@@ -248,38 +554,96 @@ class MediaService:
             # Return the signed URL
             return signed_url_response["signedURL"]
                     
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error serving media: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def update_media_label(self, media_id: int, label: str, user_id: str, token: str):
+    async def get_media_content(self, media_id: int, ctx: DataContext) -> Dict[str, Any]:
+        """Fetch the media record whose content is about to be streamed."""
+        try:
+            logger.info(f"Fetching media {media_id} content for user {ctx.user_id}")
+            
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .select("id, file_path, media_type")
+                    .eq("id", media_id)
+                    .eq("user_id", ctx.user_id)
+                    .limit(1)
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
+                
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Media not found")
+                
+            return response.data[0]
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching media content: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def open_media_content(self, media: Dict[str, Any], ctx: DataContext):
+        """Open the media file from the local disk cache, filling it from storage on a miss.
+
+        Returns the open file and its size.
+        """
+        file_path = media["file_path"]
+
+        async def fetch():
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+            signed = await storage_upstream.call(
+                supabase.storage.from_(self.bucket).create_signed_url, file_path, expires_in=60,
+                idempotent=True
+            )
+            logger.info(f"Fetching {file_path} from storage into the media cache")
+            async with storage_bulkhead, httpx.AsyncClient(timeout=30) as client:
+                async with client.stream("GET", signed["signedURL"]) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(settings.MEDIA_STREAM_CHUNK_SIZE):
+                        yield chunk
+
+        try:
+            return await media_cache.open(file_path, fetch)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error opening media content: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=502, detail="Error fetching media from storage")
+
+    async def update_media_label(self, media_id: int, label: str, ctx: DataContext):
         try:
             logger.info(f"Updating media {media_id} with label: {label}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
-            # First check if the media exists and belongs to the user
-            check_response = supabase.table("media_attachments") \
-                .select("id") \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .single() \
-                .execute()
+            # Update only if the media belongs to the user, returning the row
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .update({"label": label}, returning=ReturnMethod.representation)
+                    .eq("id", media_id)
+                    .eq("user_id", ctx.user_id)
+                    .execute
+            )
                 
-            if not check_response.data:
-                raise HTTPException(status_code=404, detail="Media not found or access denied")
+            logger.info(f"Media update response: {response.data}")
             
-            # Update the media record
-            response = supabase.table("media_attachments") \
-                .update({"label": label}) \
-                .eq("id", media_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Media not found or access denied")
                 
-            logger.info(f"Media update response: {response.data}")
-            return response.data[0] if response.data else None
+            return response.data[0]
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error updating media: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,202 @@
+from app.supabase.client import close_client, create_user_client
+from app.core.config import settings
+from app.core.upstream import lift_deadline, storage_upstream, supabase_upstream
+from typing import Any, AsyncIterator, Dict, List
+from collections import deque
+import asyncio
+import json
+import logging
+import os
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+MEMORY_COLUMNS = "id, title, content, date, user_id, created_at, updated_at, media_attachments(*)"
+
+# Media files that could not be exported, one {"path", "error"} per line; the
+# manifest is streamed before the media, so it still lists them
+EXPORT_ERRORS_FILE = "export_errors.ndjson"
+
+class _ZipStream:
+    """Write-only file object that hands finished ZIP bytes back to a generator.
+
+    It has no ``tell``/``seek``, so ``zipfile`` writes members with data
+    descriptors and never needs to rewind what has already been streamed.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class MemoryExportService:
+    def __init__(self):
+        self.memories_table = "memories"
+        self.media_table = "media_attachments"
+        self.bucket = settings.MEDIA_BUCKET
+        self.page_size = settings.EXPORT_PAGE_SIZE
+        self.media_concurrency = settings.EXPORT_MEDIA_CONCURRENCY
+
+    async def export_ndjson(self, user_id: str, token: str) -> AsyncIterator[bytes]:
+        """Stream all memories as NDJSON, with signed URLs for their media."""
+        logger.info(f"Starting NDJSON export for user {user_id}")
+        # The stream runs after the endpoint returned, so it opens (and
+        # closes) its own client; the token was validated by the endpoint
+        lift_deadline()
+        supabase = create_user_client(token)
+        try:
+            bucket = supabase.storage.from_(self.bucket)
+            exported = 0
+
+            async for page in self._memory_pages(supabase, user_id):
+                # Sign every attachment of the page with one storage call
+                attachments = [media for memory in page for media in memory.get("media_attachments") or []]
+                if attachments:
+                    signed = await storage_upstream.call(
+                        bucket.create_signed_urls,
+                        [media["file_path"] for media in attachments],
+                        settings.SIGNED_URL_EXPIRES_IN,
+                        idempotent=True
+                    )
+                    for media, signed_url in zip(attachments, signed):
+                        media["signed_url"] = signed_url.get("signedURL")
+
+                yield b"".join(json.dumps(memory, default=str).encode() + b"\n" for memory in page)
+                exported += len(page)
+        finally:
+            close_client(supabase)
+
+        logger.info(f"NDJSON export finished for user {user_id}: {exported} memories")
+
+    async def export_zip(self, user_id: str, token: str) -> AsyncIterator[bytes]:
+        """Stream a ZIP archive with ``memories.ndjson`` and every media file.
+
+        The archive layout matches what the bulk import accepts, so an export
+        can be re-imported as is. Media that could not be downloaded is listed
+        in ``export_errors.ndjson``, which the import reports.
+        """
+        logger.info(f"Starting ZIP export for user {user_id}")
+        lift_deadline()
+        supabase = create_user_client(token)
+        try:
+            bucket = supabase.storage.from_(self.bucket)
+            stream = _ZipStream()
+
+            with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+                # First pass: memories, with media referenced by their archive path
+                with archive.open("memories.ndjson", mode="w", force_zip64=True) as manifest:
+                    async for page in self._memory_pages(supabase, user_id):
+                        for memory in page:
+                            manifest.write(json.dumps(self._archive_record(memory), default=str).encode() + b"\n")
+                        yield stream.drain()
+
+                # Second pass: media files, downloaded with bounded concurrency
+                pending = deque()
+                failed: List[Dict[str, str]] = []
+                try:
+                    async for page in self._media_pages(supabase, user_id):
+                        for media in page:
+                            download = asyncio.create_task(
+                                storage_upstream.call(bucket.download, media["file_path"], idempotent=True)
+                            )
+                            pending.append((media, download))
+                            if len(pending) >= self.media_concurrency:
+                                await self._write_media(archive, *pending.popleft(), failed)
+                                yield stream.drain()
+                    while pending:
+                        await self._write_media(archive, *pending.popleft(), failed)
+                        yield stream.drain()
+                finally:
+                    # Client went away mid-export; drop downloads nobody will read
+                    for _, download in pending:
+                        download.cancel()
+
+                if failed:
+                    logger.warning(f"ZIP export for user {user_id} is missing {len(failed)} media files")
+                    archive.writestr(EXPORT_ERRORS_FILE, b"".join(json.dumps(error).encode() + b"\n" for error in failed))
+
+            yield stream.drain()
+        finally:
+            close_client(supabase)
+        logger.info(f"ZIP export finished for user {user_id}")
+
+    async def _memory_pages(self, supabase, user_id: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Page through the user's memories by id (keyset pagination)."""
+        last_id = 0
+        while True:
+            response = await supabase_upstream.call(
+                supabase.table(self.memories_table)
+                    .select(MEMORY_COLUMNS)
+                    .eq("user_id", user_id)
+                    .gt("id", last_id)
+                    .order("id")
+                    .limit(self.page_size)
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
+            page = response.data or []
+            if not page:
+                return
+            yield page
+            if len(page) < self.page_size:
+                return
+            last_id = page[-1]["id"]
+
+    async def _media_pages(self, supabase, user_id: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Page through the user's media attachments by id (keyset pagination)."""
+        last_id = 0
+        while True:
+            response = await supabase_upstream.call(
+                supabase.table(self.media_table)
+                    .select("id, file_path")
+                    .eq("user_id", user_id)
+                    .gt("id", last_id)
+                    .order("id")
+                    .limit(self.page_size)
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
+            page = response.data or []
+            if not page:
+                return
+            yield page
+            if len(page) < self.page_size:
+                return
+            last_id = page[-1]["id"]
+
+    def _archive_path(self, media: Dict[str, Any]) -> str:
+        return f"media/{media['id']}{os.path.splitext(media['file_path'])[1]}"
+
+    def _archive_record(self, memory: Dict[str, Any]) -> Dict[str, Any]:
+        record = {key: value for key, value in memory.items() if key != "media_attachments"}
+        record["media"] = [
+            {
+                "path": self._archive_path(media),
+                "media_type": media["media_type"],
+                "label": media.get("label")
+            }
+            for media in memory.get("media_attachments") or []
+        ]
+        return record
+
+    async def _write_media(self, archive: zipfile.ZipFile, media: Dict[str, Any], download: asyncio.Task, failed: List[Dict[str, str]]):
+        try:
+            content = await download
+        except Exception as e:
+            logger.error(f"Error downloading {media['file_path']} for export: {str(e)}")
+            failed.append({"path": self._archive_path(media), "error": f"Download failed: {str(e)}"})
+            return
+        # Media is already compressed, store it as is
+        archive.writestr(self._archive_path(media), content, compress_type=zipfile.ZIP_STORED)
@@ -0,0 +1,208 @@
+from app.core.data_context import DataContext
+from app.services.memory_service import MemoryService
+from app.services.media_service import MediaService
+from app.services.memory_export_service import EXPORT_ERRORS_FILE
+from app.models.memory import (
+    MemoryImportRecord, MemoryImportError, MemoryImportResult
+)
+from app.core.config import settings
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from functools import partial
+from pydantic import ValidationError
+from fastapi import HTTPException
+import io
+import json
+import logging
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# Names accepted for the memories file inside an import archive
+ARCHIVE_MANIFESTS = ("memories.ndjson", "memories.jsonl")
+
+class MemoryImportService:
+    def __init__(self):
+        self.memory_service = MemoryService()
+        self.media_service = MediaService()
+        self.batch_size = settings.IMPORT_BATCH_SIZE
+        self.media_concurrency = settings.IMPORT_MEDIA_CONCURRENCY
+
+    async def import_ndjson(self, chunks: AsyncIterator[bytes], ctx: DataContext) -> MemoryImportResult:
+        """Import memories from a stream of NDJSON chunks (one memory per line)."""
+        logger.info(f"Starting NDJSON memory import for user {ctx.user_id}")
+        return await self._import_lines(self._split_lines(chunks), ctx)
+
+    async def import_archive(self, archive_file, ctx: DataContext) -> MemoryImportResult:
+        """Import memories and their media from a ZIP archive.
+
+        The archive must contain a ``memories.ndjson`` (or ``memories.jsonl``) file
+        at its root; media entries reference other files of the archive by path.
+        """
+        logger.info(f"Starting archive memory import for user {ctx.user_id}")
+        try:
+            archive = zipfile.ZipFile(archive_file)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Import file is not a valid ZIP archive")
+
+        with archive:
+            names = set(archive.namelist())
+            manifest = next((name for name in ARCHIVE_MANIFESTS if name in names), None)
+            if manifest is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Archive must contain one of: {', '.join(ARCHIVE_MANIFESTS)}"
+                )
+
+            async def lines():
+                with archive.open(manifest) as raw:
+                    for line in io.TextIOWrapper(raw, encoding="utf-8"):
+                        yield line
+
+            return await self._import_lines(lines(), ctx, archive=archive, missing_media=self._missing_media(archive, names))
+
+    def _missing_media(self, archive: zipfile.ZipFile, names) -> Dict[str, str]:
+        """Media an export listed but could not include, by path, with the reason."""
+        if EXPORT_ERRORS_FILE not in names:
+            return {}
+        missing = {}
+        for line in archive.read(EXPORT_ERRORS_FILE).splitlines():
+            try:
+                error = json.loads(line)
+                missing[error["path"]] = error.get("error") or "Not exported"
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+        return missing
+
+    async def _split_lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """Split a byte stream into lines without buffering the whole body."""
+        buffer = b""
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8", errors="replace")
+        if buffer:
+            yield buffer.decode("utf-8", errors="replace")
+
+    async def _import_lines(
+        self,
+        lines: AsyncIterator[str],
+        ctx: DataContext,
+        archive: Optional[zipfile.ZipFile] = None,
+        missing_media: Optional[Dict[str, str]] = None
+    ) -> MemoryImportResult:
+        missing_media = missing_media or {}
+        result = MemoryImportResult()
+        batch: List[Tuple[int, MemoryImportRecord]] = []
+        line_number = 0
+
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+
+            record, error = self._parse_record(line, archive, missing_media)
+            if error:
+                result.failed += 1
+                result.errors.append(MemoryImportError(line=line_number, error=error))
+                continue
+
+            # The memory is imported without the media its export could not include
+            dropped = [media for media in record.media if media.path in missing_media]
+            if dropped:
+                record.media = [media for media in record.media if media.path not in missing_media]
+                result.errors.extend(
+                    MemoryImportError(line=line_number, error=f"Media missing from export: {media.path} ({missing_media[media.path]})")
+                    for media in dropped
+                )
+
+            batch.append((line_number, record))
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, result, ctx, archive)
+                batch = []
+
+        if batch:
+            await self._flush(batch, result, ctx, archive)
+
+        logger.info(
+            f"Memory import finished for user {ctx.user_id}: {result.imported} imported, "
+            f"{result.failed} failed, {result.media_uploaded} media uploaded"
+        )
+        return result
+
+    def _parse_record(
+        self,
+        line: str,
+        archive: Optional[zipfile.ZipFile],
+        missing_media: Dict[str, str]
+    ) -> Tuple[Optional[MemoryImportRecord], Optional[str]]:
+        """Validate one NDJSON line, returning either a record or an error message."""
+        try:
+            record = MemoryImportRecord(**json.loads(line))
+        except json.JSONDecodeError as e:
+            return None, f"Invalid JSON: {e.msg}"
+        except (ValidationError, TypeError) as e:
+            return None, f"Invalid memory: {str(e)}"
+
+        for media in record.media:
+            if archive is None:
+                return None, "Media attachments require a ZIP archive import"
+            if media.media_type not in ["image", "audio"]:
+                return None, f"Invalid media type: {media.media_type}"
+            if media.path not in archive.NameToInfo and media.path not in missing_media:
+                return None, f"Media file not found in archive: {media.path}"
+
+        return record, None
+
+    async def _flush(
+        self,
+        batch: List[Tuple[int, MemoryImportRecord]],
+        result: MemoryImportResult,
+        ctx: DataContext,
+        archive: Optional[zipfile.ZipFile]
+    ):
+        """Insert one batch of memories, then upload the batch's media in parallel."""
+        try:
+            created = await self.memory_service.create_memories_batch(
+                [record for _, record in batch], ctx
+            )
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Memory import batch failed: {detail}")
+            result.failed += len(batch)
+            result.errors.extend(
+                MemoryImportError(line=line, error=f"Batch insert failed: {detail}")
+                for line, _ in batch
+            )
+            return
+
+        # create_memories_batch returns the memories in the order of the batch
+        result.imported += len(created)
+        result.memory_ids.extend(memory.id for memory in created)
+
+        uploads = []
+        upload_lines = []
+        for (line, record), memory in zip(batch, created):
+            for media in record.media:
+                uploads.append({
+                    "memory_id": memory.id,
+                    "filename": media.path,
+                    "media_type": media.media_type,
+                    "label": media.label,
+                    "read": partial(archive.read, media.path)
+                })
+                upload_lines.append(line)
+
+        if not uploads:
+            return
+
+        upload_results = await self.media_service.upload_media_batch(
+            uploads, ctx, concurrency=self.media_concurrency
+        )
+        for line, upload_result in zip(upload_lines, upload_results):
+            if "error" in upload_result:
+                result.errors.append(
+                    MemoryImportError(line=line, error=f"Media upload failed: {upload_result['error']}")
+                )
+            else:
+                result.media_uploaded += 1
@@ -0,0 +1,99 @@
+from app.core.config import settings
+from app.core.data_context import DataContext
+from app.core.upstream import supabase_upstream
+from app.services.embedding_service import EmbeddingService, memory_text
+from app.services.vector_index import local_index, reciprocal_rank_fusion
+from typing import Any, Dict, List, Optional
+import logging
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+class MemorySearchService:
+    def __init__(self):
+        self.embedding_service = EmbeddingService()
+
+    async def hybrid_search(
+        self,
+        query: str,
+        ctx: DataContext,
+        limit: int = 20,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search memories by meaning and keywords, fusing both rankings."""
+        try:
+            logger.info(f"Hybrid search for user {ctx.user_id}: {query}")
+
+            # Embed the query; without it the search falls back to full-text only
+            try:
+                query_embedding = (await self.embedding_service.embed([query]))[0]
+            except Exception as e:
+                logger.warning(f"Query embedding failed, using full-text search only: {str(e)}")
+                query_embedding = None
+
+            if settings.VECTOR_INDEX == "local":
+                return await self._local_search(query, query_embedding, ctx, limit, start_date, end_date)
+
+            # Use the request's authenticated Supabase client
+            response = await supabase_upstream.call(
+                ctx.client.rpc('hybrid_search_memories', {
+                    'p_query': query,
+                    'p_query_embedding': str(query_embedding) if query_embedding else None,
+                    'p_match_count': limit,
+                    'p_rrf_k': settings.SEARCH_RRF_K,
+                    'p_start_date': start_date,
+                    'p_end_date': end_date
+                }).execute,
+                idempotent=True,
+                hedge=True
+            )
+
+            logger.info(f"Hybrid search found {len(response.data or [])} memories")
+            return response.data or []
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error in hybrid search: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def _local_search(self, query, query_embedding, ctx: DataContext, limit, start_date, end_date) -> List[Dict[str, Any]]:
+        response = await supabase_upstream.call(
+            ctx.client.rpc(
+                'get_memories_for_user',
+                {'user_id': ctx.user_id}
+            ).execute,
+            idempotent=True,
+            hedge=True
+        )
+
+        memories = {memory["id"]: memory for memory in response.data or []}
+        if start_date:
+            memories = {id: m for id, m in memories.items() if m['date'] >= start_date}
+        if end_date:
+            memories = {id: m for id, m in memories.items() if m['date'] <= end_date}
+
+        # Keyword ranking: number of query term occurrences
+        terms = [term for term in query.lower().split() if term]
+        text_scores = {}
+        for id, memory in memories.items():
+            text = memory_text(memory.get("title"), memory.get("content")).lower()
+            hits = sum(text.count(term) for term in terms)
+            if hits:
+                text_scores[id] = hits
+        text_ranking = sorted(text_scores, key=text_scores.get, reverse=True)[:limit * 2]
+
+        similarities = {}
+        if query_embedding:
+            similarities = dict(local_index.query(ctx.user_id, query_embedding, limit * 2, candidates=memories))
+
+        results = []
+        for id, score in reciprocal_rank_fusion([text_ranking, list(similarities)], settings.SEARCH_RRF_K)[:limit]:
+            results.append({
+                **memories[id],
+                "text_rank": text_scores.get(id),
+                "similarity": similarities.get(id),
+                "score": score
+            })
+        return results
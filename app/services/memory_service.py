@@ -1,5 +1,8 @@
-from app.supabase.client import get_authenticated_client
-from app.models.memory import MemoryCreate, Memory
+from app.core.data_context import DataContext
+from app.models.memory import MemoryCreate, Memory, MemoryDetail
+from app.core.config import settings
+from app.core.singleflight import coalesce_read, forget_read
+from app.core.upstream import storage_upstream, supabase_upstream
 from typing import Dict, Any, Optional, List
 import logging
 from datetime import datetime
@@ -11,24 +14,26 @@ class MemoryService:
     def __init__(self):
         self.table = "memories"
 
-    async def create_memory(self, memory: MemoryCreate, user_id: str, token: str) -> Memory:
+    async def create_memory(self, memory: MemoryCreate, ctx: DataContext) -> Memory:
         try:
-            logger.info(f"Creating memory for user {user_id}")
-            logger.info(f"Token (first 20 chars): {token[:20]}...")
+            logger.info(f"Creating memory for user {ctx.user_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
             # Create memory using RPC
-            response = supabase.rpc(
-                'create_memory_for_user',
-                {
-                    'title': memory.title,
-                    'content': memory.content,
-                    'date': memory.date.isoformat(),
-                    'user_id': user_id
-                }
-            ).execute()
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'create_memory_for_user',
+                    {
+                        'title': memory.title,
+                        'content': memory.content,
+                        'date': memory.date.isoformat(),
+                        'user_id': ctx.user_id
+                    }
+                ).execute
+            )
+            forget_read('get_memories_for_user', ctx.user_id)
             
             logger.info(f"Memory creation response: {response.data}")
             
@@ -53,27 +58,81 @@ class MemoryService:
             else:
                 raise HTTPException(status_code=500, detail="Invalid response format")
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error creating memory: {str(e)}", exc_info=True)
             logger.error(f"Error type: {type(e)}")
             logger.error(f"Error details: {e.__dict__ if hasattr(e, '__dict__') else 'No details available'}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_memory(self, memory_id: int, user_id: str, token: str) -> Memory:
+    async def create_memories_batch(self, memories: List[MemoryCreate], ctx: DataContext) -> List[Memory]:
+        """Create several memories with a single multi-row insert; returned in the order given."""
         try:
-            logger.info(f"Fetching memory {memory_id} for user {user_id}")
+            logger.info(f"Creating batch of {len(memories)} memories for user {ctx.user_id}")
+
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+
+            # Insert the whole batch in one RPC call (one transaction)
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'import_memories_for_user',
+                    {
+                        'p_memories': [
+                            {
+                                'title': memory.title,
+                                'content': memory.content,
+                                'date': memory.date.isoformat() if memory.date else None
+                            }
+                            for memory in memories
+                        ]
+                    }
+                ).execute
+            )
+            forget_read('get_memories_for_user', ctx.user_id)
+
+            logger.info(f"Memory batch creation returned {len(response.data or [])} rows")
+
+            if not response.data:
+                raise HTTPException(status_code=500, detail="Failed to create memories")
+
+            # Rows carry their position in the request; return them in that order
+            created = []
+            for row in sorted(response.data, key=lambda row: row['import_index']):
+                memory_data = row['memory']
+                # Add updated_at if not present
+                if 'updated_at' not in memory_data:
+                    memory_data['updated_at'] = memory_data.get('created_at')
+                created.append(Memory(**memory_data))
+
+            return created
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error creating memory batch: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def get_memory(self, memory_id: int, ctx: DataContext) -> Memory:
+        try:
+            logger.info(f"Fetching memory {memory_id} for user {ctx.user_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
             # Get memory using RPC
-            response = supabase.rpc(
-                'get_memory_for_user',
-                {
-                    'memory_id': memory_id,
-                    'user_id': user_id
-                }
-            ).execute()
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'get_memory_for_user',
+                    {
+                        'memory_id': memory_id,
+                        'user_id': ctx.user_id
+                    }
+                ).execute,
+                idempotent=True,
+                hedge=True
+            )
                 
             logger.info(f"Memory fetch response: {response.data}")
             
@@ -97,28 +156,92 @@ class MemoryService:
             else:
                 raise HTTPException(status_code=500, detail="Invalid response format")
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching memory: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_memories(self, user_id: str, token: str) -> List[Memory]:
+    async def get_memory_detail(self, memory_id: int, ctx: DataContext) -> MemoryDetail:
+        """Get a memory with its media and signed URLs in one query plus one signing call."""
+        try:
+            logger.info(f"Fetching memory detail {memory_id} for user {ctx.user_id}")
+
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
+
+            # Fetch the memory and its attachments with an embedded select
+            response = await supabase_upstream.call(
+                supabase.table(self.table)
+                    .select("id, title, content, date, user_id, created_at, updated_at, media_attachments(*)")
+                    .eq("id", memory_id)
+                    .eq("user_id", ctx.user_id)
+                    .limit(1)
+                    .execute,
+                idempotent=True,
+                hedge=True
+            )
+
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Memory not found")
+
+            memory_data = response.data[0]
+            if not memory_data.get('updated_at'):
+                memory_data['updated_at'] = memory_data.get('created_at')
+            attachments = memory_data.get('media_attachments') or []
+
+            # Sign every attachment with a single storage call
+            if attachments:
+                signed = await storage_upstream.call(
+                    supabase.storage.from_(settings.MEDIA_BUCKET).create_signed_urls,
+                    [media['file_path'] for media in attachments],
+                    settings.SIGNED_URL_EXPIRES_IN,
+                    idempotent=True
+                )
+                signed_urls = {item.get('path'): item.get('signedURL') for item in signed if not item.get('error')}
+                for media in attachments:
+                    media['signed_url'] = signed_urls.get(media['file_path'])
+
+            return MemoryDetail(**memory_data)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching memory detail: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def get_memory_rows(self, ctx: DataContext) -> List[Dict[str, Any]]:
+        """Rows of get_memories_for_user; concurrent calls for a user share one query."""
+        async def fetch():
+            response = await supabase_upstream.call(
+                ctx.client.rpc(
+                    'get_memories_for_user',
+                    {'user_id': ctx.user_id}
+                ).execute,
+                idempotent=True,
+                hedge=True
+            )
+            return response.data or []
+        
+        return await coalesce_read('get_memories_for_user', ctx.user_id, (), fetch)
+
+    async def get_memories(self, ctx: DataContext) -> List[Memory]:
         """Get all memories for a user."""
         try:
-            logger.info(f"MemoryService.get_memories called for user_id: {user_id}")
-            logger.info(f"Token (first 20 chars): {token[:20]}...")
+            logger.info(f"MemoryService.get_memories called for user_id: {ctx.user_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             logger.info("Created authenticated Supabase client in service")
             
             # Query memories
             query = supabase.table(self.table) \
-                .select("id, title, content, date, user_id, created_at, media_attachments(*)") \
-                .eq("user_id", user_id) \
+                .select("id, title, content, date, user_id, created_at, updated_at, media_attachments(*)") \
+                .eq("user_id", ctx.user_id) \
                 .order("date", desc=True)
                 
             logger.info("Executing Supabase query...")
-            response = query.execute()
+            response = await supabase_upstream.call(query.execute, idempotent=True, hedge=True)
             logger.info(f"Query response: {response}")
             
             if not response.data:
@@ -131,8 +254,9 @@ class MemoryService:
             memories = []
             for memory_data in response.data:
                 try:
-                    # Use created_at as updated_at since we don't have an updated_at column
-                    memory_data['updated_at'] = memory_data.get('created_at')
+                    # Rows created before updated_at existed fall back to created_at
+                    if not memory_data.get('updated_at'):
+                        memory_data['updated_at'] = memory_data.get('created_at')
                     memory = Memory(**memory_data)
                     memories.append(memory)
                     logger.info(f"Successfully converted memory {memory.id}")
@@ -147,24 +271,27 @@ class MemoryService:
             logger.error(f"Error in get_memories: {str(e)}", exc_info=True)
             raise
 
-    async def update_memory(self, memory_id: int, memory: MemoryCreate, user_id: str, token: str) -> Memory:
+    async def update_memory(self, memory_id: int, memory: MemoryCreate, ctx: DataContext) -> Memory:
         try:
-            logger.info(f"Updating memory {memory_id} for user {user_id}")
+            logger.info(f"Updating memory {memory_id} for user {ctx.user_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
             # Update memory using RPC
-            response = supabase.rpc(
-                'update_memory_for_user',
-                {
-                    'memory_id': memory_id,
-                    'title': memory.title,
-                    'content': memory.content,
-                    'date': memory.date.isoformat(),
-                    'user_id': user_id
-                }
-            ).execute()
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'update_memory_for_user',
+                    {
+                        'memory_id': memory_id,
+                        'title': memory.title,
+                        'content': memory.content,
+                        'date': memory.date.isoformat(),
+                        'user_id': ctx.user_id
+                    }
+                ).execute
+            )
+            forget_read('get_memories_for_user', ctx.user_id)
                 
             logger.info(f"Memory update response: {response.data}")
             
@@ -188,25 +315,30 @@ class MemoryService:
             else:
                 raise HTTPException(status_code=500, detail="Invalid response format")
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error updating memory: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def delete_memory(self, memory_id: int, user_id: str, token: str):
+    async def delete_memory(self, memory_id: int, ctx: DataContext):
         try:
-            logger.info(f"Deleting memory {memory_id} for user {user_id}")
+            logger.info(f"Deleting memory {memory_id} for user {ctx.user_id}")
             
-            # Get authenticated Supabase client
-            supabase = get_authenticated_client(token)
+            # Use the request's authenticated Supabase client
+            supabase = ctx.client
             
             # Delete memory using RPC
-            response = supabase.rpc(
-                'delete_memory_for_user',
-                {
-                    'memory_id': memory_id,
-                    'user_id': user_id
-                }
-            ).execute()
+            response = await supabase_upstream.call(
+                supabase.rpc(
+                    'delete_memory_for_user',
+                    {
+                        'memory_id': memory_id,
+                        'user_id': ctx.user_id
+                    }
+                ).execute
+            )
+            forget_read('get_memories_for_user', ctx.user_id)
                 
             logger.info(f"Memory deletion response: {response.data}")
             
@@ -230,6 +362,8 @@ class MemoryService:
             else:
                 raise HTTPException(status_code=500, detail="Invalid response format")
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error deleting memory: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
@@ -1,47 +1,67 @@
 import os
-from fastapi import UploadFile
-import openai
+from fastapi import HTTPException, UploadFile
 from typing import Optional
 import tempfile
 from app.core.config import settings
+from app.core.clients import get_openai_client
+from app.core.upstream import openai_upstream
+
+# Returned instead of a transcript when the recording has no speech
+NO_SPEECH_DETECTED = "No speech detected. Please try recording again."
 
 class TranscriptionService:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+    @property
+    def client(self):
+        # Shared OpenAI client, created (and the SDK imported) on first use
+        return get_openai_client()
 
     async def transcribe_audio(self, audio_file: UploadFile) -> Optional[str]:
+        try:
+            content = await audio_file.read()
+        except Exception as e:
+            print(f"Transcription error: {str(e)}")
+            return None
+        return await self.transcribe_bytes(content, audio_file.filename, audio_file.content_type)
+
+    async def transcribe_bytes(self, content: bytes, filename: str, content_type: Optional[str] = None) -> Optional[str]:
+        """Transcribe a recording already in memory; Whisper detects its format from ``filename``."""
         try:
             # Create a temporary directory
             with tempfile.TemporaryDirectory() as temp_dir:
-                # Save the uploaded file temporarily
-                input_path = os.path.join(temp_dir, f"input_{audio_file.filename}")
+                # Save the recording temporarily
+                input_path = os.path.join(temp_dir, f"input_{filename}")
                 with open(input_path, "wb") as buffer:
-                    content = await audio_file.read()
                     buffer.write(content)
 
                 # Debug: Log file details
                 print(f"DEBUG: File size: {len(content)} bytes")
-                print(f"DEBUG: File type: {audio_file.content_type}")
-                print(f"DEBUG: File name: {audio_file.filename}")
+                print(f"DEBUG: File type: {content_type}")
+                print(f"DEBUG: File name: {filename}")
                 print(f"DEBUG: First 100 bytes: {content[:100].hex()}")
 
                 # Check if the file is too small (less than 1KB)
                 if len(content) < 1024:
-                    return "No speech detected. Please try recording again."
+                    return NO_SPEECH_DETECTED
+
+                # Transcribe using Whisper API; the file is reopened on every
+                # attempt so retries send it from the start
+                def transcribe():
+                    with open(input_path, "rb") as audio_file:
+                        return self.client.audio.transcriptions.create(
+                            model="whisper-1",
+                            file=audio_file,
+                            language="en"  # Force English language
+                        )
 
-                # Transcribe using Whisper API
-                with open(input_path, "rb") as audio_file:
-                    transcript = self.client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        language="en"  # Force English language
-                    )
+                transcript = await openai_upstream.call(transcribe, idempotent=True)
 
                 # Check if the transcript is empty or just whitespace
                 if not transcript.text or transcript.text.strip() == "":
-                    return "No speech detected. Please try recording again."
+                    return NO_SPEECH_DETECTED
 
                 return transcript.text
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Transcription error: {str(e)}")
             return None 
\ No newline at end of file
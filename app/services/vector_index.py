@@ -0,0 +1,40 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists; each list contributes 1 / (k + rank) per id.
+
+    Mirrors the fusion done by the ``hybrid_search_memories`` RPC.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for position, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + position)
+    return sorted(scores.items(), key=lambda entry: entry[1], reverse=True)
+
+class LocalVectorIndex:
+    """Exact in-process vector index, used instead of pgvector in tests and development."""
+
+    def __init__(self):
+        self._vectors: Dict[str, Dict[int, List[float]]] = {}
+
+    def upsert(self, user_id: str, memory_id: int, vector: List[float]):
+        self._vectors.setdefault(user_id, {})[memory_id] = vector
+
+    def remove(self, user_id: str, memory_id: int):
+        self._vectors.get(user_id, {}).pop(memory_id, None)
+
+    def query(self, user_id: str, vector: List[float], k: int, candidates: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Return up to ``k`` (memory id, similarity) pairs, most similar first."""
+        vectors = self._vectors.get(user_id, {})
+        ids = vectors.keys() if candidates is None else [id for id in candidates if id in vectors]
+        scored = [(id, cosine_similarity(vector, vectors[id])) for id in ids]
+        scored.sort(key=lambda entry: entry[1], reverse=True)
+        return scored[:k]
+
+local_index = LocalVectorIndex()
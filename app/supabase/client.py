@@ -1,38 +1,81 @@
-from supabase import create_client, Client
 from app.core.config import settings
+from typing import TYPE_CHECKING, Optional
 import logging
 import json
-from jose import jwt
+import threading
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
-# Use anon key for backend operations
-supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-
-def get_authenticated_client(token: str) -> Client:
-    """
-    Create an authenticated Supabase client with the provided token.
-    """
-    try:
-        logger.info("Creating Supabase client...")
-        logger.info(f"Supabase URL: {settings.SUPABASE_URL}")
-        logger.info(f"Supabase Key: {settings.SUPABASE_KEY[:10]}...")
-        logger.info(f"Token (first 20 chars): {token[:20]}...")
-        
-        # Create the client with the API key
-        client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_KEY
-        )
-        
-        # Verify the token
-        user = client.auth.get_user(token)
-        if not user:
-            raise Exception("Invalid token")
-            
-        logger.info("Supabase client created successfully")
-        return client
-        
-    except Exception as e:
-        logger.error(f"Error creating Supabase client: {str(e)}", exc_info=True)
-        raise
+# The Supabase SDK is imported when the first client is created, not when
+# the app is imported; the lifespan does it at startup
+_anon_client: Optional["Client"] = None
+_lock = threading.Lock()
+
+def create_client(supabase_url: str, supabase_key: str) -> "Client":
+    """Create a Supabase client, importing the SDK on first use."""
+    from supabase import create_client as _create_client
+    return _create_client(supabase_url, supabase_key)
+
+def get_anon_client() -> "Client":
+    """
+    Return the shared anon-key client for backend operations, creating it on first use.
+    """
+    global _anon_client
+    if _anon_client is None:
+        with _lock:
+            if _anon_client is None:
+                # Use anon key for backend operations
+                _anon_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return _anon_client
+
+def close_anon_client():
+    """
+    Close the shared anon-key client's connections, if the client was created.
+    """
+    global _anon_client
+    with _lock:
+        client, _anon_client = _anon_client, None
+    if client is not None:
+        # The anon client is only used to verify tokens
+        client.auth.close()
+
+def create_user_client(token: str) -> "Client":
+    """
+    Create a Supabase client whose database requests run as the token's user.
+
+    The token is not checked again; use it for tokens get_current_user has
+    already validated.
+    """
+    client = create_client(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_KEY
+    )
+    client.postgrest.auth(token)
+    return client
+
+def close_client(client: "Client"):
+    """
+    Close a client's connection pools, without creating its lazy database or storage client.
+    """
+    if client._postgrest is not None:
+        client._postgrest.session.close()
+    if client._storage is not None:
+        # storage3's sync client still calls it aclose
+        client._storage.aclose()
+    client.auth.close()
+
+def get_service_client() -> "Client":
+    """
+    Create a Supabase client with the service role key, for background workers.
+    """
+    if not settings.SUPABASE_SERVICE_KEY:
+        raise Exception("SUPABASE_SERVICE_KEY is required for background workers")
+    
+    logger.info("Creating Supabase service client...")
+    return create_client(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_SERVICE_KEY
+    )
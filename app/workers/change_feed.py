@@ -0,0 +1,249 @@
+from app.supabase.client import get_service_client
+from app.core.config import settings
+from app.services.embedding_service import EmbeddingService, content_hash, memory_text
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from fastapi import HTTPException
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ChangeFeedWorker:
+    """Background worker that keeps memory embeddings in sync with their text.
+
+    Triggers on ``memories`` append every insert, text update and delete to
+    ``memory_changes``. The worker reads them in batches after the
+    consumer's checkpoint, in (transaction, id) order and only once their
+    transaction can no longer be running, keeps only the latest change per
+    memory, re-embeds
+    the memories whose text no longer matches their ``embedding_hash`` and
+    then advances the checkpoint, so a crash replays at most one batch.
+
+    ``backfill`` embeds existing memories that have no (or a stale) vector,
+    split into partitions by id that run in parallel and record their
+    progress in ``backfill_progress`` so an interrupted backfill resumes.
+    """
+
+    def __init__(self, client=None, embedding_service: Optional[EmbeddingService] = None, consumer: str = "embeddings"):
+        self.client = client
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.consumer = consumer
+        self.table = "memories"
+        self.progress_table = "backfill_progress"
+        self.batch_size = settings.CHANGE_FEED_BATCH_SIZE
+        self.interval = settings.CHANGE_FEED_INTERVAL_SECONDS
+        self.prune_interval = settings.CHANGE_FEED_PRUNE_INTERVAL_SECONDS
+
+    def _client(self):
+        if self.client is None:
+            self.client = get_service_client()
+        return self.client
+
+    async def run_once(self) -> int:
+        """Process one batch of changes; returns how many were read."""
+        supabase = self._client()
+        response = await asyncio.to_thread(
+            supabase.rpc(
+                'read_memory_changes',
+                {'p_consumer': self.consumer, 'p_limit': self.batch_size}
+            ).execute
+        )
+        changes = response.data or []
+        if not changes:
+            return 0
+
+        # Only the latest operation per memory matters; a memory that was
+        # edited several times is embedded once, a deleted one not at all
+        latest: Dict[int, str] = {}
+        for change in changes:
+            latest[change['memory_id']] = change['operation']
+        upserted = [memory_id for memory_id, operation in latest.items() if operation == 'upsert']
+
+        stored = await self._refresh(supabase, upserted) if upserted else 0
+
+        await asyncio.to_thread(
+            supabase.rpc(
+                'advance_change_checkpoint',
+                {
+                    'p_consumer': self.consumer,
+                    'p_last_txid': str(changes[-1]['txid']),
+                    'p_last_change_id': changes[-1]['id']
+                }
+            ).execute
+        )
+        logger.info(f"Change feed processed {len(changes)} changes, stored {stored} embeddings")
+        return len(changes)
+
+    async def _refresh(self, supabase, memory_ids: List[int]) -> int:
+        response = await asyncio.to_thread(
+            supabase.table(self.table)
+                .select("id, title, content, embedding_hash")
+                .in_("id", memory_ids)
+                .execute
+        )
+        # Skip memories whose vector already matches their text
+        stale = [
+            row for row in response.data or []
+            if row.get('embedding_hash') != content_hash(row['title'], row['content'])
+        ]
+        return await self._embed(supabase, stale)
+
+    async def _embed(self, supabase, rows: List[Dict[str, Any]]) -> int:
+        stored = 0
+        batch_size = self.embedding_service.batch_size
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                vectors = await self.embedding_service.embed([memory_text(row['title'], row['content']) for row in batch])
+            except HTTPException:
+                # Upstream unavailable: stop here so the batch is read again
+                raise
+            except Exception as e:
+                # Rejected input would block the feed forever; the backfill retries these
+                logger.error(f"Change feed skipped {len(batch)} memories it could not embed: {str(e)}")
+                continue
+
+            response = await asyncio.to_thread(
+                supabase.rpc('set_memory_embeddings', {
+                    'p_embeddings': [
+                        {
+                            "id": row["id"],
+                            "embedding": vector,
+                            "content_hash": content_hash(row["title"], row["content"])
+                        }
+                        for row, vector in zip(batch, vectors)
+                    ]
+                }).execute
+            )
+            stored += response.data or 0
+        return stored
+
+    async def drain(self) -> int:
+        """Process batches until no readable changes are left."""
+        total = 0
+        while True:
+            processed = await self.run_once()
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    async def prune(self) -> int:
+        """Delete changes every consumer has processed."""
+        response = await asyncio.to_thread(self._client().rpc('prune_memory_changes', {}).execute)
+        pruned = response.data or 0
+        logger.info(f"Change feed pruned {pruned} processed changes")
+        return pruned
+
+    async def backfill(self, partitions: Optional[int] = None, restart: bool = False) -> int:
+        """Embed all memories with a missing or stale vector; returns how many were stored."""
+        supabase = self._client()
+        partitions = partitions or settings.BACKFILL_PARTITIONS
+        if restart:
+            await asyncio.to_thread(
+                supabase.table(self.progress_table)
+                    .delete()
+                    .eq("consumer", self.consumer)
+                    .eq("partitions", partitions)
+                    .execute
+            )
+
+        counts = await asyncio.gather(*(
+            self._backfill_partition(supabase, partition, partitions)
+            for partition in range(partitions)
+        ))
+        logger.info(f"Backfill stored {sum(counts)} embeddings in {partitions} partitions")
+        return sum(counts)
+
+    async def _backfill_partition(self, supabase, partition: int, partitions: int) -> int:
+        key = {'consumer': self.consumer, 'partition': partition, 'partitions': partitions}
+        response = await asyncio.to_thread(
+            supabase.table(self.progress_table)
+                .select("last_memory_id, done")
+                .eq("consumer", self.consumer)
+                .eq("partition", partition)
+                .eq("partitions", partitions)
+                .execute
+        )
+        progress = response.data[0] if response.data else {'last_memory_id': 0, 'done': False}
+        if progress['done']:
+            return 0
+
+        after_id = progress['last_memory_id']
+        stored = 0
+        while True:
+            page = await asyncio.to_thread(
+                supabase.rpc('stale_memory_embeddings', {
+                    'p_partition': partition,
+                    'p_partitions': partitions,
+                    'p_after_id': after_id,
+                    'p_limit': self.batch_size
+                }).execute
+            )
+            rows = page.data or []
+            if rows:
+                stored += await self._embed(supabase, rows)
+                after_id = rows[-1]['id']
+
+            done = len(rows) < self.batch_size
+            await asyncio.to_thread(
+                supabase.table(self.progress_table)
+                    .upsert({
+                        **key,
+                        'last_memory_id': after_id,
+                        'done': done,
+                        'updated_at': datetime.now(timezone.utc).isoformat()
+                    })
+                    .execute
+            )
+            if done:
+                logger.info(f"Backfill partition {partition}/{partitions} finished")
+                return stored
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        """Drain the change feed every interval and prune it periodically."""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        next_prune = loop.time() + self.prune_interval
+        logger.info("Change feed worker started")
+
+        while not stop.is_set():
+            try:
+                await self.drain()
+                if loop.time() >= next_prune:
+                    await self.prune()
+                    next_prune = loop.time() + self.prune_interval
+            except Exception as e:
+                logger.error(f"Change feed iteration failed: {str(e)}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+        logger.info("Change feed worker stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep memory embeddings in sync with memory changes.")
+    parser.add_argument("--once", action="store_true", help="drain the change feed once and exit (for cron)")
+    parser.add_argument("--backfill", action="store_true", help="embed existing memories with missing or stale vectors and exit")
+    parser.add_argument("--partitions", type=int, default=settings.BACKFILL_PARTITIONS, help="backfill partitions to run in parallel")
+    parser.add_argument("--restart", action="store_true", help="discard saved backfill progress")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    worker = ChangeFeedWorker()
+
+    if args.backfill:
+        asyncio.run(worker.backfill(args.partitions, restart=args.restart))
+    elif args.once:
+        asyncio.run(worker.drain())
+    else:
+        asyncio.run(worker.run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from app.supabase.client import get_service_client
+from app.core.config import settings
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+LIST_PAGE_SIZE = 1000
+
+class StorageReaper:
+    """Background worker that removes storage objects of deleted media.
+
+    Deletions are queued in ``storage_deletions`` by a trigger on
+    ``media_attachments``, so request handlers never wait on Storage. The
+    reaper claims due rows in batches, removes their paths with one
+    ``remove([...])`` call per bucket and reschedules failures with backoff.
+    The claim skips paths that were attached again, and a claimed path
+    cannot be attached until it is completed or failed, so an object is
+    never removed from under a new reference.
+    A periodic reconciliation also queues bucket objects that no
+    ``media_attachments.file_path`` references any more.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self.queue_table = "storage_deletions"
+        self.media_table = "media_attachments"
+        self.bucket = settings.MEDIA_BUCKET
+        self.batch_size = settings.STORAGE_REAPER_BATCH_SIZE
+        self.interval = settings.STORAGE_REAPER_INTERVAL_SECONDS
+        self.max_attempts = settings.STORAGE_REAPER_MAX_ATTEMPTS
+        self.reconcile_interval = settings.STORAGE_RECONCILE_INTERVAL_SECONDS
+        self.reconcile_grace = timedelta(seconds=settings.STORAGE_RECONCILE_GRACE_SECONDS)
+
+    def _client(self):
+        if self.client is None:
+            self.client = get_service_client()
+        return self.client
+
+    async def run_once(self) -> int:
+        """Process one batch of queued deletions; returns how many were claimed."""
+        supabase = self._client()
+        response = await asyncio.to_thread(
+            supabase.rpc(
+                'claim_storage_deletions',
+                {'p_limit': self.batch_size, 'p_max_attempts': self.max_attempts}
+            ).execute
+        )
+        claimed = response.data or []
+        if not claimed:
+            return 0
+
+        by_bucket: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for deletion in claimed:
+            by_bucket[deletion['bucket']].append(deletion)
+
+        for bucket, deletions in by_bucket.items():
+            ids = [deletion['id'] for deletion in deletions]
+            paths = [deletion['file_path'] for deletion in deletions]
+            try:
+                # Missing objects are simply not reported back, so retries are safe
+                if paths:
+                    await asyncio.to_thread(supabase.storage.from_(bucket).remove, paths)
+            except Exception as e:
+                logger.error(f"Storage reaper failed to remove {len(paths)} objects from {bucket}: {str(e)}")
+                await asyncio.to_thread(
+                    supabase.rpc('fail_storage_deletions', {'p_ids': ids, 'p_error': str(e)}).execute
+                )
+                continue
+
+            await asyncio.to_thread(
+                supabase.rpc('complete_storage_deletions', {'p_ids': ids}).execute
+            )
+            logger.info(f"Storage reaper removed {len(paths)} objects from {bucket}")
+
+        return len(claimed)
+
+    async def drain(self) -> int:
+        """Process batches until the queue has nothing due."""
+        total = 0
+        while True:
+            processed = await self.run_once()
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    async def reconcile(self) -> int:
+        """Queue bucket objects that are no longer referenced by any media record."""
+        supabase = self._client()
+        bucket = supabase.storage.from_(self.bucket)
+        cutoff = datetime.now(timezone.utc) - self.reconcile_grace
+        queued = 0
+
+        # Objects live under one folder per user
+        for folder in await self._list(bucket, ""):
+            if folder.get('id') is not None:
+                continue
+            prefix = folder['name']
+            objects = [
+                item for item in await self._list(bucket, prefix)
+                if item.get('id') is not None
+            ]
+            for start in range(0, len(objects), self.batch_size):
+                chunk = objects[start:start + self.batch_size]
+                paths = [f"{prefix}/{item['name']}" for item in chunk]
+                response = await asyncio.to_thread(
+                    supabase.table(self.media_table)
+                        .select("file_path")
+                        .in_("file_path", paths)
+                        .execute
+                )
+                referenced = {row['file_path'] for row in response.data or []}
+                orphans = [
+                    path for path, item in zip(paths, chunk)
+                    if path not in referenced and self._created_before(item, cutoff)
+                ]
+                if orphans:
+                    await asyncio.to_thread(
+                        supabase.table(self.queue_table)
+                            .insert([{'bucket': self.bucket, 'file_path': path} for path in orphans])
+                            .execute
+                    )
+                    queued += len(orphans)
+
+        logger.info(f"Storage reconciliation queued {queued} orphaned objects")
+        return queued
+
+    async def _list(self, bucket, path: str) -> List[Dict[str, Any]]:
+        items = []
+        offset = 0
+        while True:
+            page = await asyncio.to_thread(
+                bucket.list, path, {'limit': LIST_PAGE_SIZE, 'offset': offset}
+            )
+            items.extend(page)
+            if len(page) < LIST_PAGE_SIZE:
+                return items
+            offset += LIST_PAGE_SIZE
+
+    def _created_before(self, item: Dict[str, Any], cutoff: datetime) -> bool:
+        created_at = item.get('created_at')
+        if not created_at:
+            return False
+        created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        return created < cutoff
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        """Drain the queue every interval and reconcile the bucket periodically."""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        next_reconcile = loop.time() + self.reconcile_interval
+        logger.info("Storage reaper started")
+
+        while not stop.is_set():
+            try:
+                await self.drain()
+                if loop.time() >= next_reconcile:
+                    await self.reconcile()
+                    next_reconcile = loop.time() + self.reconcile_interval
+            except Exception as e:
+                logger.error(f"Storage reaper iteration failed: {str(e)}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+        logger.info("Storage reaper stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove storage objects of deleted media.")
+    parser.add_argument("--once", action="store_true", help="drain the queue once and exit (for cron)")
+    parser.add_argument("--reconcile", action="store_true", help="also reconcile the bucket against media records")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    reaper = StorageReaper()
+
+    async def run_once():
+        if args.reconcile:
+            await reaper.reconcile()
+        await reaper.drain()
+
+    asyncio.run(run_once() if args.once else reaper.run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+-- Create function to insert a batch of memories for the calling user
+-- All rows of a batch are inserted by a single statement, so the batch
+-- succeeds or fails as a whole inside the RPC's transaction. The owner is
+-- the caller (auth.uid()), never a parameter, so nobody can write into
+-- another account through the RPC.
+DROP FUNCTION IF EXISTS import_memories_for_user(UUID, JSONB);
+DROP FUNCTION IF EXISTS import_memories_for_user(JSONB);
+CREATE OR REPLACE FUNCTION import_memories_for_user(
+    p_memories JSONB
+)
+RETURNS TABLE (
+    import_index INTEGER,
+    memory JSONB
+) AS $$
+DECLARE
+    v_user_id UUID := auth.uid();
+BEGIN
+    IF v_user_id IS NULL THEN
+        RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '42501';
+    END IF;
+
+    -- INSERT ... RETURNING does not keep the input order, so ids are drawn
+    -- up front and each inserted row is matched back to its position in
+    -- p_memories (the CTE calls nextval, so it is evaluated exactly once)
+    RETURN QUERY
+    WITH input AS (
+        SELECT
+            nextval(pg_get_serial_sequence('memories', 'id')) AS id,
+            e.ordinality,
+            m.title,
+            m.content,
+            m.date
+        FROM jsonb_array_elements(p_memories) WITH ORDINALITY AS e(value, ordinality)
+        CROSS JOIN LATERAL jsonb_to_record(e.value) AS m(
+            title TEXT,
+            content TEXT,
+            date TIMESTAMP WITH TIME ZONE
+        )
+    ),
+    inserted AS (
+        INSERT INTO memories (id, title, content, date, user_id)
+        SELECT input.id, input.title, input.content, COALESCE(input.date, NOW()), v_user_id
+        FROM input
+        RETURNING *
+    )
+    SELECT (input.ordinality - 1)::INTEGER, to_jsonb(inserted)
+    FROM inserted
+    JOIN input ON input.id = inserted.id
+    ORDER BY input.ordinality;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Grant execute permission on the function
+REVOKE EXECUTE ON FUNCTION import_memories_for_user(JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION import_memories_for_user(JSONB) TO authenticated;
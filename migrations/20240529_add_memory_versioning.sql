@@ -0,0 +1,54 @@
+-- Track when a memory was last changed (used for ETag / Last-Modified)
+ALTER TABLE memories ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+UPDATE memories SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE memories ALTER COLUMN updated_at SET DEFAULT NOW();
+ALTER TABLE memories ALTER COLUMN updated_at SET NOT NULL;
+
+-- Create index used by the version lookup below
+CREATE INDEX IF NOT EXISTS memories_user_id_updated_at_idx ON memories (user_id, updated_at);
+
+-- Create function to automatically update updated_at timestamp
+CREATE OR REPLACE FUNCTION update_memory_timestamp()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only bump the timestamp when user-visible columns change, so derived
+-- columns (search vectors, embeddings) do not invalidate client caches
+CREATE TRIGGER update_memory_timestamp
+    BEFORE UPDATE ON memories
+    FOR EACH ROW
+    WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.content IS DISTINCT FROM NEW.content
+        OR OLD.date IS DISTINCT FROM NEW.date
+    )
+    EXECUTE FUNCTION update_memory_timestamp();
+
+-- Create function to get a cheap version summary of the caller's memories
+-- (row count, newest change, highest id) without reading the rows. It runs
+-- as the caller, so the "view their own memories" policy applies as well.
+DROP FUNCTION IF EXISTS get_memories_version_for_user(UUID);
+CREATE OR REPLACE FUNCTION get_memories_version_for_user()
+RETURNS TABLE (
+    memory_count BIGINT,
+    last_updated TIMESTAMP WITH TIME ZONE,
+    max_id BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        COUNT(*)::BIGINT,
+        MAX(memories.updated_at),
+        MAX(memories.id)::BIGINT
+    FROM memories
+    WHERE memories.user_id = auth.uid();
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+-- Grant execute permission on the function
+REVOKE EXECUTE ON FUNCTION get_memories_version_for_user() FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION get_memories_version_for_user() TO authenticated;
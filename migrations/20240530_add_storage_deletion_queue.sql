@@ -0,0 +1,113 @@
+-- Queue of storage objects waiting to be removed by the storage reaper
+CREATE TABLE IF NOT EXISTS storage_deletions (
+    id BIGSERIAL PRIMARY KEY,
+    bucket TEXT NOT NULL DEFAULT 'media',
+    file_path TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    -- Set while a reaper holds the lease and may be removing the object
+    claimed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Create index used when claiming due deletions
+CREATE INDEX IF NOT EXISTS idx_storage_deletions_next_attempt_at ON storage_deletions(next_attempt_at);
+
+-- Only the service role (the reaper) touches the queue directly
+ALTER TABLE storage_deletions ENABLE ROW LEVEL SECURITY;
+
+-- Enqueue the file of every deleted media attachment. This also covers
+-- attachments removed by ON DELETE CASCADE when their memory is deleted.
+CREATE OR REPLACE FUNCTION enqueue_media_file_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO storage_deletions (file_path) VALUES (OLD.file_path);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER enqueue_media_file_deletion
+    AFTER DELETE ON media_attachments
+    FOR EACH ROW
+    EXECUTE FUNCTION enqueue_media_file_deletion();
+
+-- Create function to claim a batch of due deletions. Claimed rows are
+-- leased (pushed into the future) so a crashed reaper's work is retried,
+-- and SKIP LOCKED lets several reapers run side by side. Each path is
+-- claimed under an advisory lock on the path, the same one
+-- attach_media_blobs_for_user takes, so an object is never claimed while it
+-- is being attached again; paths attached again since they were queued
+-- are dropped from the queue instead of claimed.
+CREATE OR REPLACE FUNCTION claim_storage_deletions(
+    p_limit INTEGER,
+    p_max_attempts INTEGER,
+    p_lease_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF storage_deletions AS $$
+DECLARE
+    candidate storage_deletions;
+    claimed storage_deletions;
+BEGIN
+    FOR candidate IN
+        SELECT *
+        FROM storage_deletions
+        WHERE next_attempt_at <= NOW() AND attempts < p_max_attempts
+        ORDER BY id
+        LIMIT p_limit
+    LOOP
+        -- A path being attached right now is left for the next run
+        CONTINUE WHEN NOT pg_try_advisory_xact_lock(hashtextextended(candidate.file_path, 0));
+
+        PERFORM 1
+        FROM storage_deletions
+        WHERE id = candidate.id AND next_attempt_at <= NOW()
+        FOR UPDATE SKIP LOCKED;
+        CONTINUE WHEN NOT FOUND;
+
+        IF EXISTS (SELECT 1 FROM media_attachments WHERE file_path = candidate.file_path) THEN
+            DELETE FROM storage_deletions WHERE id = candidate.id;
+            CONTINUE;
+        END IF;
+
+        UPDATE storage_deletions
+        SET
+            attempts = attempts + 1,
+            claimed_at = NOW(),
+            next_attempt_at = NOW() + make_interval(secs => p_lease_seconds)
+        WHERE id = candidate.id
+        RETURNING * INTO claimed;
+
+        RETURN NEXT claimed;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to drop deletions that went through
+CREATE OR REPLACE FUNCTION complete_storage_deletions(p_ids BIGINT[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM storage_deletions WHERE id = ANY(p_ids);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to reschedule failed deletions with exponential backoff
+CREATE OR REPLACE FUNCTION fail_storage_deletions(p_ids BIGINT[], p_error TEXT)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE storage_deletions
+    SET
+        last_error = p_error,
+        claimed_at = NULL,
+        next_attempt_at = NOW() + make_interval(secs => LEAST(3600, 30 * POWER(2, attempts)))
+    WHERE id = ANY(p_ids);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- The queue functions are for the service role only
+REVOKE EXECUTE ON FUNCTION claim_storage_deletions(INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION complete_storage_deletions(BIGINT[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION fail_storage_deletions(BIGINT[], TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_storage_deletions(INTEGER, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION complete_storage_deletions(BIGINT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION fail_storage_deletions(BIGINT[], TEXT) TO service_role;
@@ -0,0 +1,140 @@
+-- Per-user content index: one stored object per distinct file content
+CREATE TABLE IF NOT EXISTS media_blobs (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    sha256 CHAR(64) NOT NULL,
+    file_path TEXT NOT NULL UNIQUE,
+    size_bytes BIGINT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    CONSTRAINT media_blobs_user_sha256_key UNIQUE (user_id, sha256)
+);
+
+-- Add RLS (Row Level Security) policies
+ALTER TABLE media_blobs ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own blobs
+CREATE POLICY "Users can view own media blobs" ON media_blobs
+    FOR SELECT USING (auth.uid() = user_id);
+
+-- Create function to look up the caller's already stored content. It runs
+-- as the caller, so the SELECT policy above limits it to their own blobs.
+DROP FUNCTION IF EXISTS find_media_blobs_for_user(UUID, TEXT[]);
+CREATE OR REPLACE FUNCTION find_media_blobs_for_user(
+    p_sha256 TEXT[]
+)
+RETURNS SETOF media_blobs AS $$
+BEGIN
+    RETURN QUERY
+    SELECT *
+    FROM media_blobs
+    WHERE media_blobs.user_id = auth.uid()
+    AND media_blobs.sha256 = ANY(p_sha256);
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+-- Create function to attach stored content to memories (bypasses RLS).
+-- Each attachment takes a reference on its blob, creating the blob entry
+-- on first use; everything happens in one transaction. The owner is always
+-- the caller (auth.uid()), never a parameter.
+--
+-- A blob whose last reference went away is queued for removal, but its
+-- content can be uploaded again meanwhile (the upload sees the object
+-- still there). Under the path lock claim_storage_deletions also takes,
+-- attaching cancels a queued removal, and fails with 55006 if a reaper has
+-- already claimed it or the object is gone; the caller retries the upload.
+DROP FUNCTION IF EXISTS attach_media_blobs_for_user(UUID, JSONB);
+CREATE OR REPLACE FUNCTION attach_media_blobs_for_user(
+    p_attachments JSONB
+)
+RETURNS SETOF media_attachments AS $$
+DECLARE
+    p_user_id UUID := auth.uid();
+    attachment JSONB;
+    blob_path TEXT;
+    new_media media_attachments;
+BEGIN
+    IF p_user_id IS NULL THEN
+        RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '42501';
+    END IF;
+
+    FOR attachment IN SELECT * FROM jsonb_array_elements(p_attachments)
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM memories
+            WHERE id = (attachment->>'memory_id')::BIGINT AND user_id = p_user_id
+        ) THEN
+            RAISE EXCEPTION 'Memory not found or access denied';
+        END IF;
+
+        INSERT INTO media_blobs (user_id, sha256, file_path, size_bytes, ref_count)
+        VALUES (
+            p_user_id,
+            attachment->>'sha256',
+            attachment->>'file_path',
+            (attachment->>'size_bytes')::BIGINT,
+            1
+        )
+        ON CONFLICT (user_id, sha256)
+        DO UPDATE SET ref_count = media_blobs.ref_count + 1
+        RETURNING media_blobs.file_path INTO blob_path;
+
+        PERFORM pg_advisory_xact_lock(hashtextextended(blob_path, 0));
+        IF EXISTS (
+            SELECT 1 FROM storage_deletions
+            WHERE file_path = blob_path AND claimed_at IS NOT NULL AND next_attempt_at > NOW()
+        ) THEN
+            RAISE EXCEPTION 'Stored media is being removed, retry the upload' USING ERRCODE = '55006';
+        END IF;
+        DELETE FROM storage_deletions WHERE file_path = blob_path;
+        IF NOT EXISTS (
+            SELECT 1 FROM storage.objects WHERE bucket_id = 'media' AND name = blob_path
+        ) THEN
+            RAISE EXCEPTION 'Stored media was removed, retry the upload' USING ERRCODE = '55006';
+        END IF;
+
+        INSERT INTO media_attachments (memory_id, file_path, media_type, label, user_id)
+        VALUES (
+            (attachment->>'memory_id')::BIGINT,
+            blob_path,
+            attachment->>'media_type',
+            attachment->>'label',
+            p_user_id
+        )
+        RETURNING * INTO new_media;
+
+        RETURN NEXT new_media;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Deleting an attachment now drops a blob reference; the stored object is
+-- only queued for removal when the last reference goes away. Attachments
+-- stored before content addressing have no blob and are queued directly.
+CREATE OR REPLACE FUNCTION enqueue_media_file_deletion()
+RETURNS TRIGGER AS $$
+DECLARE
+    remaining INTEGER;
+BEGIN
+    UPDATE media_blobs
+    SET ref_count = ref_count - 1
+    WHERE file_path = OLD.file_path
+    RETURNING ref_count INTO remaining;
+
+    IF NOT FOUND THEN
+        INSERT INTO storage_deletions (file_path) VALUES (OLD.file_path);
+    ELSIF remaining <= 0 THEN
+        DELETE FROM media_blobs WHERE file_path = OLD.file_path;
+        INSERT INTO storage_deletions (file_path) VALUES (OLD.file_path);
+    END IF;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Grant execute permission on the functions
+REVOKE EXECUTE ON FUNCTION find_media_blobs_for_user(TEXT[]) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION attach_media_blobs_for_user(JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION find_media_blobs_for_user(TEXT[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION attach_media_blobs_for_user(JSONB) TO authenticated;
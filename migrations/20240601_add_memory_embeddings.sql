@@ -0,0 +1,166 @@
+-- Enable pgvector for semantic search
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Embedding of title + content (text-embedding-3-small, 1536 dimensions) and
+-- the md5 of the text it was computed from, so stale vectors can be found
+ALTER TABLE memories ADD COLUMN IF NOT EXISTS embedding vector(1536);
+ALTER TABLE memories ADD COLUMN IF NOT EXISTS embedding_hash TEXT;
+
+-- No HNSW index: searches are always limited to one user's memories, and an
+-- approximate index scans the whole table's nearest neighbours (ef_search,
+-- 40 by default) before that filter runs, so a user with a small share of
+-- the rows would get few or none of their real matches back. Vector search
+-- instead ranks the user's own rows exactly, found through
+-- memories_user_id_updated_at_idx. This assumes a user has at most a few
+-- thousand memories; revisit (e.g. HNSW with hnsw.iterative_scan, or a
+-- partial index per tenant) if that stops holding.
+DROP INDEX IF EXISTS memories_embedding_idx;
+
+-- The columns memory reads return to clients. Embeddings (1536 floats each),
+-- their hashes and the search vector are internal, so the read RPCs return
+-- this row type instead of SETOF memories (SELECT *), which would now send
+-- every vector with every memory.
+CREATE OR REPLACE VIEW memory_rows WITH (security_invoker = true) AS
+SELECT id, title, content, date, user_id, created_at, updated_at
+FROM memories;
+
+DROP FUNCTION IF EXISTS get_memories_for_user(UUID);
+CREATE OR REPLACE FUNCTION get_memories_for_user(user_id uuid)
+RETURNS SETOF memory_rows AS $$
+BEGIN
+    RETURN QUERY
+    SELECT memories.id, memories.title, memories.content, memories.date,
+        memories.user_id, memories.created_at, memories.updated_at
+    FROM memories
+    WHERE memories.user_id = get_memories_for_user.user_id
+    ORDER BY memories.date DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS search_memories(TEXT, UUID);
+CREATE OR REPLACE FUNCTION search_memories(search_query text, user_id uuid)
+RETURNS SETOF memory_rows AS $$
+BEGIN
+    RETURN QUERY
+    SELECT memories.id, memories.title, memories.content, memories.date,
+        memories.user_id, memories.created_at, memories.updated_at
+    FROM memories
+    WHERE memories.user_id = search_memories.user_id
+    AND memories.search_vector @@ to_tsquery('english', search_query)
+    ORDER BY ts_rank(memories.search_vector, to_tsquery('english', search_query)) DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create function to store computed embeddings of the caller's memories.
+-- It runs as the caller, so RLS keeps it to their own rows. A vector is
+-- only written if the memory still has the text it was computed from, so a
+-- slow embedding of an older version never overwrites a newer one.
+DROP FUNCTION IF EXISTS set_memory_embeddings_for_user(UUID, JSONB);
+CREATE OR REPLACE FUNCTION set_memory_embeddings_for_user(
+    p_embeddings JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE memories
+    SET
+        embedding = (e->>'embedding')::vector,
+        embedding_hash = e->>'content_hash'
+    FROM jsonb_array_elements(p_embeddings) AS e
+    WHERE memories.id = (e->>'id')::BIGINT
+    AND memories.user_id = auth.uid()
+    AND md5(coalesce(memories.title, '') || ' ' || coalesce(memories.content, '')) = e->>'content_hash';
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+-- Create function for hybrid search: full-text and vector matches are each
+-- ranked, then fused with reciprocal rank fusion (score = sum of 1 / (k + rank)).
+-- Without a query embedding the search degrades to full-text only. It runs
+-- as the caller and only searches their memories (auth.uid()).
+DROP FUNCTION IF EXISTS hybrid_search_memories(UUID, TEXT, vector, INTEGER, INTEGER, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE);
+CREATE OR REPLACE FUNCTION hybrid_search_memories(
+    p_query TEXT,
+    p_query_embedding vector(1536) DEFAULT NULL,
+    p_match_count INTEGER DEFAULT 20,
+    p_rrf_k INTEGER DEFAULT 60,
+    p_start_date TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_end_date TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS TABLE (
+    id memories.id%TYPE,
+    title memories.title%TYPE,
+    content memories.content%TYPE,
+    date memories.date%TYPE,
+    user_id memories.user_id%TYPE,
+    created_at memories.created_at%TYPE,
+    updated_at memories.updated_at%TYPE,
+    text_rank REAL,
+    similarity DOUBLE PRECISION,
+    score DOUBLE PRECISION
+) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH text_matches AS (
+        SELECT
+            memories.id,
+            ts_rank(memories.search_vector, query) AS rank,
+            ROW_NUMBER() OVER (ORDER BY ts_rank(memories.search_vector, query) DESC) AS position
+        FROM memories, websearch_to_tsquery('english', p_query) AS query
+        WHERE memories.user_id = auth.uid()
+        AND memories.search_vector @@ query
+        AND (p_start_date IS NULL OR memories.date >= p_start_date)
+        AND (p_end_date IS NULL OR memories.date <= p_end_date)
+        ORDER BY rank DESC
+        LIMIT p_match_count * 2
+    ),
+    -- Exact distances over the caller's rows (see the note on indexes above)
+    user_vectors AS (
+        SELECT
+            memories.id,
+            memories.embedding <=> p_query_embedding AS distance
+        FROM memories
+        WHERE p_query_embedding IS NOT NULL
+        AND memories.user_id = auth.uid()
+        AND memories.embedding IS NOT NULL
+        AND (p_start_date IS NULL OR memories.date >= p_start_date)
+        AND (p_end_date IS NULL OR memories.date <= p_end_date)
+    ),
+    vector_matches AS (
+        SELECT
+            user_vectors.id,
+            1 - user_vectors.distance AS similarity,
+            ROW_NUMBER() OVER (ORDER BY user_vectors.distance) AS position
+        FROM user_vectors
+        ORDER BY user_vectors.distance
+        LIMIT p_match_count * 2
+    )
+    SELECT
+        memories.id,
+        memories.title,
+        memories.content,
+        memories.date,
+        memories.user_id,
+        memories.created_at,
+        memories.updated_at,
+        text_matches.rank,
+        vector_matches.similarity,
+        COALESCE(1.0 / (p_rrf_k + text_matches.position), 0)
+            + COALESCE(1.0 / (p_rrf_k + vector_matches.position), 0) AS score
+    FROM text_matches
+    FULL OUTER JOIN vector_matches ON text_matches.id = vector_matches.id
+    JOIN memories ON memories.id = COALESCE(text_matches.id, vector_matches.id)
+    ORDER BY score DESC
+    LIMIT p_match_count;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+-- Grant execute permission on the functions
+REVOKE EXECUTE ON FUNCTION set_memory_embeddings_for_user(JSONB) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION hybrid_search_memories(TEXT, vector, INTEGER, INTEGER, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION set_memory_embeddings_for_user(JSONB) TO authenticated;
+GRANT EXECUTE ON FUNCTION hybrid_search_memories(TEXT, vector, INTEGER, INTEGER, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) TO authenticated;
@@ -0,0 +1,200 @@
+-- Outbox of memory changes consumed by derived-index workers (embeddings,
+-- and later tags or other indexes). Rows are written by triggers, so every
+-- write path (create/update/delete_memory_for_user, imports) is covered.
+CREATE TABLE IF NOT EXISTS memory_changes (
+    id BIGSERIAL PRIMARY KEY,
+    memory_id BIGINT NOT NULL,
+    user_id UUID NOT NULL,
+    operation TEXT NOT NULL CHECK (operation IN ('upsert', 'delete')),
+    -- Transaction that wrote the change; the feed is read in (txid, id) order
+    txid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Create index used when reading the feed in order
+CREATE INDEX IF NOT EXISTS idx_memory_changes_txid_id ON memory_changes(txid, id);
+
+-- Last change each consumer has processed
+CREATE TABLE IF NOT EXISTS change_feed_checkpoints (
+    consumer TEXT PRIMARY KEY,
+    last_txid xid8 NOT NULL DEFAULT '0',
+    last_change_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Resumable progress of backfills, one row per partition
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    consumer TEXT NOT NULL,
+    partition INTEGER NOT NULL,
+    partitions INTEGER NOT NULL,
+    last_memory_id BIGINT NOT NULL DEFAULT 0,
+    done BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (consumer, partition, partitions)
+);
+
+-- Only the service role (the workers) touches these tables
+ALTER TABLE memory_changes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE change_feed_checkpoints ENABLE ROW LEVEL SECURITY;
+ALTER TABLE backfill_progress ENABLE ROW LEVEL SECURITY;
+
+-- Record inserts, text changes and deletes of memories
+CREATE OR REPLACE FUNCTION record_memory_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO memory_changes (memory_id, user_id, operation) VALUES (OLD.id, OLD.user_id, 'delete');
+        RETURN OLD;
+    END IF;
+    INSERT INTO memory_changes (memory_id, user_id, operation) VALUES (NEW.id, NEW.user_id, 'upsert');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER record_memory_insert
+    AFTER INSERT ON memories
+    FOR EACH ROW
+    EXECUTE FUNCTION record_memory_change();
+
+-- Derived columns (embeddings, search vectors) do not produce changes
+CREATE TRIGGER record_memory_update
+    AFTER UPDATE ON memories
+    FOR EACH ROW
+    WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.content IS DISTINCT FROM NEW.content
+    )
+    EXECUTE FUNCTION record_memory_change();
+
+CREATE TRIGGER record_memory_delete
+    AFTER DELETE ON memories
+    FOR EACH ROW
+    EXECUTE FUNCTION record_memory_change();
+
+-- Create function to read the next batch of changes for a consumer.
+-- Ids and transaction ids are handed out before commit, so a transaction
+-- that is still running can commit changes behind ones already read.
+-- Only changes of transactions older than the snapshot's xmin are returned:
+-- every such transaction has finished, so no change can later appear
+-- before them in (txid, id) order, however long a transaction ran.
+DROP FUNCTION IF EXISTS read_memory_changes(TEXT, INTEGER, INTEGER);
+CREATE OR REPLACE FUNCTION read_memory_changes(
+    p_consumer TEXT,
+    p_limit INTEGER
+)
+RETURNS SETOF memory_changes AS $$
+DECLARE
+    checkpoint change_feed_checkpoints;
+BEGIN
+    SELECT * INTO checkpoint FROM change_feed_checkpoints WHERE consumer = p_consumer;
+
+    RETURN QUERY
+    SELECT *
+    FROM memory_changes
+    WHERE (memory_changes.txid, memory_changes.id) > (
+        COALESCE(checkpoint.last_txid, '0'::xid8), COALESCE(checkpoint.last_change_id, 0)
+    )
+    AND memory_changes.txid < pg_snapshot_xmin(pg_current_snapshot())
+    ORDER BY memory_changes.txid, memory_changes.id
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to move a consumer's checkpoint forward
+DROP FUNCTION IF EXISTS advance_change_checkpoint(TEXT, BIGINT);
+CREATE OR REPLACE FUNCTION advance_change_checkpoint(
+    p_consumer TEXT,
+    p_last_txid TEXT,
+    p_last_change_id BIGINT
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO change_feed_checkpoints (consumer, last_txid, last_change_id, updated_at)
+    VALUES (p_consumer, p_last_txid::xid8, p_last_change_id, NOW())
+    ON CONFLICT (consumer)
+    DO UPDATE SET
+        last_txid = EXCLUDED.last_txid,
+        last_change_id = EXCLUDED.last_change_id,
+        updated_at = NOW()
+    WHERE (change_feed_checkpoints.last_txid, change_feed_checkpoints.last_change_id)
+        < (EXCLUDED.last_txid, EXCLUDED.last_change_id);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to drop changes every consumer has processed
+CREATE OR REPLACE FUNCTION prune_memory_changes()
+RETURNS INTEGER AS $$
+DECLARE
+    pruned_count INTEGER;
+BEGIN
+    DELETE FROM memory_changes
+    WHERE EXISTS (SELECT 1 FROM change_feed_checkpoints)
+    AND NOT EXISTS (
+        SELECT 1 FROM change_feed_checkpoints
+        WHERE (memory_changes.txid, memory_changes.id)
+            > (change_feed_checkpoints.last_txid, change_feed_checkpoints.last_change_id)
+    );
+    GET DIAGNOSTICS pruned_count = ROW_COUNT;
+    RETURN pruned_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to store embeddings for any user (workers only). Like
+-- set_memory_embeddings_for_user, vectors of outdated text are ignored.
+CREATE OR REPLACE FUNCTION set_memory_embeddings(p_embeddings JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE memories
+    SET
+        embedding = (e->>'embedding')::vector,
+        embedding_hash = e->>'content_hash'
+    FROM jsonb_array_elements(p_embeddings) AS e
+    WHERE memories.id = (e->>'id')::BIGINT
+    AND md5(coalesce(memories.title, '') || ' ' || coalesce(memories.content, '')) = e->>'content_hash';
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create function to page through memories whose embedding is missing or
+-- stale, restricted to one partition (id modulo p_partitions)
+CREATE OR REPLACE FUNCTION stale_memory_embeddings(
+    p_partition INTEGER,
+    p_partitions INTEGER,
+    p_after_id BIGINT,
+    p_limit INTEGER
+)
+RETURNS TABLE (
+    id BIGINT,
+    user_id UUID,
+    title TEXT,
+    content TEXT
+) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    SELECT memories.id, memories.user_id, memories.title::TEXT, memories.content::TEXT
+    FROM memories
+    WHERE memories.id > p_after_id
+    AND memories.id % p_partitions = p_partition
+    AND memories.embedding_hash IS DISTINCT FROM
+        md5(coalesce(memories.title, '') || ' ' || coalesce(memories.content, ''))
+    ORDER BY memories.id
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- The change feed functions are for the service role only
+REVOKE EXECUTE ON FUNCTION read_memory_changes(TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION advance_change_checkpoint(TEXT, TEXT, BIGINT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION prune_memory_changes() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION set_memory_embeddings(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION stale_memory_embeddings(INTEGER, INTEGER, BIGINT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION read_memory_changes(TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION advance_change_checkpoint(TEXT, TEXT, BIGINT) TO service_role;
+GRANT EXECUTE ON FUNCTION prune_memory_changes() TO service_role;
+GRANT EXECUTE ON FUNCTION set_memory_embeddings(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION stale_memory_embeddings(INTEGER, INTEGER, BIGINT, INTEGER) TO service_role;
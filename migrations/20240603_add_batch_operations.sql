@@ -0,0 +1,97 @@
+-- Create function to apply a batch of memory and media writes for a user
+-- (bypasses RLS). The operations run in order inside the RPC's transaction:
+-- if any of them fails, none is applied. Returns one JSON result per
+-- operation. The user is always the caller (auth.uid()), never a
+-- parameter, so nobody can write to another user's memories.
+DROP FUNCTION IF EXISTS apply_batch_for_user(UUID, JSONB);
+CREATE OR REPLACE FUNCTION apply_batch_for_user(
+    p_operations JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+    p_user_id UUID := auth.uid();
+    operation JSONB;
+    op_index INTEGER := 0;
+    result JSONB;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    IF p_user_id IS NULL THEN
+        RAISE EXCEPTION 'Not authenticated' USING ERRCODE = '42501';
+    END IF;
+
+    FOR operation IN SELECT * FROM jsonb_array_elements(p_operations)
+    LOOP
+        result := NULL;
+
+        CASE operation->>'op'
+        WHEN 'memory.create' THEN
+            INSERT INTO memories (title, content, date, user_id)
+            VALUES (
+                operation->'data'->>'title',
+                operation->'data'->>'content',
+                COALESCE((operation->'data'->>'date')::TIMESTAMP WITH TIME ZONE, NOW()),
+                p_user_id
+            )
+            RETURNING jsonb_build_object(
+                'id', id, 'title', title, 'content', content, 'date', date,
+                'user_id', user_id, 'created_at', created_at, 'updated_at', updated_at
+            ) INTO result;
+
+        WHEN 'memory.update' THEN
+            UPDATE memories
+            SET
+                title = operation->'data'->>'title',
+                content = operation->'data'->>'content',
+                date = COALESCE((operation->'data'->>'date')::TIMESTAMP WITH TIME ZONE, memories.date)
+            WHERE id = (operation->>'id')::BIGINT
+            AND user_id = p_user_id
+            RETURNING jsonb_build_object(
+                'id', id, 'title', title, 'content', content, 'date', date,
+                'user_id', user_id, 'created_at', created_at, 'updated_at', updated_at
+            ) INTO result;
+
+        WHEN 'memory.delete' THEN
+            DELETE FROM memories
+            WHERE id = (operation->>'id')::BIGINT
+            AND user_id = p_user_id
+            RETURNING jsonb_build_object(
+                'id', id, 'title', title, 'content', content, 'date', date,
+                'user_id', user_id, 'created_at', created_at, 'updated_at', updated_at
+            ) INTO result;
+
+        WHEN 'media.update_label' THEN
+            UPDATE media_attachments
+            SET label = operation->'data'->>'label'
+            WHERE id = (operation->>'id')::BIGINT
+            AND user_id = p_user_id
+            RETURNING to_jsonb(media_attachments.*) INTO result;
+
+        WHEN 'media.delete' THEN
+            DELETE FROM media_attachments
+            WHERE id = (operation->>'id')::BIGINT
+            AND user_id = p_user_id
+            RETURNING to_jsonb(media_attachments.*) INTO result;
+
+        ELSE
+            RAISE EXCEPTION 'Operation %: % is not supported', op_index, operation->>'op'
+                USING ERRCODE = '22023';
+        END CASE;
+
+        -- Not found or not owned by the user: roll back the whole batch
+        IF result IS NULL THEN
+            RAISE EXCEPTION 'Operation %: % % not found or access denied',
+                op_index, operation->>'op', operation->>'id'
+                USING ERRCODE = 'P0002';
+        END IF;
+
+        results := results || jsonb_build_array(result);
+        op_index := op_index + 1;
+    END LOOP;
+
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Grant execute permission on the function
+REVOKE EXECUTE ON FUNCTION apply_batch_for_user(JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION apply_batch_for_user(JSONB) TO authenticated;
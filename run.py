@@ -1,10 +1,10 @@
 import uvicorn
-import signal
 import sys
 import psutil
 import socket
 import os
 import time
+from app.core.config import settings
 
 PORT = 8000
 
@@ -47,15 +47,12 @@ def wait_for_port(port, timeout=30):
             print(f"Port {port} is still in use. Waiting... ({int(time.time() - start_time)}s)")
             time.sleep(1)
 
-def handle_exit(signum, frame):
-    print("\nShutting down gracefully...")
-    sys.exit(0)
-
 if __name__ == "__main__":
-    # Register signal handlers
-    signal.signal(signal.SIGINT, handle_exit)
-    signal.signal(signal.SIGTERM, handle_exit)
-    
+    # SIGINT and SIGTERM are left to uvicorn: it stops accepting connections,
+    # closes WebSockets, waits for in-flight requests and then runs the app's
+    # lifespan shutdown, which drains background jobs and closes pools (see
+    # app.core.lifespan)
+
     # Try to kill any processes using port 8000
     print(f"Checking for processes using port {PORT}...")
     kill_processes_on_port(PORT)
@@ -77,5 +74,6 @@ if __name__ == "__main__":
         workers=1,
         log_level="info",
         timeout_keep_alive=5,
-        timeout_graceful_shutdown=5
+        # In-flight requests (e.g. LLM calls); jobs get SHUTDOWN_DRAIN_SECONDS after
+        timeout_graceful_shutdown=int(settings.SHUTDOWN_REQUEST_SECONDS)
     ) 
\ No newline at end of file
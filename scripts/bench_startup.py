@@ -0,0 +1,86 @@
+"""Measure how long importing the app takes and check it against a budget.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters,
+reports the median import time, the slowest modules and any SDK that was
+imported eagerly, and exits with status 1 when the median is over budget
+or an SDK was imported eagerly:
+
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 10 --budget-ms 800 --top 20
+
+The settings are read from the environment (or .env) as for the app.
+"""
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Import time budget for app.main, in milliseconds
+DEFAULT_BUDGET_MS = 1200
+
+# SDKs that must only be imported when their clients are first used
+LAZY_MODULES = ("openai", "supabase", "gotrue")
+
+def import_times(module: str) -> Dict[str, Tuple[int, int]]:
+    """Import ``module`` in a fresh interpreter; returns {module: (self_us, cumulative_us)}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the app.")
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="median import time allowed")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    runs = []
+    for _ in range(args.runs):
+        times = import_times(args.module)
+        totals.append(times[args.module][1] / 1000)
+        runs.append(times)
+    median = statistics.median(totals)
+
+    # Slowest modules by self time, from the run closest to the median
+    times = min(runs, key=lambda run: abs(run[args.module][1] / 1000 - median))
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f} ms, max {max(totals):.0f} ms), budget {args.budget_ms:.0f} ms")
+    print("\nSlowest modules (self time):")
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in times]
+    if eager:
+        print(f"\nImported eagerly (should be lazy): {', '.join(eager)}")
+        failed = True
+
+    if median > args.budget_ms:
+        print(f"\nOver budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
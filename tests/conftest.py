@@ -1,5 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
+from unittest.mock import Mock
+from app.core.data_context import DataContext
 from app.main import app
 
 @pytest.fixture
@@ -35,4 +37,22 @@ def mock_media():
         "user_id": "test-user-id",
         "created_at": "2024-05-26T12:00:00",
         "label": "Test Image"
-    } 
\ No newline at end of file
+    }
+
+@pytest.fixture
+def fake_supabase():
+    """A Supabase client whose RPCs return no rows unless a test says otherwise."""
+    supabase = Mock()
+    supabase.rpc.return_value.execute.return_value = Mock(data=[])
+    return supabase
+
+@pytest.fixture
+def ctx(fake_supabase):
+    return DataContext("test-user-id", "test-token", client=fake_supabase)
+
+@pytest.fixture
+def rpc_calls(fake_supabase):
+    """Return the parameters of each call to a named RPC on ``fake_supabase``."""
+    def calls(name):
+        return [call.args[1] for call in fake_supabase.rpc.call_args_list if call.args[0] == name]
+    return calls
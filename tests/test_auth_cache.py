@@ -0,0 +1,120 @@
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi import HTTPException
+from jose import jwt
+from app.core.auth import validate_token
+from app.core.auth_cache import AuthCache
+from app.core.singleflight import SingleFlight
+
+PRINCIPAL = {"id": "test-user-id", "email": "test@example.com", "role": "authenticated"}
+
+def make_token(expires_in: float = 3600, sub: str = "test-user-id") -> str:
+    return jwt.encode({"sub": sub, "exp": int(time.time() + expires_in)}, "secret", algorithm="HS256")
+
+def test_cache_hit_skips_upstream():
+    cache = AuthCache(max_entries=10, ttl=60, negative_ttl=10)
+    validate = AsyncMock(return_value=PRINCIPAL)
+    token = make_token()
+
+    async def run():
+        first = await cache.get_or_validate(token, validate)
+        second = await cache.get_or_validate(token, validate)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second == PRINCIPAL
+    validate.assert_awaited_once_with(token)
+
+def test_ttl_is_capped_at_token_expiry():
+    cache = AuthCache(max_entries=10, ttl=60, negative_ttl=10)
+    validate = AsyncMock(return_value=PRINCIPAL)
+    # Already expired when validated: nothing is cached
+    token = make_token(expires_in=-1)
+
+    asyncio.run(cache.get_or_validate(token, validate))
+    asyncio.run(cache.get_or_validate(token, validate))
+
+    assert validate.await_count == 2
+
+def test_rejected_tokens_are_cached_but_outages_are_not():
+    cache = AuthCache(max_entries=10, ttl=60, negative_ttl=10)
+    rejected = AsyncMock(side_effect=HTTPException(status_code=401, detail="Invalid authentication credentials"))
+    unavailable = AsyncMock(side_effect=HTTPException(status_code=503, detail="Database is unavailable"))
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(cache.get_or_validate("bad-token", rejected))
+        assert error.value.status_code == 401
+        with pytest.raises(HTTPException):
+            asyncio.run(cache.get_or_validate("other-token", unavailable))
+
+    rejected.assert_awaited_once()
+    assert unavailable.await_count == 2
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AuthCache(max_entries=2, ttl=60, negative_ttl=10)
+    validate = AsyncMock(side_effect=lambda token: PRINCIPAL)
+    first, second, third = make_token(sub="a"), make_token(sub="b"), make_token(sub="c")
+
+    async def run():
+        await cache.get_or_validate(first, validate)
+        await cache.get_or_validate(second, validate)
+        await cache.get_or_validate(first, validate)  # first is now most recent
+        await cache.get_or_validate(third, validate)  # evicts second
+        await cache.get_or_validate(first, validate)
+        await cache.get_or_validate(second, validate)
+
+    asyncio.run(run())
+
+    assert [call.args[0] for call in validate.await_args_list] == [first, second, third, second]
+
+def test_concurrent_misses_share_one_check():
+    cache = AuthCache(max_entries=10, ttl=60, negative_ttl=10)
+    calls = []
+
+    async def validate(token):
+        calls.append(token)
+        await asyncio.sleep(0.01)
+        return PRINCIPAL
+
+    async def run():
+        token = make_token()
+        return await asyncio.gather(*(cache.get_or_validate(token, validate) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result == PRINCIPAL for result in results)
+
+def test_single_flight_survives_cancelled_caller():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run():
+        first = asyncio.create_task(flights.do("key", slow))
+        second = asyncio.create_task(flights.do("key", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 42
+    assert not flights.in_flight("key")
+
+def test_validate_token_checks_the_token_once_with_the_shared_client():
+    anon = Mock()
+    anon.auth.get_user.return_value = SimpleNamespace(user=SimpleNamespace(**PRINCIPAL))
+
+    with patch("app.core.auth.get_anon_client", return_value=anon), \
+         patch("app.supabase.client.create_client") as create:
+        principal = asyncio.run(validate_token("test-token"))
+
+    assert principal == PRINCIPAL
+    anon.auth.get_user.assert_called_once_with("test-token")
+    create.assert_not_called()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from app.api import batch as batch_api
+from app.core.auth import get_current_user
+from app.core.data_context import DataContext
+from app.main import app
+from app.models.batch import BatchOperation
+from app.services.batch_service import BatchService
+
+def operations(*specs):
+    return [BatchOperation(**spec) for spec in specs]
+
+def test_run_authenticates_once_and_keeps_request_order(mock_media):
+    service = BatchService()
+    supabase = Mock()
+    lock = threading.Lock()
+    calls = []
+
+    def record(name, result):
+        def handler(client, payload, user_id):
+            assert client is supabase
+            # Give later operations a chance to overtake
+            time.sleep(0.02 if payload['id'] == 1 else 0)
+            with lock:
+                calls.append((name, payload['id']))
+            return result
+        return handler
+
+    service.handlers["media.update_label"] = record("label", mock_media)
+    service.handlers["media.delete"] = record("delete", mock_media)
+    service.handlers["media.get"] = record("get", None)
+
+    results = asyncio.run(service.run(operations(
+        {"op": "media.update_label", "id": 1, "data": {"label": "Beach"}},
+        {"op": "media.get", "id": 2},
+        {"op": "media.delete", "id": 1},
+    ), DataContext("test-user-id", "test-token", client=supabase)))
+
+    assert [(result.index, result.status) for result in results] == [(0, 200), (1, 404), (2, 200)]
+    # Operations on media 1 ran in order, media 2 did not wait for them
+    assert calls.index(("label", 1)) < calls.index(("delete", 1))
+    assert calls[0] == ("get", 2)
+
+def test_run_reports_invalid_operations_without_failing_the_batch(mock_memory):
+    service = BatchService()
+    service.handlers["memory.get"] = lambda client, payload, user_id: mock_memory
+
+    results = asyncio.run(service.run(operations(
+        {"op": "memory.update", "id": 1, "data": {"title": "Missing content"}},
+        {"op": "memory.delete"},
+        {"op": "memory.get", "id": 1},
+    ), DataContext("test-user-id", "test-token", client=Mock())))
+
+    assert [result.status for result in results] == [422, 400, 200]
+    assert results[2].body == mock_memory
+
+def test_run_atomic_uses_one_rpc(mock_memory, mock_media):
+    service = BatchService()
+    supabase = Mock()
+    supabase.rpc.return_value.execute.return_value = Mock(data=[mock_memory, mock_media])
+
+    results = asyncio.run(service.run_atomic(operations(
+        {"op": "memory.create", "data": {"title": "Trip", "content": "Paris", "date": "2024-05-26T00:00:00"}},
+        {"op": "media.delete", "id": 3},
+    ), DataContext("test-user-id", "test-token", client=supabase)))
+
+    supabase.rpc.assert_called_once()
+    name, params = supabase.rpc.call_args.args
+    assert name == "apply_batch_for_user"
+    # The database takes the user from the caller's token
+    assert "p_user_id" not in params
+    assert [operation["op"] for operation in params["p_operations"]] == ["memory.create", "media.delete"]
+    assert params["p_operations"][0]["data"]["title"] == "Trip"
+    assert [result.status for result in results] == [201, 200]
+
+def test_run_atomic_rolls_back_on_missing_row():
+    service = BatchService()
+    supabase = Mock()
+    supabase.rpc.return_value.execute.side_effect = APIError(
+        {"code": "P0002", "message": "Operation 1: media.delete 3 not found or access denied"}
+    )
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(service.run_atomic(operations(
+            {"op": "media.update_label", "id": 2, "data": {"label": "Beach"}},
+            {"op": "media.delete", "id": 3},
+        ), DataContext("test-user-id", "test-token", client=supabase)))
+
+    assert error.value.status_code == 404
+
+def test_run_atomic_rejects_reads():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(BatchService().run_atomic(operations({"op": "memory.get", "id": 1}), DataContext("test-user-id", "test-token")))
+
+    assert error.value.status_code == 400
+
+def test_batch_route_limits_operation_count(client, mock_user):
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    try:
+        with patch.object(batch_api.settings, "BATCH_MAX_OPERATIONS", 2), \
+             patch.object(batch_api.batch_service, "run", AsyncMock()) as run:
+            response = client.post("/api/batch", json={
+                "operations": [{"op": "media.get", "id": i} for i in range(3)]
+            })
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 400
+    run.assert_not_awaited()
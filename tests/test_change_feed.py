@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.core.upstream import UpstreamUnavailable
+from app.services.embedding_service import content_hash
+from app.workers.change_feed import ChangeFeedWorker
+
+@pytest.fixture
+def embedder():
+    service = Mock()
+    service.batch_size = 100
+    service.embed = AsyncMock(side_effect=lambda texts: [[0.1, 0.2] for _ in texts])
+    return service
+
+def feed(supabase, changes):
+    def rpc(name, params):
+        call = Mock()
+        call.execute.return_value = Mock(data=changes if name == "read_memory_changes" else 1)
+        return call
+    supabase.rpc.side_effect = lambda name, params: rpc(name, params)
+
+def test_run_once_embeds_only_changed_memories(fake_supabase, embedder, rpc_calls):
+    # Read in (txid, id) order: id 12 committed in a later transaction
+    feed(fake_supabase, [
+        {"id": 10, "txid": "700", "memory_id": 1, "operation": "upsert"},
+        {"id": 11, "txid": "701", "memory_id": 1, "operation": "upsert"},
+        {"id": 13, "txid": "702", "memory_id": 3, "operation": "upsert"},
+        {"id": 14, "txid": "703", "memory_id": 3, "operation": "delete"},
+        {"id": 12, "txid": "705", "memory_id": 2, "operation": "upsert"},
+    ])
+    fake_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value = Mock(data=[
+        {"id": 1, "title": "Trip", "content": "Paris", "embedding_hash": None},
+        {"id": 2, "title": "Same", "content": "text", "embedding_hash": content_hash("Same", "text")},
+    ])
+
+    processed = asyncio.run(ChangeFeedWorker(client=fake_supabase, embedding_service=embedder).run_once())
+
+    assert processed == 5
+    # Memory 1 is embedded once, 2 is unchanged and 3 was deleted
+    fake_supabase.table.return_value.select.return_value.in_.assert_called_once_with("id", [1, 2])
+    embedder.embed.assert_awaited_once()
+    stored = rpc_calls("set_memory_embeddings")[0]["p_embeddings"]
+    assert [row["id"] for row in stored] == [1]
+    assert rpc_calls("read_memory_changes") == [{"p_consumer": "embeddings", "p_limit": 200}]
+    # The checkpoint is the last change read, not the highest id
+    assert rpc_calls("advance_change_checkpoint") == [
+        {"p_consumer": "embeddings", "p_last_txid": "705", "p_last_change_id": 12}
+    ]
+
+def test_run_once_keeps_checkpoint_when_upstream_is_down(fake_supabase, embedder, rpc_calls):
+    feed(fake_supabase, [{"id": 20, "txid": "800", "memory_id": 4, "operation": "upsert"}])
+    fake_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value = Mock(data=[
+        {"id": 4, "title": "A", "content": "B", "embedding_hash": None},
+    ])
+    embedder.embed.side_effect = UpstreamUnavailable("OpenAI")
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(ChangeFeedWorker(client=fake_supabase, embedding_service=embedder).run_once())
+
+    assert rpc_calls("advance_change_checkpoint") == []
+
+def test_run_once_without_changes_does_nothing(fake_supabase, embedder, rpc_calls):
+    fake_supabase.rpc.return_value.execute.return_value = Mock(data=[])
+
+    assert asyncio.run(ChangeFeedWorker(client=fake_supabase, embedding_service=embedder).run_once()) == 0
+    assert rpc_calls("advance_change_checkpoint") == []
+
+def test_backfill_resumes_saved_progress(fake_supabase, embedder):
+    worker = ChangeFeedWorker(client=fake_supabase, embedding_service=embedder)
+    worker.batch_size = 2
+    progress = {
+        0: [{"last_memory_id": 0, "done": True}],
+        1: [{"last_memory_id": 7, "done": False}],
+    }
+    select = fake_supabase.table.return_value.select.return_value
+
+    def progress_query(column, value):
+        consumer = Mock()
+        consumer.eq.side_effect = lambda column, partition: Mock(
+            eq=Mock(return_value=Mock(execute=Mock(return_value=Mock(data=progress[partition]))))
+        )
+        return consumer
+    select.eq.side_effect = progress_query
+
+    pages = [
+        [{"id": 9, "title": "a", "content": "b"}, {"id": 11, "title": "c", "content": "d"}],
+        [{"id": 13, "title": "e", "content": "f"}],
+    ]
+    stale_calls = []
+
+    def rpc(name, params):
+        call = Mock()
+        if name == "stale_memory_embeddings":
+            stale_calls.append(params)
+            call.execute.return_value = Mock(data=pages[len(stale_calls) - 1])
+        else:
+            call.execute.return_value = Mock(data=len(params["p_embeddings"]))
+        return call
+    fake_supabase.rpc.side_effect = rpc
+
+    stored = asyncio.run(worker.backfill(partitions=2))
+
+    assert stored == 3
+    # Partition 0 was already done; partition 1 continues after memory 7
+    assert [call["p_after_id"] for call in stale_calls] == [7, 11]
+    assert all(call["p_partition"] == 1 for call in stale_calls)
+    saved = [call.args[0] for call in fake_supabase.table.return_value.upsert.call_args_list]
+    assert [(row["last_memory_id"], row["done"]) for row in saved] == [(11, False), (13, True)]
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from app.core.compression import CompressionMiddleware, select_encoding
+
+@pytest.fixture
+def compressed_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("memory " * 500, headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield b"line " * 100
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    @app.get("/audio")
+    async def audio():
+        return Response(b"\x00" * 1000, media_type="audio/mpeg")
+
+    return TestClient(app)
+
+def test_select_encoding_prefers_brotli():
+    pytest.importorskip("brotli")
+    assert select_encoding("gzip, deflate, br") == "br"
+    assert select_encoding("gzip, br;q=0.5") == "gzip"
+    assert select_encoding("br;q=0, gzip") == "gzip"
+    assert select_encoding("identity") is None
+    assert select_encoding("*") == "br"
+
+def test_brotli_response(compressed_client):
+    pytest.importorskip("brotli")
+    response = compressed_client.get("/large", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"] == 'W/"abc"'
+    # httpx decodes br transparently when brotli is installed
+    assert response.text == "memory " * 500
+
+def test_gzip_streaming_response(compressed_client):
+    response = compressed_client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "line " * 300
+
+def test_small_and_media_responses_are_not_compressed(compressed_client):
+    small = compressed_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    audio = compressed_client.get("/audio", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in audio.headers
+    assert audio.content == b"\x00" * 1000
@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+from starlette.requests import Request
+from app.core.auth import get_current_user
+from app.core.http_cache import make_etag, collection_version, is_not_modified
+from app.main import app
+from app.models.memory import Memory
+
+def make_request(headers):
+    return Request({
+        "type": "http",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def test_make_etag_is_strong_and_stable():
+    etag = make_etag("memory", 1, "2024-05-26T12:00:00")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("memory", 1, "2024-05-26T12:00:00")
+    assert etag != make_etag("memory", 1, "2024-05-26T12:00:01")
+
+def test_collection_version_matches_rows():
+    rows = [
+        {"id": 3, "updated_at": "2024-05-26T12:00:00+00:00"},
+        {"id": 7, "updated_at": "2024-05-27T08:30:00+00:00"},
+    ]
+    count, last_modified, max_id = collection_version(rows, "updated_at")
+    assert (count, max_id) == (2, 7)
+    assert last_modified == datetime(2024, 5, 27, 8, 30, tzinfo=timezone.utc)
+
+def test_if_none_match_takes_precedence():
+    etag = make_etag("x")
+    last_modified = datetime(2024, 5, 26, 12, 0, tzinfo=timezone.utc)
+    request = make_request({
+        "If-None-Match": '"other"',
+        "If-Modified-Since": "Sun, 26 May 2024 12:00:00 GMT",
+    })
+    assert not is_not_modified(request, etag, last_modified)
+    assert is_not_modified(make_request({"If-None-Match": f'"other", W/{etag}'}), etag)
+
+def test_if_modified_since():
+    last_modified = datetime(2024, 5, 26, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    assert is_not_modified(make_request({"If-Modified-Since": "Sun, 26 May 2024 12:00:00 GMT"}), '"e"', last_modified)
+    assert not is_not_modified(make_request({"If-Modified-Since": "Sun, 26 May 2024 11:59:59 GMT"}), '"e"', last_modified)
+
+@pytest.fixture
+def authenticated(mock_user):
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+def test_get_memory_returns_304_when_unchanged(client, authenticated, mock_memory):
+    with patch("app.api.memories.memory_service.get_memory", new=AsyncMock(return_value=Memory(**mock_memory))):
+        first = client.get("/api/memories/1")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        second = client.get("/api/memories/1", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+
+def test_memory_list_is_validated_by_etag_only(client, authenticated, mock_memory):
+    rows = [mock_memory, {**mock_memory, "id": 2}]
+    with patch("app.api.memories.memory_service.get_memory_rows", new=AsyncMock(return_value=rows)):
+        response = client.get("/api/memories/")
+
+    assert response.status_code == 200
+    assert "etag" in response.headers
+    # A delete does not advance MAX(updated_at), so it cannot be a Last-Modified
+    assert "last-modified" not in response.headers
+
+    with patch("app.api.memories.memory_service.get_memory_rows", new=AsyncMock(return_value=rows[:1])):
+        after_delete = client.get("/api/memories/", headers={
+            "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"
+        })
+
+    assert after_delete.status_code == 200
+    assert len(after_delete.json()) == 1
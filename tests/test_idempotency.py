@@ -0,0 +1,176 @@
+import asyncio
+import httpx
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from jose import jwt
+from app.core.idempotency import IdempotencyMiddleware, MemoryIdempotencyStore
+
+def make_app(store=None, wait_timeout=5.0, max_response_bytes=1024):
+    app = FastAPI()
+    app.add_middleware(
+        IdempotencyMiddleware,
+        store=store or MemoryIdempotencyStore(),
+        routes=["POST /api/interview/continue", "POST /api/media/upload"],
+        ttl=60,
+        lock_ttl=10,
+        wait_timeout=wait_timeout,
+        max_response_bytes=max_response_bytes,
+        jwt_secret="secret",
+    )
+    app.state.calls = 0
+    app.state.release = None
+
+    @app.post("/api/interview/continue")
+    async def continue_interview(body: dict):
+        app.state.calls += 1
+        if app.state.release is not None:
+            await app.state.release.wait()
+        if body.get("fail"):
+            raise HTTPException(status_code=500, detail="Upstream failed")
+        return {"turn": app.state.calls, "padding": body.get("padding", "")}
+
+    @app.post("/api/media/upload")
+    async def upload(file: UploadFile = File(...)):
+        app.state.calls += 1
+        return {"filename": file.filename, "upload": app.state.calls}
+
+    return app
+
+def bearer(sub, key=None):
+    headers = {"Authorization": f"Bearer {jwt.encode({'sub': sub}, 'secret', algorithm='HS256')}"}
+    if key:
+        headers["Idempotency-Key"] = key
+    return headers
+
+def test_retry_replays_the_first_response():
+    app = make_app()
+    client = TestClient(app)
+
+    first = client.post("/api/interview/continue", json={"user_response": "hi"}, headers=bearer("alice", "key-1"))
+    retry = client.post("/api/interview/continue", json={"user_response": "hi"}, headers=bearer("alice", "key-1"))
+
+    assert first.json() == retry.json() == {"turn": 1, "padding": ""}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert app.state.calls == 1
+
+def test_keys_are_scoped_to_the_caller():
+    app = make_app()
+    client = TestClient(app)
+
+    client.post("/api/interview/continue", json={}, headers=bearer("alice", "key-1"))
+    other = client.post("/api/interview/continue", json={}, headers=bearer("bob", "key-1"))
+
+    assert other.json()["turn"] == 2
+    assert app.state.calls == 2
+
+def test_requests_without_a_key_or_on_other_routes_always_run():
+    app = make_app()
+    client = TestClient(app)
+
+    for _ in range(2):
+        client.post("/api/interview/continue", json={}, headers=bearer("alice"))
+
+    assert app.state.calls == 2
+
+def test_reusing_a_key_for_a_different_request_is_rejected():
+    client = TestClient(make_app())
+
+    client.post("/api/interview/continue", json={"user_response": "hi"}, headers=bearer("alice", "key-1"))
+    reused = client.post("/api/interview/continue", json={"user_response": "bye"}, headers=bearer("alice", "key-1"))
+
+    assert reused.status_code == 422
+
+def test_failed_requests_are_not_recorded():
+    app = make_app()
+    client = TestClient(app)
+
+    first = client.post("/api/interview/continue", json={"fail": True}, headers=bearer("alice", "key-1"))
+    retry = client.post("/api/interview/continue", json={"fail": True}, headers=bearer("alice", "key-1"))
+
+    assert first.status_code == retry.status_code == 500
+    assert app.state.calls == 2
+
+def test_large_responses_are_not_recorded():
+    app = make_app(max_response_bytes=100)
+    client = TestClient(app)
+
+    for _ in range(2):
+        response = client.post("/api/interview/continue", json={"padding": "x" * 200}, headers=bearer("alice", "key-1"))
+        assert response.status_code == 200
+
+    assert app.state.calls == 2
+
+def test_uploads_are_replayed_despite_a_new_multipart_boundary():
+    app = make_app()
+    client = TestClient(app)
+
+    first = client.post("/api/media/upload", files={"file": ("a.jpg", b"image", "image/jpeg")}, headers=bearer("alice", "key-1"))
+    retry = client.post("/api/media/upload", files={"file": ("a.jpg", b"image", "image/jpeg")}, headers=bearer("alice", "key-1"))
+
+    assert first.json() == retry.json()
+    assert app.state.calls == 1
+
+def test_concurrent_duplicates_wait_for_the_first_request():
+    app = make_app()
+
+    async def run():
+        app.state.release = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            requests = [
+                asyncio.create_task(client.post("/api/interview/continue", json={}, headers=bearer("alice", "key-1")))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            app.state.release.set()
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(run())
+
+    assert [response.json()["turn"] for response in responses] == [1, 1, 1]
+    assert sum(response.headers.get("idempotent-replayed") == "true" for response in responses) == 2
+    assert app.state.calls == 1
+
+def test_duplicate_gets_409_when_the_first_request_runs_too_long():
+    app = make_app(wait_timeout=0.05)
+
+    async def run():
+        app.state.release = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/api/interview/continue", json={}, headers=bearer("alice", "key-1")))
+            await asyncio.sleep(0.01)
+            duplicate = await client.post("/api/interview/continue", json={}, headers=bearer("alice", "key-1"))
+            app.state.release.set()
+            return await first, duplicate
+
+    first, duplicate = asyncio.run(run())
+
+    assert first.status_code == 200
+    assert duplicate.status_code == 409
+    assert duplicate.headers["retry-after"] == "1"
+
+def test_store_errors_fail_open():
+    class BrokenStore(MemoryIdempotencyStore):
+        async def begin(self, key, record, ttl):
+            raise ConnectionError("store is down")
+
+    app = make_app(store=BrokenStore())
+    client = TestClient(app)
+
+    for _ in range(2):
+        assert client.post("/api/interview/continue", json={}, headers=bearer("alice", "key-1")).status_code == 200
+
+    assert app.state.calls == 2
+
+def test_memory_store_expires_records():
+    store = MemoryIdempotencyStore()
+
+    async def run():
+        assert await store.begin("key", {"token": "a"}, ttl=0.01) is None
+        assert await store.begin("key", {"token": "b"}, ttl=10) == {"token": "a"}
+        await asyncio.sleep(0.02)
+        return await store.begin("key", {"token": "c"}, ttl=10)
+
+    assert asyncio.run(run()) is None
@@ -8,7 +8,9 @@ client = TestClient(app)
 
 @pytest.fixture
 def mock_openai():
-    with patch('app.services.ai_interviewer.openai') as mock:
+    # The service uses the shared client; tests configure it as mock.OpenAI.return_value
+    mock = Mock()
+    with patch('app.services.ai_interviewer.get_openai_client', lambda: mock.OpenAI.return_value):
         yield mock
 
 @pytest.fixture
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from app.services import ai_interviewer
+from app.services.ai_interviewer import AIInterviewerService
+from app.services.interview_prompts import INTERVIEWER_PROMPT, conversation_fingerprint, conversation_messages
+
+conversation = [
+    {"role": "assistant", "content": "What's a memory you'd like to share?", "timestamp": "2024-01-01T10:00:00"},
+    {"role": "user", "content": "Fishing with my grandfather at Lake Tahoe in 1985", "timestamp": "2024-01-01T10:01:00"},
+]
+
+def completion(content=None, arguments=None):
+    tool_calls = [SimpleNamespace(function=SimpleNamespace(arguments=arguments))] if arguments is not None else None
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+def test_tasks_share_the_conversation_prefix():
+    """Follow-up, summary and title prompts only differ after the conversation."""
+    complete = AsyncMock(side_effect=[completion("Who else was there?"), completion("I went fishing."), completion("Fishing at Tahoe")])
+    service = AIInterviewerService()
+
+    with patch.object(ai_interviewer, "get_openai_client", Mock()), \
+         patch.object(ai_interviewer.model_router, "complete", complete):
+        asyncio.run(service.continue_interview({"conversation": list(conversation)}, "He caught a trout"))
+        asyncio.run(service.end_interview({"conversation": conversation}))
+        asyncio.run(service.suggest_memory_title(conversation))
+
+    prompts = [call.kwargs["messages"] for call in complete.call_args_list]
+    prefix = conversation_messages(conversation)
+    assert prefix[0] == {"role": "system", "content": INTERVIEWER_PROMPT}
+    assert all(messages[:len(prefix)] == prefix for messages in prompts)
+    # Timestamps are not sent, so they cannot break the prefix
+    assert all(set(message) == {"role", "content"} for messages in prompts for message in messages)
+
+def test_end_interview_drafts_summary_and_title_in_one_call():
+    complete = AsyncMock(return_value=completion(arguments='{"summary": "I went fishing with my grandfather.", "title": "\\"Fishing at Tahoe\\""}'))
+    service = AIInterviewerService()
+
+    with patch.object(ai_interviewer, "get_openai_client", Mock()), \
+         patch.object(ai_interviewer.model_router, "complete", complete):
+        ended = asyncio.run(service.end_interview({"conversation": conversation}, suggest_title=True))
+        title = asyncio.run(service.suggest_memory_title(conversation))
+
+    assert ended["summary"] == "I went fishing with my grandfather."
+    assert ended["suggested_title"] == "Fishing at Tahoe"
+    # The drafted title is reused instead of asking the model again
+    assert title == "Fishing at Tahoe"
+    assert complete.await_count == 1
+    assert complete.call_args.args[0] == "memory_draft"
+    assert complete.call_args.kwargs["tool_choice"]["function"]["name"] == "save_memory_draft"
+
+def test_end_interview_falls_back_to_a_summary_when_the_draft_cannot_be_parsed():
+    complete = AsyncMock(side_effect=[completion(arguments="{not json"), completion("I went fishing.")])
+    service = AIInterviewerService()
+
+    with patch.object(ai_interviewer, "get_openai_client", Mock()), \
+         patch.object(ai_interviewer.model_router, "complete", complete):
+        ended = asyncio.run(service.end_interview({"conversation": conversation}, suggest_title=True))
+
+    assert ended["summary"] == "I went fishing."
+    assert "suggested_title" not in ended
+    assert [call.args[0] for call in complete.call_args_list] == ["memory_draft", "summary"]
+
+def test_drafted_titles_are_bounded():
+    service = AIInterviewerService()
+
+    with patch.object(ai_interviewer, "DRAFTED_TITLES_MAX", 2):
+        for index in range(3):
+            service._remember_title([{"role": "user", "content": f"memory {index}"}], f"Title {index}")
+
+    assert list(service._drafted_titles.values()) == ["Title 1", "Title 2"]
+
+def test_fingerprint_ignores_timestamps():
+    restamped = [{**message, "timestamp": "2025-06-01T00:00:00"} for message in conversation]
+
+    assert conversation_fingerprint(restamped) == conversation_fingerprint(conversation)
+    assert conversation_fingerprint(conversation[:1]) != conversation_fingerprint(conversation)
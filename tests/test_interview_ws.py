@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from starlette.websockets import WebSocketDisconnect
+from app.api import interview as interview_api
+from app.core.data_context import DataContext
+from app.models.interview import InterviewSession
+from app.services.interview_session_service import SessionWriteBehind
+
+def make_session(**overrides):
+    return InterviewSession(**{
+        "id": 1,
+        "session_id": "session-1",
+        "user_id": "test-user-id",
+        "conversation": [{"role": "assistant", "content": "What would you like to share?"}],
+        "current_question": "What would you like to share?",
+        "created_at": "2024-05-26T12:00:00",
+        **overrides
+    })
+
+def stream(*deltas):
+    async def stream_next_question(conversation):
+        for delta in deltas:
+            yield delta
+    return stream_next_question
+
+@pytest.fixture
+def live_services(mock_user):
+    with patch.object(interview_api, "authenticate", AsyncMock(return_value=mock_user)) as authenticate, \
+         patch.object(interview_api.session_service, "get_session", AsyncMock(return_value=make_session())) as get_session, \
+         patch.object(interview_api.session_service, "update_session", AsyncMock()) as update_session:
+        yield authenticate, get_session, update_session
+
+def test_websocket_keeps_session_and_saves_turns(client, live_services):
+    authenticate, get_session, update_session = live_services
+
+    with patch.object(interview_api.interviewer_service, "stream_next_question", stream("Where ", "was it?")), \
+         patch.object(interview_api.transcription_service, "transcribe_bytes", AsyncMock(return_value="At the lake.")) as transcribe:
+        with client.websocket_connect("/api/interview/ws") as websocket:
+            websocket.send_json({"type": "auth", "token": "test-token", "session_id": "session-1"})
+            assert websocket.receive_json()["type"] == "ready"
+
+            websocket.send_json({"type": "text", "text": "We went camping."})
+            assert websocket.receive_json() == {"type": "question", "delta": "Where "}
+            assert websocket.receive_json() == {"type": "question", "delta": "was it?"}
+            assert websocket.receive_json() == {"type": "turn_complete", "current_question": "Where was it?"}
+
+            websocket.send_bytes(b"\x00" * 2048)
+            assert websocket.receive_json() == {"type": "transcript", "text": "At the lake."}
+            assert [websocket.receive_json()["type"] for _ in range(3)] == ["question", "question", "turn_complete"]
+
+    # Authenticated and loaded once for both turns
+    authenticate.assert_awaited_once_with("test-token")
+    get_session.assert_awaited_once()
+    assert transcribe.await_args.args[1] == "turn.webm"
+
+    saved = update_session.await_args_list[-1].args[1]
+    assert [message["content"] for message in saved["conversation"]] == [
+        "What would you like to share?", "We went camping.", "Where was it?", "At the lake.", "Where was it?"
+    ]
+
+def test_websocket_failed_turn_leaves_session_unchanged(client, live_services):
+    _, _, update_session = live_services
+
+    async def failing(conversation):
+        raise RuntimeError("model unavailable")
+        yield
+
+    with patch.object(interview_api.interviewer_service, "stream_next_question", failing):
+        with client.websocket_connect("/api/interview/ws") as websocket:
+            websocket.send_json({"type": "auth", "token": "test-token", "session_id": "session-1"})
+            websocket.receive_json()
+            websocket.send_json({"type": "text", "text": "Hello"})
+            assert websocket.receive_json()["type"] == "error"
+
+    update_session.assert_not_awaited()
+
+def test_websocket_rejects_unknown_session(client, live_services):
+    _, get_session, _ = live_services
+    get_session.return_value = None
+
+    with client.websocket_connect("/api/interview/ws") as websocket:
+        websocket.send_json({"type": "auth", "token": "test-token", "session_id": "missing"})
+        assert websocket.receive_json() == {"type": "error", "detail": "Interview session not found"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 4404
+
+def test_write_behind_coalesces_and_keeps_order():
+    writes = []
+    release = asyncio.Event()
+
+    async def update_session(session_id, session_data, ctx):
+        await release.wait()
+        writes.append(session_data["turn"])
+
+    async def run():
+        service = AsyncMock()
+        service.update_session = update_session
+        writer = SessionWriteBehind(service, "session-1", DataContext("test-user-id", "test-token"))
+        writer.save({"turn": 1})
+        await asyncio.sleep(0)
+        writer.save({"turn": 2})
+        writer.save({"turn": 3})
+        release.set()
+        return await writer.flush()
+
+    assert asyncio.run(run()) is True
+    assert writes == [1, 3]
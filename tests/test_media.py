@@ -1,8 +1,12 @@
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from app.api import media as media_api
+from app.core.auth import get_current_user
 from app.main import app
 import pytest
 import os
 from io import BytesIO
+from unittest.mock import AsyncMock, patch
 
 client = TestClient(app)
 
@@ -50,4 +54,19 @@ def test_delete_media(client, mock_user, mock_media):
     response = client.delete(f"/api/media/{mock_media['id']}")
 def test_delete_media(mock_user):
     response = client.delete("/api/media/1")
-    assert response.status_code == 401  # Unauthorized without auth 
\ No newline at end of file
+    assert response.status_code == 401  # Unauthorized without auth 
+def test_upload_media_keeps_the_retry_signal(mock_user):
+    busy = HTTPException(status_code=503, detail="Stored media is being removed, please retry", headers={"Retry-After": "1"})
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    try:
+        with patch.object(media_api.media_service, "upload_media", AsyncMock(side_effect=busy)):
+            response = client.post(
+                "/api/media/upload",
+                files={"file": ("test.jpg", b"image", "image/jpeg")},
+                data={"memory_id": "1", "media_type": "image"}
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
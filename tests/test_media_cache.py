@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.api import media as media_api
+from app.core.auth import get_current_user
+from app.core.http_cache import parse_range
+from app.core.media_cache import MediaCache
+from app.main import app
+
+def source(data, calls):
+    async def fetch():
+        calls.append(data)
+        for start in range(0, len(data), 4):
+            await asyncio.sleep(0)
+            yield data[start:start + 4]
+    return fetch
+
+def cache_name(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+async def read_all(cache, key, fetch):
+    file, size = await cache.open(key, fetch)
+    async with file:
+        return await file.read(), size
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=95-200", 100) == (95, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+def test_cache_fetches_once_for_concurrent_misses(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1024)
+    calls = []
+    fetch = source(b"hello world", calls)
+
+    async def run():
+        return await asyncio.gather(*(read_all(cache, "user/a.mp3", fetch) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert results == [(b"hello world", 11)] * 3
+    assert len(calls) == 1
+
+def test_cache_drops_fill_locks_once_every_caller_is_done(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1024)
+    calls = []
+    fetch = source(b"hello world", calls)
+
+    async def late_read(delay):
+        await asyncio.sleep(delay)
+        return await read_all(cache, "user/a.mp3", fetch)
+
+    async def run():
+        readers = [asyncio.create_task(late_read(delay)) for delay in (0, 0, 0.001, 0.002, 0.005)]
+        # One lock for the key, shared by every reader while the fill runs
+        while not cache._lock_users:
+            await asyncio.sleep(0)
+        assert list(cache._lock_users) == [cache_name("user/a.mp3")]
+        return await asyncio.gather(*readers)
+
+    results = asyncio.run(run())
+
+    assert results == [(b"hello world", 11)] * 5
+    assert len(calls) == 1
+    assert cache._locks == {} and cache._lock_users == {}
+    assert cache._size == 11
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=20)
+    calls = []
+
+    async def run():
+        await read_all(cache, "a", source(b"a" * 8, calls))
+        await read_all(cache, "b", source(b"b" * 8, calls))
+        await read_all(cache, "a", source(b"a" * 8, calls))
+        await read_all(cache, "c", source(b"c" * 8, calls))
+        await read_all(cache, "a", source(b"a" * 8, calls))
+        await read_all(cache, "b", source(b"b" * 8, calls))
+
+    asyncio.run(run())
+
+    # "b" was the least recently used when "c" pushed the cache over its cap
+    assert calls == [b"a" * 8, b"b" * 8, b"c" * 8, b"b" * 8]
+
+def test_content_route_serves_ranges(client, mock_user, tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1024)
+    media = {"id": 1, "file_path": "test-user-id/clip.mp3", "media_type": "audio"}
+
+    async def open_media_content(media, token):
+        return await cache.open(media["file_path"], source(b"0123456789", []))
+
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    try:
+        with patch.object(media_api.settings, "MEDIA_PROXY_ENABLED", True), \
+             patch.object(media_api.media_service, "get_media_content", AsyncMock(return_value=media)), \
+             patch.object(media_api.media_service, "open_media_content", open_media_content):
+            partial = client.get("/api/media/1/content", headers={"Range": "bytes=2-5"})
+            full = client.get("/api/media/1/content")
+            unsatisfiable = client.get("/api/media/1/content", headers={"Range": "bytes=50-"})
+            cached = client.get("/api/media/1/content", headers={"If-None-Match": full.headers["etag"]})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert partial.status_code == 206
+    assert partial.content == b"2345"
+    assert partial.headers["content-range"] == "bytes 2-5/10"
+    assert full.status_code == 200
+    assert full.content == b"0123456789"
+    assert full.headers["accept-ranges"] == "bytes"
+    assert unsatisfiable.status_code == 416
+    assert cached.status_code == 304
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import io
+import pytest
+from unittest.mock import Mock
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from app.models.media import MediaCreate, MediaUploadRequest, MediaUploadComplete
+from app.services.media_service import MediaService
+
+def filtered(builder):
+    """The builder returned after .eq("id", ...).eq("user_id", ...)."""
+    return builder.return_value.eq.return_value.eq.return_value
+
+def test_update_media_label_is_a_single_statement(fake_supabase, mock_media, ctx):
+    table = fake_supabase.table.return_value
+    filtered(table.update).execute.return_value = Mock(data=[{**mock_media, "label": "New"}])
+
+    result = asyncio.run(MediaService().update_media_label(1, "New", ctx))
+
+    assert result["label"] == "New"
+    table.select.assert_not_called()
+    fake_supabase.table.assert_called_once_with("media_attachments")
+
+def test_update_media_label_not_owned_returns_404(fake_supabase, ctx):
+    filtered(fake_supabase.table.return_value.update).execute.return_value = Mock(data=[])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(MediaService().update_media_label(1, "New", ctx))
+
+    assert error.value.status_code == 404
+
+def test_delete_media_leaves_storage_to_the_reaper(fake_supabase, mock_media, ctx):
+    table = fake_supabase.table.return_value
+    filtered(table.delete).execute.return_value = Mock(data=[mock_media])
+
+    result = asyncio.run(MediaService().delete_media(1, ctx))
+
+    assert result == mock_media
+    table.select.assert_not_called()
+    fake_supabase.storage.from_.return_value.remove.assert_not_called()
+
+class FakeUpload:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self._file = io.BytesIO(content)
+
+    async def read(self, size=-1):
+        return self._file.read(size)
+
+    async def seek(self, offset):
+        self._file.seek(offset)
+
+def test_upload_media_stores_content_under_its_hash(fake_supabase, mock_media, ctx, rpc_calls):
+    sha256 = hashlib.sha256(b"photo").hexdigest()
+    fake_supabase.rpc.return_value.execute.side_effect = [Mock(data=[]), Mock(data=[mock_media])]
+
+    result = asyncio.run(MediaService().upload_media(
+        FakeUpload("Photo.JPG", b"photo"),
+        MediaCreate(memory_id=1, media_type="image", file_path="", user_id="test-user-id"),
+        ctx
+    ))
+
+    assert result == mock_media
+    bucket = fake_supabase.storage.from_.return_value
+    assert bucket.upload.call_args.args[:2] == (f"test-user-id/{sha256}.jpg", b"photo")
+    params = rpc_calls("attach_media_blobs_for_user")[0]
+    # The database takes the owner from the caller's token
+    assert "p_user_id" not in params
+    attachment = params["p_attachments"][0]
+    assert attachment["sha256"] == sha256
+    assert attachment["size_bytes"] == 5
+    assert rpc_calls("find_media_blobs_for_user") == [{"p_sha256": [sha256]}]
+
+def test_upload_media_reuses_stored_blob(fake_supabase, mock_media, ctx, rpc_calls):
+    sha256 = hashlib.sha256(b"photo").hexdigest()
+    fake_supabase.rpc.return_value.execute.side_effect = [
+        Mock(data=[{"sha256": sha256, "file_path": "test-user-id/existing.jpg"}]),
+        Mock(data=[mock_media]),
+    ]
+
+    asyncio.run(MediaService().upload_media(
+        FakeUpload("copy.jpg", b"photo"),
+        MediaCreate(memory_id=2, media_type="image", file_path="", user_id="test-user-id"),
+        ctx
+    ))
+
+    fake_supabase.storage.from_.return_value.upload.assert_not_called()
+    attachment = rpc_calls("attach_media_blobs_for_user")[0]["p_attachments"][0]
+    assert attachment["file_path"] == "test-user-id/existing.jpg"
+
+def test_upload_media_asks_for_a_retry_while_the_blob_is_removed(fake_supabase, ctx):
+    fake_supabase.rpc.return_value.execute.side_effect = [
+        Mock(data=[]),
+        APIError({"message": "Stored media is being removed, retry the upload", "code": "55006"}),
+    ]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(MediaService().upload_media(
+            FakeUpload("photo.jpg", b"photo"),
+            MediaCreate(memory_id=1, media_type="image", file_path="", user_id="test-user-id"),
+            ctx
+        ))
+
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": "1"}
+
+def test_upload_media_batch_uploads_repeated_content_once(fake_supabase, ctx, rpc_calls):
+    uploads = [
+        {"memory_id": memory_id, "filename": "a.png", "media_type": "image", "read": lambda: b"same"}
+        for memory_id in (1, 2, 3)
+    ]
+    fake_supabase.rpc.return_value.execute.side_effect = [
+        Mock(data=[]),
+        Mock(data=[{"id": 10}, {"id": 11}, {"id": 12}]),
+    ]
+
+    results = asyncio.run(MediaService().upload_media_batch(uploads, ctx))
+
+    assert results == [{"media": {"id": 10}}, {"media": {"id": 11}}, {"media": {"id": 12}}]
+    assert fake_supabase.storage.from_.return_value.upload.call_count == 1
+    attachments = rpc_calls("attach_media_blobs_for_user")[0]["p_attachments"]
+    assert len({attachment["file_path"] for attachment in attachments}) == 1
+
+def test_create_upload_url_scopes_path_to_user(fake_supabase, ctx):
+    table = fake_supabase.table.return_value
+    table.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value = Mock(data=[{"id": 1}])
+    bucket = fake_supabase.storage.from_.return_value
+    bucket.create_signed_upload_url.side_effect = lambda path: {"signed_url": f"https://storage/{path}", "token": "t", "path": path}
+
+    ticket = asyncio.run(MediaService().create_upload_url(
+        MediaUploadRequest(memory_id=1, media_type="image", filename="Photo.PNG"),
+        ctx
+    ))
+
+    assert ticket.file_path.startswith("test-user-id/")
+    assert ticket.file_path.endswith(".png")
+    assert ticket.signed_url == f"https://storage/{ticket.file_path}"
+
+def test_complete_upload_rejects_foreign_paths(fake_supabase, ctx):
+    for file_path in ("other-user/3f1e2c3a-0000-4000-8000-000000000000.png", f"test-user-id/{'a' * 64}.png"):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(MediaService().complete_upload(
+                MediaUploadComplete(memory_id=1, media_type="image", file_path=file_path),
+                ctx
+            ))
+        assert error.value.status_code == 400
+    fake_supabase.table.return_value.insert.assert_not_called()
+
+def test_complete_upload_verifies_object_before_insert(fake_supabase, mock_media, ctx):
+    name = "3f1e2c3a-0000-4000-8000-000000000000.png"
+    table = fake_supabase.table.return_value
+    table.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value = Mock(data=[{"id": 1}])
+    table.insert.return_value.execute.return_value = Mock(data=[mock_media])
+    bucket = fake_supabase.storage.from_.return_value
+    bucket.list.return_value = [{"name": name, "metadata": {"size": 10, "mimetype": "image/png"}}]
+
+    result = asyncio.run(MediaService().complete_upload(
+        MediaUploadComplete(memory_id=1, media_type="image", file_path=f"test-user-id/{name}"),
+        ctx
+    ))
+
+    assert result == mock_media
+    bucket.list.assert_called_once_with("test-user-id", {"limit": 1, "search": name})
+
+    bucket.list.return_value = []
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(MediaService().complete_upload(
+            MediaUploadComplete(memory_id=1, media_type="image", file_path=f"test-user-id/{name}"),
+            ctx
+        ))
+    assert error.value.status_code == 400
+
+def test_complete_upload_removes_rejected_objects(fake_supabase, ctx):
+    name = "3f1e2c3a-0000-4000-8000-000000000000.png"
+    table = fake_supabase.table.return_value
+    table.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value = Mock(data=[{"id": 1}])
+    bucket = fake_supabase.storage.from_.return_value
+
+    for metadata, status_code in (({"size": 10 ** 12, "mimetype": "image/png"}, 413), ({"size": 10, "mimetype": "audio/mpeg"}, 400)):
+        bucket.remove.reset_mock()
+        bucket.list.return_value = [{"name": name, "metadata": metadata}]
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(MediaService().complete_upload(
+                MediaUploadComplete(memory_id=1, media_type="image", file_path=f"test-user-id/{name}"),
+                ctx
+            ))
+        assert error.value.status_code == status_code
+        bucket.remove.assert_called_once_with([f"test-user-id/{name}"])
+
+    table.insert.assert_not_called()
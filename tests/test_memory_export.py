@@ -0,0 +1,125 @@
+import asyncio
+import io
+import json
+import zipfile
+import pytest
+from unittest.mock import Mock, patch
+from app.services.memory_export_service import MemoryExportService
+
+MEMORIES = [
+    {
+        "id": memory_id,
+        "title": f"Memory {memory_id}",
+        "content": "Content",
+        "date": "2024-05-26",
+        "user_id": "test-user-id",
+        "created_at": "2024-05-26T12:00:00",
+        "media_attachments": [
+            {"id": memory_id, "memory_id": memory_id, "file_path": f"test-user-id/{memory_id}.jpg",
+             "media_type": "image", "label": None}
+        ] if memory_id % 2 else []
+    }
+    for memory_id in range(1, 6)
+]
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.after = 0
+        self.size = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def execute(self):
+        rows = [row for row in self.rows if row["id"] > self.after][:self.size]
+        return Mock(data=rows)
+
+@pytest.fixture
+def fake_supabase(fake_supabase):
+    media = [attachment for memory in MEMORIES for attachment in memory["media_attachments"]]
+    supabase = fake_supabase
+    supabase.table.side_effect = lambda name: FakeQuery(MEMORIES if name == "memories" else media)
+    bucket = supabase.storage.from_.return_value
+    bucket.download.side_effect = lambda path: f"bytes of {path}".encode()
+    bucket.create_signed_urls.side_effect = lambda paths, expires_in: [
+        {"path": path, "signedURL": f"https://signed/{path}"} for path in paths
+    ]
+    with patch("app.supabase.client.create_client", return_value=supabase):
+        yield supabase
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+def test_export_ndjson_pages_and_signs_media(fake_supabase):
+    service = MemoryExportService()
+    service.page_size = 2
+
+    body = asyncio.run(collect(service.export_ndjson("test-user-id", "test-token")))
+    lines = [json.loads(line) for line in body.splitlines()]
+
+    assert [line["id"] for line in lines] == [1, 2, 3, 4, 5]
+    assert lines[0]["media_attachments"][0]["signed_url"] == "https://signed/test-user-id/1.jpg"
+    # One signing call per page that has attachments
+    assert fake_supabase.storage.from_.return_value.create_signed_urls.call_count == 3
+
+def test_export_zip_is_importable_archive(fake_supabase):
+    service = MemoryExportService()
+    service.page_size = 2
+    service.media_concurrency = 2
+
+    body = asyncio.run(collect(service.export_zip("test-user-id", "test-token")))
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        records = [json.loads(line) for line in archive.read("memories.ndjson").splitlines()]
+        assert len(records) == 5
+        assert records[0]["media"] == [{"path": "media/1.jpg", "media_type": "image", "label": None}]
+        assert archive.read("media/1.jpg") == b"bytes of test-user-id/1.jpg"
+        assert sorted(name for name in archive.namelist() if name.startswith("media/")) == [
+            "media/1.jpg", "media/3.jpg", "media/5.jpg"
+        ]
+
+def test_export_zip_lists_media_it_could_not_download(fake_supabase):
+    def download(path):
+        if path.endswith("3.jpg"):
+            raise Exception("Object not found")
+        return f"bytes of {path}".encode()
+
+    fake_supabase.storage.from_.return_value.download.side_effect = download
+
+    body = asyncio.run(collect(MemoryExportService().export_zip("test-user-id", "test-token")))
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert "media/3.jpg" not in archive.namelist()
+        errors = [json.loads(line) for line in archive.read("export_errors.ndjson").splitlines()]
+    assert [error["path"] for error in errors] == ["media/3.jpg"]
+    assert "Object not found" in errors[0]["error"]
+
+def test_export_runs_as_the_user_and_closes_its_client(fake_supabase):
+    chunks = MemoryExportService().export_ndjson("test-user-id", "test-token")
+
+    async def run():
+        await chunks.__anext__()
+        # Client went away after the first page
+        await chunks.aclose()
+
+    asyncio.run(run())
+
+    fake_supabase.postgrest.auth.assert_called_once_with("test-token")
+    fake_supabase._postgrest.session.close.assert_called_once()
+    fake_supabase.auth.close.assert_called_once()
+    fake_supabase.auth.get_user.assert_not_called()
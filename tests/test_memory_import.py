@@ -0,0 +1,118 @@
+import asyncio
+import io
+import json
+import zipfile
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.core.data_context import DataContext
+from app.models.memory import Memory
+from app.services.memory_import_service import MemoryImportService
+
+def make_memory(memory_id, record):
+    return Memory(
+        id=memory_id,
+        title=record.title,
+        content=record.content,
+        date=record.date,
+        user_id="test-user-id",
+        created_at="2024-05-26T12:00:00",
+        updated_at="2024-05-26T12:00:00"
+    )
+
+@pytest.fixture
+def import_service():
+    service = MemoryImportService()
+    service.batch_size = 2
+
+    async def create_batch(records, ctx):
+        return [make_memory(index + 1, record) for index, record in enumerate(records)]
+
+    service.memory_service.create_memories_batch = AsyncMock(side_effect=create_batch)
+    service.media_service.upload_media_batch = AsyncMock(
+        side_effect=lambda uploads, *args, **kwargs: [{"media": {"id": 1}} for _ in uploads]
+    )
+    return service
+
+async def as_chunks(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def test_import_ndjson_batches_and_reports_errors(import_service):
+    lines = [
+        json.dumps({"title": "First", "content": "One"}),
+        "not json",
+        json.dumps({"title": "Second", "content": "Two"}),
+        json.dumps({"content": "Missing title"}),
+        json.dumps({"title": "Third", "content": "Three"}),
+    ]
+    body = "\n".join(lines).encode()
+
+    result = asyncio.run(import_service.import_ndjson(as_chunks(body), DataContext("test-user-id", "test-token", client=Mock())))
+
+    assert result.imported == 3
+    assert result.failed == 2
+    assert [error.line for error in result.errors] == [2, 4]
+    # Three valid records with a batch size of two means two insert calls
+    assert import_service.memory_service.create_memories_batch.await_count == 2
+
+def test_import_ndjson_rejects_media_without_archive(import_service):
+    body = json.dumps({
+        "title": "Photo",
+        "content": "With media",
+        "media": [{"path": "photo.jpg", "media_type": "image"}]
+    }).encode()
+
+    result = asyncio.run(import_service.import_ndjson(as_chunks(body), DataContext("test-user-id", "test-token", client=Mock())))
+
+    assert result.imported == 0
+    assert result.failed == 1
+    assert "archive" in result.errors[0].error
+
+def test_import_archive_uploads_media(import_service):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("memories.ndjson", json.dumps({
+            "title": "Photo",
+            "content": "With media",
+            "media": [{"path": "photos/a.jpg", "media_type": "image", "label": "A"}]
+        }))
+        archive.writestr("photos/a.jpg", b"jpeg-bytes")
+    buffer.seek(0)
+
+    uploaded = []
+
+    async def upload_batch(uploads, *args, **kwargs):
+        uploaded.extend((upload["memory_id"], upload["read"]()) for upload in uploads)
+        return [{"media": {"id": 1}} for _ in uploads]
+
+    import_service.media_service.upload_media_batch = AsyncMock(side_effect=upload_batch)
+
+    result = asyncio.run(import_service.import_archive(buffer, DataContext("test-user-id", "test-token", client=Mock())))
+
+    assert result.imported == 1
+    assert result.media_uploaded == 1
+    assert uploaded == [(1, b"jpeg-bytes")]
+
+def test_import_archive_reports_media_missing_from_export(import_service):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("memories.ndjson", json.dumps({
+            "title": "Photo",
+            "content": "With media",
+            "media": [
+                {"path": "media/1.jpg", "media_type": "image"},
+                {"path": "media/2.jpg", "media_type": "image"}
+            ]
+        }))
+        archive.writestr("media/1.jpg", b"jpeg-bytes")
+        archive.writestr("export_errors.ndjson", json.dumps({"path": "media/2.jpg", "error": "Download failed: timeout"}))
+    buffer.seek(0)
+
+    result = asyncio.run(import_service.import_archive(buffer, DataContext("test-user-id", "test-token", client=Mock())))
+
+    # The memory and its exported media are kept; the lost file is reported
+    assert result.imported == 1
+    assert result.media_uploaded == 1
+    assert [(error.line, error.error) for error in result.errors] == [
+        (1, "Media missing from export: media/2.jpg (Download failed: timeout)")
+    ]
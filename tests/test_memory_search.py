@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.api import memories as memories_api
+from app.core.auth import get_current_user
+from app.main import app
+from app.services import embedding_service as embedding_module
+from app.services.embedding_service import EmbeddingService, content_hash
+from app.services.memory_search_service import MemorySearchService
+from app.services.vector_index import LocalVectorIndex, reciprocal_rank_fusion
+
+MEMORIES = [
+    {"id": 1, "title": "Summer at grandma's farm", "content": "We fed the chickens every morning.", "date": "1995-07-01", "user_id": "test-user-id", "created_at": "2024-05-26T12:00:00", "updated_at": "2024-05-26T12:00:00"},
+    {"id": 2, "title": "First day of school", "content": "A new backpack and a nervous walk.", "date": "1996-09-01", "user_id": "test-user-id", "created_at": "2024-05-26T12:00:00", "updated_at": "2024-05-26T12:00:00"},
+    {"id": 3, "title": "Harvest festival", "content": "Tractors, hay bales and pie on the farm.", "date": "1997-10-01", "user_id": "test-user-id", "created_at": "2024-05-26T12:00:00", "updated_at": "2024-05-26T12:00:00"},
+]
+
+def test_content_hash_matches_database_expression():
+    assert content_hash("Title", "Body") == hashlib.md5(b"Title Body").hexdigest()
+    assert content_hash(None, "Body") == hashlib.md5(b" Body").hexdigest()
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+
+    assert [id for id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+def test_local_index_returns_nearest_first():
+    index = LocalVectorIndex()
+    index.upsert("user", 1, [1.0, 0.0])
+    index.upsert("user", 2, [0.0, 1.0])
+    index.upsert("other", 3, [1.0, 0.0])
+
+    assert [id for id, _ in index.query("user", [0.9, 0.1], k=5)] == [1, 2]
+
+def test_embed_memories_stores_vectors_with_content_hash():
+    service = EmbeddingService()
+    service.embed = AsyncMock(return_value=[[0.1, 0.2]])
+    supabase = Mock()
+    supabase.rpc.return_value.execute.return_value = Mock(data=1)
+
+    with patch("app.core.data_context.create_user_client", return_value=supabase) as create:
+        stored = asyncio.run(service.embed_memories(MEMORIES[:1], "test-user-id", "test-token"))
+
+    assert stored == 1
+    # One client for the background task, closed when it is done
+    create.assert_called_once_with("test-token")
+    supabase.auth.close.assert_called_once()
+    name, params = supabase.rpc.call_args.args
+    assert name == "set_memory_embeddings_for_user"
+    assert params["p_embeddings"] == [{
+        "id": 1,
+        "embedding": [0.1, 0.2],
+        "content_hash": content_hash(MEMORIES[0]["title"], MEMORIES[0]["content"]),
+    }]
+
+def test_local_hybrid_search_fuses_keywords_and_meaning(fake_supabase, ctx):
+    index = LocalVectorIndex()
+    index.upsert("test-user-id", 1, [1.0, 0.0])
+    index.upsert("test-user-id", 2, [0.0, 1.0])
+    index.upsert("test-user-id", 3, [0.8, 0.2])
+    service = MemorySearchService()
+    service.embedding_service.embed = AsyncMock(return_value=[[1.0, 0.0]])
+    fake_supabase.rpc.return_value.execute.return_value = Mock(data=MEMORIES)
+
+    with patch("app.services.memory_search_service.settings.VECTOR_INDEX", "local"), \
+         patch("app.services.memory_search_service.local_index", index):
+        results = asyncio.run(service.hybrid_search("farm summer", ctx, limit=2))
+
+    assert [result["id"] for result in results] == [1, 3]
+    assert results[0]["similarity"] == pytest.approx(1.0)
+    assert results[0]["text_rank"] == 2
+
+def test_hybrid_search_falls_back_to_full_text_without_embedding(fake_supabase, ctx):
+    service = MemorySearchService()
+    service.embedding_service.embed = AsyncMock(side_effect=Exception("OpenAI is unavailable"))
+    asyncio.run(service.hybrid_search("farm", ctx))
+
+    name, params = fake_supabase.rpc.call_args.args
+    assert name == "hybrid_search_memories"
+    assert params["p_query_embedding"] is None
+    # The database searches the caller's memories (auth.uid())
+    assert "p_user_id" not in params
+
+def test_create_memory_embeds_on_write_when_enabled(client, mock_user, mock_memory):
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    try:
+        with patch.object(memories_api.memory_service, "create_memory", AsyncMock(return_value=mock_memory)), \
+             patch.object(embedding_module.settings, "EMBED_ON_WRITE", True), \
+             patch.object(memories_api.embedding_service, "embed_memories", AsyncMock()) as embed:
+            response = client.post("/api/memories/", json={"title": "Test Memory", "content": "This is a test memory"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    embed.assert_awaited_once_with([mock_memory], "test-user-id", "test-token")
+
+def test_text_search_does_not_return_embeddings(client, mock_user):
+    rows = [{**MEMORIES[0], "embedding": [0.1] * 1536, "embedding_hash": "hash"}]
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    try:
+        with patch.object(memories_api.memory_service, "get_memory_rows", AsyncMock(return_value=rows)):
+            response = client.get("/api/memories/search?query=farm")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert [memory["id"] for memory in response.json()] == [1]
+    assert "embedding" not in response.json()[0]
+    assert "embedding_hash" not in response.json()[0]
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from app.core.data_context import DataContext
+from app.core.upstream import CircuitBreaker, supabase_upstream
+from app.supabase.client import create_client
+from app.models.memory import MemoryCreate
+from app.services.memory_service import MemoryService
+
+def test_get_memory_detail_signs_media_in_one_call(fake_supabase, mock_memory, mock_media, ctx):
+    memory_row = {key: value for key, value in mock_memory.items() if key != "updated_at"}
+    memory_row["media_attachments"] = [mock_media, {**mock_media, "id": 2, "file_path": "test-user-id/b.jpg"}]
+    fake_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value \
+        .limit.return_value.execute.return_value = Mock(data=[memory_row])
+    bucket = fake_supabase.storage.from_.return_value
+    bucket.create_signed_urls.return_value = [
+        {"path": "test-user-id/test.jpg", "signedURL": "https://signed/a"},
+        {"path": "test-user-id/b.jpg", "signedURL": "https://signed/b"},
+    ]
+
+    detail = asyncio.run(MemoryService().get_memory_detail(1, ctx))
+
+    assert [media.signed_url for media in detail.media_attachments] == ["https://signed/a", "https://signed/b"]
+    bucket.create_signed_urls.assert_called_once()
+
+def test_get_memory_detail_not_found(fake_supabase, ctx):
+    fake_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value \
+        .limit.return_value.execute.return_value = Mock(data=[])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(MemoryService().get_memory_detail(1, ctx))
+
+    assert error.value.status_code == 404
+
+def test_memory_reads_surface_database_outages(fake_supabase, ctx):
+    fake_supabase.rpc.return_value.execute.side_effect = APIError({"code": "PGRST003", "message": "Timed out acquiring connection"})
+
+    # A breaker of its own, so the failures do not open the shared one
+    breaker = CircuitBreaker("Database", failure_threshold=5, recovery_timeout=30)
+    with patch.object(supabase_upstream, "breaker", breaker), patch.object(supabase_upstream, "base_delay", 0), \
+         pytest.raises(HTTPException) as error:
+        asyncio.run(MemoryService().get_memory(1, ctx))
+
+    # Retried, then reported as unavailable rather than as a 500
+    assert fake_supabase.rpc.return_value.execute.call_count == 3
+    assert error.value.status_code == 503
+
+def test_create_memories_batch_returns_memories_in_request_order(fake_supabase, mock_memory, ctx, rpc_calls):
+    # INSERT ... RETURNING may return rows in any order; import_index maps them back
+    fake_supabase.rpc.return_value.execute.return_value = Mock(data=[
+        {"import_index": 1, "memory": {**mock_memory, "id": 8, "title": "Second"}},
+        {"import_index": 0, "memory": {**mock_memory, "id": 9, "title": "First"}},
+    ])
+
+    created = asyncio.run(MemoryService().create_memories_batch(
+        [MemoryCreate(title="First", content="a"), MemoryCreate(title="Second", content="b")], ctx
+    ))
+
+    assert [(memory.id, memory.title) for memory in created] == [(9, "First"), (8, "Second")]
+    params, = rpc_calls("import_memories_for_user")
+    assert "p_user_id" not in params
+
+def test_data_context_builds_one_client_per_request():
+    client = Mock()
+    with patch("app.core.data_context.create_user_client", return_value=client) as create:
+        ctx = DataContext("test-user-id", "test-token")
+        assert ctx.client is client
+        assert ctx.client is client
+
+    create.assert_called_once_with("test-token")
+
+def test_data_context_closes_every_pool_it_opened():
+    client = create_client("https://project.supabase.co", "header.payload.signature")
+    with patch("app.core.data_context.create_user_client", return_value=client):
+        ctx = DataContext("test-user-id", "test-token")
+        ctx.client.postgrest
+        ctx.client.storage
+
+    ctx.close()
+
+    assert client.postgrest.session.is_closed
+    assert client.storage.session.is_closed
+    assert client.auth._http_client.is_closed
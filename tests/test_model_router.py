@@ -0,0 +1,66 @@
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from app.core import model_router as model_router_module
+from app.core.model_router import ModelRouter
+
+def make_router(**overrides):
+    options = {
+        "tiers": {"fast": "small-model", "large": "large-model"},
+        "routes": {"title": ["fast", "large"], "summary": ["large"]},
+        "latency_slos": {"title": 0.05},
+        "cost_slos": {"title": 0.001},
+        "prices": {"small-model": [1.0, 2.0], "large-model": [100.0, 200.0]},
+    }
+    options.update(overrides)
+    return ModelRouter(**options)
+
+def response(model, prompt_tokens=10, completion_tokens=5):
+    return SimpleNamespace(model=model, usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+def test_routes_task_to_its_first_tier():
+    calls = []
+
+    def create(model, **kwargs):
+        calls.append(model)
+        return response(model)
+
+    result = asyncio.run(make_router().complete("title", create, messages=[]))
+
+    assert result.model == "small-model"
+    assert calls == ["small-model"]
+    assert model_router_module.calls_total.value(task="title", model="small-model", outcome="success") >= 1
+
+def test_falls_back_when_the_latency_slo_is_missed():
+    def create(model, **kwargs):
+        if model == "small-model":
+            time.sleep(0.2)
+        return response(model)
+
+    before = model_router_module.calls_total.value(task="title", model="small-model", outcome="fallback")
+    result = asyncio.run(make_router().complete("title", create, messages=[]))
+
+    assert result.model == "large-model"
+    assert model_router_module.calls_total.value(task="title", model="small-model", outcome="fallback") == before + 1
+
+def test_does_not_fall_back_on_rejected_requests():
+    def create(model, **kwargs):
+        raise ValueError("invalid request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(make_router().complete("title", create, messages=[]))
+
+def test_records_cost_and_cost_slo_breaches():
+    before = model_router_module.slo_breaches_total.value(task="title", slo="cost")
+    router = make_router()
+
+    # 1000 * $1 + 500 * $2 per million tokens = $0.002, over the $0.001 SLO
+    asyncio.run(router.complete("title", lambda model, **kwargs: response(model, 1000, 500), messages=[]))
+
+    assert router.cost("small-model", 1000, 500) == pytest.approx(0.002)
+    assert model_router_module.slo_breaches_total.value(task="title", slo="cost") == before + 1
+
+def test_unknown_task_is_an_error():
+    with pytest.raises(ValueError):
+        make_router().models("poem")
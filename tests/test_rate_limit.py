@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+from app.core.bulkhead import Bulkhead, BulkheadFull
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimitMiddleware, parse_limit
+
+def make_app(default_limit="100/minute", route_limits=None):
+    app = FastAPI()
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=MemoryRateLimitBackend(),
+        default_limit=default_limit,
+        route_limits=route_limits,
+        jwt_secret="secret",
+    )
+
+    @app.post("/api/interview/continue")
+    async def continue_interview():
+        return {"ok": True}
+
+    @app.get("/api/memories")
+    async def memories():
+        return []
+
+    return app
+
+def bearer(sub):
+    return {"Authorization": f"Bearer {jwt.encode({'sub': sub}, 'secret', algorithm='HS256')}"}
+
+def test_parse_limit():
+    assert parse_limit("20/minute") == (20 / 60, 20)
+    assert parse_limit("5/seconds") == (5, 5)
+
+def test_memory_backend_refills_over_time():
+    backend = MemoryRateLimitBackend()
+
+    async def run():
+        allowed = [await backend.acquire("key", rate=1, capacity=2) for _ in range(3)]
+        backend._buckets["key"][1] -= 1  # one second passes
+        return allowed, await backend.acquire("key", rate=1, capacity=2)
+
+    allowed, after_refill = asyncio.run(run())
+
+    assert allowed[:2] == [0.0, 0.0]
+    assert allowed[2] > 0
+    assert after_refill == 0.0
+
+def test_route_limit_is_per_user_and_sets_retry_after():
+    client = TestClient(make_app(route_limits={"POST /api/interview/continue": "2/minute"}))
+
+    statuses = [client.post("/api/interview/continue", headers=bearer("alice")).status_code for _ in range(3)]
+    rejected = client.post("/api/interview/continue", headers=bearer("alice"))
+
+    assert statuses == [200, 200, 429]
+    assert int(rejected.headers["retry-after"]) > 0
+    # Other users and other routes have their own buckets
+    assert client.post("/api/interview/continue", headers=bearer("bob")).status_code == 200
+    assert client.get("/api/memories", headers=bearer("alice")).status_code == 200
+
+def test_default_limit_applies_across_routes():
+    client = TestClient(make_app(default_limit="2/minute"))
+
+    assert client.get("/api/memories").status_code == 200
+    assert client.post("/api/interview/continue").status_code == 200
+    assert client.get("/api/memories").status_code == 429
+
+def test_bulkhead_rejects_instead_of_queueing():
+    bulkhead = Bulkhead("OpenAI", max_concurrent=1, max_queue=1, max_wait=0.05)
+    release = asyncio.Event()
+
+    async def hold():
+        async with bulkhead:
+            await release.wait()
+
+    async def run():
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(bulkhead.__aenter__())
+        await asyncio.sleep(0)
+        # The queue is full, so a third caller is turned away at once
+        with pytest.raises(BulkheadFull) as error:
+            await bulkhead.__aenter__()
+        # The waiter gives up after max_wait
+        with pytest.raises(BulkheadFull):
+            await waiter
+        release.set()
+        await holder
+        return error.value
+
+    error = asyncio.run(run())
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert bulkhead.in_flight == 0
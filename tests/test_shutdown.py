@@ -0,0 +1,136 @@
+import asyncio
+import httpx
+import uvicorn
+from contextlib import asynccontextmanager
+from unittest.mock import Mock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import lifespan as lifespan_module
+from app.core.resources import InFlightMiddleware, Resources
+
+def test_in_flight_requests_are_counted():
+    resources = Resources()
+    release = asyncio.Event()
+
+    async def endpoint(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"done"})
+
+    app = InFlightMiddleware(endpoint, resources)
+
+    async def run():
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+        async def send(message):
+            pass
+        request = asyncio.create_task(app({"type": "http", "method": "GET", "path": "/", "headers": []}, receive, send))
+        await asyncio.sleep(0)
+        assert resources.in_flight == 1
+        release.set()
+        await request
+
+    asyncio.run(run())
+    assert resources.in_flight == 0
+
+def test_uvicorn_drains_requests_before_the_lifespan_shuts_down():
+    resources = Resources()
+    steps = []
+    entered = asyncio.Event()
+    release = asyncio.Event()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        steps.append("lifespan shutdown")
+        await resources.shutdown(drain_timeout=5, flush_timeout=1)
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/slow")
+    async def slow():
+        entered.set()
+        await release.wait()
+        steps.append("request finished")
+        return {"ok": True}
+
+    async def run():
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", timeout_graceful_shutdown=5)
+        server = uvicorn.Server(config)
+        server.install_signal_handlers = lambda: None
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+
+        async with httpx.AsyncClient() as client:
+            request = asyncio.create_task(client.get(f"http://127.0.0.1:{port}/slow"))
+            await entered.wait()
+            # What SIGTERM does
+            server.should_exit = True
+            await asyncio.sleep(0.2)
+            assert steps == []
+            release.set()
+            response = await request
+        await serving
+        return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert steps == ["request finished", "lifespan shutdown"]
+
+def test_shutdown_stops_workers_then_flushes_then_closes_in_reverse_order():
+    resources = Resources()
+    steps = []
+
+    async def worker(stop):
+        await stop.wait()
+        steps.append("worker stopped")
+
+    async def job():
+        await asyncio.sleep(0.01)
+        steps.append("job finished")
+
+    async def flush():
+        steps.append("flushed")
+
+    async def run():
+        resources.start_worker("worker", worker)
+        resources.spawn(job())
+        resources.on_close("first", lambda: steps.append("closed first"))
+        resources.on_close("second", lambda: steps.append("closed second"))
+        resources.on_flush("buffer", flush)
+        await resources.shutdown(drain_timeout=5, flush_timeout=1)
+
+    asyncio.run(run())
+    assert set(steps[:2]) == {"worker stopped", "job finished"}
+    assert steps[2:] == ["flushed", "closed second", "closed first"]
+
+def test_shutdown_cancels_jobs_at_the_deadline_and_still_closes():
+    resources = Resources()
+    closed = Mock()
+
+    async def run():
+        job = resources.spawn(asyncio.sleep(60))
+        resources.on_close("client", closed)
+        await resources.shutdown(drain_timeout=0.05, flush_timeout=1)
+        return job
+
+    job = asyncio.run(run())
+    assert job.cancelled()
+    closed.assert_called_once()
+
+def test_lifespan_closes_shared_clients():
+    app = FastAPI(lifespan=lifespan_module.lifespan)
+    close_openai = Mock()
+    close_supabase = Mock()
+
+    with patch.object(lifespan_module.settings, "STARTUP_WARMUP_ENABLED", False), \
+         patch.object(lifespan_module, "resources", Resources()), \
+         patch.object(lifespan_module, "close_openai_client", close_openai), \
+         patch.object(lifespan_module, "close_anon_client", close_supabase):
+        with TestClient(app):
+            close_openai.assert_not_called()
+
+    close_openai.assert_called_once()
+    close_supabase.assert_called_once()
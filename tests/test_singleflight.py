@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from app.core import singleflight
+from app.core.data_context import DataContext
+from app.core.singleflight import coalesce_read, forget_read
+from app.services import interview_session_service, memory_service
+
+def slow_read(result, calls):
+    async def read():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return result
+    return read
+
+def test_identical_reads_share_one_call_and_get_their_own_copy():
+    calls = []
+    read = slow_read({"conversation": [{"role": "user", "content": "hi"}]}, calls)
+
+    async def run():
+        return await asyncio.gather(*(coalesce_read("get_session", "user-1", ("s1",), read) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert results[0] == results[1] == results[2]
+    results[0]["conversation"].append({"role": "assistant", "content": "hello"})
+    assert len(results[1]["conversation"]) == 1
+    assert singleflight.reads_total.value(operation="get_session", outcome="joined") >= 2
+
+def test_reads_of_other_users_or_parameters_are_not_merged():
+    calls = []
+    read = slow_read([], calls)
+
+    async def run():
+        await asyncio.gather(
+            coalesce_read("get_session", "user-1", ("s1",), read),
+            coalesce_read("get_session", "user-2", ("s1",), read),
+            coalesce_read("get_session", "user-1", ("s2",), read),
+        )
+
+    asyncio.run(run())
+
+    assert len(calls) == 3
+
+def test_reads_after_a_write_do_not_join_an_earlier_read():
+    calls = []
+    read = slow_read([], calls)
+
+    async def run():
+        before = asyncio.create_task(coalesce_read("get_memories_for_user", "user-1", (), read))
+        await asyncio.sleep(0)
+        forget_read("get_memories_for_user", "user-1")
+        after = asyncio.create_task(coalesce_read("get_memories_for_user", "user-1", (), read))
+        await asyncio.gather(before, after)
+
+    asyncio.run(run())
+
+    assert len(calls) == 2
+
+def test_concurrent_get_session_calls_make_one_query():
+    record = {
+        "id": 1,
+        "session_id": "s1",
+        "user_id": "user-1",
+        "conversation": [],
+        "status": "active",
+        "created_at": datetime.now().isoformat(),
+    }
+
+    async def call(func, *args, **kwargs):
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(data=record)
+
+    service = interview_session_service.InterviewSessionService()
+    ctx = DataContext(user_id="user-1", token="token", client=Mock())
+
+    async def run():
+        return await asyncio.gather(*(service.get_session("s1", ctx) for _ in range(3)))
+
+    with patch.object(interview_session_service.supabase_upstream, "call", AsyncMock(side_effect=call)) as upstream:
+        sessions = asyncio.run(run())
+
+    upstream.assert_awaited_once()
+    assert [session.session_id for session in sessions] == ["s1", "s1", "s1"]
+    assert sessions[0] is not sessions[1]
+
+def test_memory_writes_invalidate_the_shared_list():
+    service = memory_service.MemoryService()
+    client = Mock()
+    client.rpc.return_value.execute.return_value.data = {
+        "id": 1,
+        "title": "Fishing",
+        "content": "At the lake",
+        "user_id": "user-1",
+        "created_at": datetime.now().isoformat(),
+    }
+    ctx = DataContext(user_id="user-1", token="token", client=client)
+
+    with patch.object(memory_service, "forget_read") as forget:
+        asyncio.run(service.delete_memory(1, ctx))
+
+    forget.assert_called_once_with("get_memories_for_user", "user-1")
@@ -0,0 +1,40 @@
+import asyncio
+import subprocess
+import sys
+from unittest.mock import Mock, patch
+from app.core import lifespan as lifespan_module
+
+def test_importing_app_does_not_import_sdks():
+    """The OpenAI and Supabase SDKs are imported when their clients are first used."""
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app.main; print(sorted(m for m in ('openai', 'supabase', 'gotrue') if m in sys.modules))"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+def test_warm_up_creates_clients_and_resolves_hosts():
+    openai_client = Mock()
+    openai_client.base_url.host = "api.openai.com"
+    resolved = []
+
+    async def resolve(host):
+        resolved.append(host)
+
+    with patch.object(lifespan_module, "get_openai_client", return_value=openai_client), \
+         patch.object(lifespan_module, "get_anon_client") as get_anon_client, \
+         patch.object(lifespan_module, "_resolve", side_effect=resolve), \
+         patch.object(lifespan_module.settings, "SUPABASE_URL", "https://project.supabase.co"):
+        asyncio.run(lifespan_module.warm_up())
+
+    get_anon_client.assert_called_once()
+    assert resolved == ["api.openai.com", "project.supabase.co"]
+    openai_client.with_options.return_value.models.list.assert_called_once()
+
+def test_warm_up_failures_do_not_prevent_startup():
+    with patch.object(lifespan_module, "get_openai_client", side_effect=Exception("no network")), \
+         patch.object(lifespan_module, "get_anon_client"):
+        asyncio.run(lifespan_module.warm_up())
+
+    assert lifespan_module.warmup_seconds.value(step="connections") >= 0
@@ -0,0 +1,58 @@
+import asyncio
+from unittest.mock import Mock
+from app.workers.storage_reaper import StorageReaper
+
+def test_run_once_removes_claimed_paths_in_one_call(fake_supabase, rpc_calls):
+    claimed = [
+        {"id": 1, "bucket": "media", "file_path": "user/a.jpg"},
+        {"id": 2, "bucket": "media", "file_path": "user/b.jpg"},
+    ]
+    fake_supabase.rpc.return_value.execute.side_effect = [Mock(data=claimed), Mock(data=None)]
+
+    processed = asyncio.run(StorageReaper(client=fake_supabase).run_once())
+
+    assert processed == 2
+    fake_supabase.storage.from_.return_value.remove.assert_called_once_with(["user/a.jpg", "user/b.jpg"])
+    assert rpc_calls("complete_storage_deletions") == [{"p_ids": [1, 2]}]
+
+def test_run_once_trusts_the_claim_for_references(fake_supabase):
+    # claim_storage_deletions drops re-attached paths under the path lock; a
+    # separate check here could go stale before the remove
+    claimed = [{"id": 1, "bucket": "media", "file_path": "user/a.jpg"}]
+    fake_supabase.rpc.return_value.execute.side_effect = [Mock(data=claimed), Mock(data=None)]
+
+    asyncio.run(StorageReaper(client=fake_supabase).run_once())
+
+    fake_supabase.table.assert_not_called()
+    fake_supabase.storage.from_.return_value.remove.assert_called_once_with(["user/a.jpg"])
+
+def test_run_once_reschedules_failures(fake_supabase, rpc_calls):
+    claimed = [{"id": 5, "bucket": "media", "file_path": "user/c.jpg"}]
+    fake_supabase.rpc.return_value.execute.side_effect = [Mock(data=claimed), Mock(data=None)]
+    fake_supabase.storage.from_.return_value.remove.side_effect = Exception("storage down")
+
+    asyncio.run(StorageReaper(client=fake_supabase).run_once())
+
+    assert rpc_calls("fail_storage_deletions") == [{"p_ids": [5], "p_error": "storage down"}]
+    assert rpc_calls("complete_storage_deletions") == []
+
+def test_reconcile_queues_only_old_unreferenced_objects(fake_supabase):
+    bucket = fake_supabase.storage.from_.return_value
+    bucket.list.side_effect = lambda path, options: {
+        "": [{"name": "user", "id": None}],
+        "user": [
+            {"name": "kept.jpg", "id": "1", "created_at": "2024-01-01T00:00:00Z"},
+            {"name": "orphan.jpg", "id": "2", "created_at": "2024-01-01T00:00:00Z"},
+            {"name": "fresh.jpg", "id": "3", "created_at": "2999-01-01T00:00:00Z"},
+        ],
+    }[path]
+    fake_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value = Mock(
+        data=[{"file_path": "user/kept.jpg"}]
+    )
+
+    queued = asyncio.run(StorageReaper(client=fake_supabase).reconcile())
+
+    assert queued == 1
+    fake_supabase.table.return_value.insert.assert_called_once_with(
+        [{"bucket": "media", "file_path": "user/orphan.jpg"}]
+    )
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from app.core import upstream as upstream_module
+from app.core.bulkhead import Bulkhead
+from app.core.metrics import registry
+from app.core.upstream import Upstream, UpstreamTimeout, UpstreamUnavailable
+
+def make_upstream(name="Test", **options):
+    options.setdefault("base_delay", 0)
+    return Upstream(
+        name,
+        Bulkhead(name, max_concurrent=4, max_queue=4, max_wait=1),
+        lambda error: isinstance(error, httpx.TransportError),
+        timeout=options.pop("timeout", 1),
+        **options
+    )
+
+def flaky(failures, result="ok"):
+    calls = []
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise httpx.ConnectError("connection reset")
+        return result
+    return call, calls
+
+def test_idempotent_calls_are_retried():
+    call, calls = flaky(2)
+
+    assert asyncio.run(make_upstream().call(call, idempotent=True)) == "ok"
+    assert len(calls) == 3
+
+def test_non_idempotent_calls_are_not_retried():
+    call, calls = flaky(1)
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(make_upstream().call(call))
+    assert len(calls) == 1
+
+def test_non_transient_errors_are_raised_unchanged():
+    def call():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(make_upstream().call(call, idempotent=True))
+
+def test_database_outages_are_transient():
+    assert upstream_module._supabase_retryable(APIError({"code": "PGRST003", "message": "Timed out acquiring connection"}))
+    assert upstream_module._supabase_retryable(APIError({"code": "57P01", "message": "terminating connection"}))
+    assert upstream_module._supabase_retryable(APIError({"code": 503, "message": "JSON could not be generated"}))
+    assert not upstream_module._supabase_retryable(APIError({"code": "23505", "message": "duplicate key"}))
+    assert not upstream_module._supabase_retryable(APIError({"code": "P0002", "message": "Memory not found"}))
+
+def test_circuit_opens_and_fails_fast():
+    upstream = make_upstream("Breaker", max_retries=0, failure_threshold=2, recovery_timeout=60)
+    call, calls = flaky(10)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            asyncio.run(upstream.call(call))
+    with pytest.raises(UpstreamUnavailable) as error:
+        asyncio.run(upstream.call(call))
+
+    assert len(calls) == 2
+    assert "Retry-After" in error.value.headers
+    assert 'upstream_circuit_state{upstream="Breaker"} 2' in registry.render()
+
+def test_half_open_circuit_closes_after_successful_probe():
+    upstream = make_upstream(max_retries=0, failure_threshold=1, recovery_timeout=60)
+    call, _ = flaky(1)
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(upstream.call(call))
+
+    upstream.breaker.opened_at -= 60
+    assert asyncio.run(upstream.call(call)) == "ok"
+    assert upstream.breaker.state == upstream.breaker.CLOSED
+
+def test_slow_reads_are_hedged():
+    first_call = threading.Event()
+
+    def call():
+        if not first_call.is_set():
+            first_call.set()
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    upstream = make_upstream(hedge_delay=0.05)
+    assert asyncio.run(upstream.call(call, idempotent=True, hedge=True)) == "fast"
+
+def test_request_deadline_bounds_calls():
+    def call():
+        time.sleep(0.2)
+        return "late"
+
+    async def run():
+        token = upstream_module._deadline.set(time.monotonic() + 0.05)
+        try:
+            return await make_upstream(timeout=5).call(call, idempotent=True)
+        finally:
+            upstream_module._deadline.reset(token)
+
+    with pytest.raises(UpstreamTimeout) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 504
+
+def test_timed_out_calls_hold_their_bulkhead_slot_until_they_return():
+    release = threading.Event()
+
+    def call():
+        release.wait(1)
+        return "late"
+
+    upstream = make_upstream(timeout=0.05)
+
+    async def run():
+        with pytest.raises(UpstreamTimeout):
+            await upstream.call(call)
+        # The caller gave up, but the thread is still talking to the upstream
+        assert upstream.bulkhead.in_flight == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        return upstream.bulkhead.in_flight
+
+    assert asyncio.run(run()) == 0
+
+def test_metrics_endpoint(client):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "upstream_calls_total" in response.text
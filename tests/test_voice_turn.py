@@ -0,0 +1,83 @@
+import json
+from unittest.mock import AsyncMock, patch
+from app.api import interview as interview_api
+from app.core.auth import get_current_user
+from app.main import app
+from app.models.interview import InterviewSession
+from app.services.transcription import NO_SPEECH_DETECTED
+
+def make_session(**overrides):
+    return InterviewSession(**{
+        "id": 1,
+        "session_id": "session-1",
+        "user_id": "test-user-id",
+        "conversation": [{"role": "assistant", "content": "What would you like to share?"}],
+        "current_question": "What would you like to share?",
+        "created_at": "2024-05-26T12:00:00",
+        **overrides
+    })
+
+def voice_turn(client, mock_user):
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    try:
+        return client.post(
+            "/api/interview/voice-turn",
+            data={"session_id": "session-1"},
+            files={"file": ("answer.webm", b"\x00" * 2048, "audio/webm")}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+def test_voice_turn_streams_transcript_then_question(client, mock_user):
+    async def stream_next_question(conversation):
+        assert conversation[-1]["content"] == "We went to the beach."
+        for delta in ["What ", "did you ", "see there?"]:
+            yield delta
+
+    saved = make_session(current_question="What did you see there?")
+    with patch.object(interview_api.session_service, "get_session", AsyncMock(return_value=make_session())), \
+         patch.object(interview_api.session_service, "update_session", AsyncMock(return_value=saved)) as update_session, \
+         patch.object(interview_api.transcription_service, "transcribe_audio", AsyncMock(return_value="We went to the beach.")), \
+         patch.object(interview_api.interviewer_service, "stream_next_question", stream_next_question):
+        response = voice_turn(client, mock_user)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == {"type": "transcript", "text": "We went to the beach."}
+    assert [event["delta"] for event in events[1:-1]] == ["What ", "did you ", "see there?"]
+    assert events[-1]["type"] == "session"
+    assert events[-1]["session"]["current_question"] == "What did you see there?"
+
+    session_data = update_session.await_args.kwargs["session_data"]
+    assert session_data["current_question"] == "What did you see there?"
+    assert [message["role"] for message in session_data["conversation"]] == ["assistant", "user", "assistant"]
+
+def test_voice_turn_rejects_missing_session_before_streaming(client, mock_user):
+    with patch.object(interview_api.session_service, "get_session", AsyncMock(return_value=None)), \
+         patch.object(interview_api.transcription_service, "transcribe_audio", AsyncMock(return_value="Hello")):
+        response = voice_turn(client, mock_user)
+
+    assert response.status_code == 404
+
+def test_voice_turn_rejects_recordings_without_speech(client, mock_user):
+    with patch.object(interview_api.session_service, "get_session", AsyncMock(return_value=make_session())), \
+         patch.object(interview_api.transcription_service, "transcribe_audio", AsyncMock(return_value=NO_SPEECH_DETECTED)):
+        response = voice_turn(client, mock_user)
+
+    assert response.status_code == 422
+
+def test_voice_turn_reports_generation_errors_in_the_stream(client, mock_user):
+    async def stream_next_question(conversation):
+        yield "What "
+        raise RuntimeError("stream interrupted")
+
+    with patch.object(interview_api.session_service, "get_session", AsyncMock(return_value=make_session())), \
+         patch.object(interview_api.session_service, "update_session", AsyncMock()) as update_session, \
+         patch.object(interview_api.transcription_service, "transcribe_audio", AsyncMock(return_value="Hello")), \
+         patch.object(interview_api.interviewer_service, "stream_next_question", stream_next_question):
+        response = voice_turn(client, mock_user)
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["type"] == "error"
+    update_session.assert_not_awaited()